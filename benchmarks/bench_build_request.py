@@ -0,0 +1,45 @@
+"""Micro-benchmark for request-model resolution in TeaSDKPlugin._build_request.
+
+Compares the uncached resolution path (importlib + pascal_to_snake on every
+call) with the per-class resolved-action table.
+
+    python benchmarks/bench_build_request.py
+"""
+import importlib
+import os
+import timeit
+
+os.environ.setdefault('ALIBABA_CLOUD_ACCESS_KEY_ID', 'bench_ak')
+os.environ.setdefault('ALIBABA_CLOUD_ACCESS_KEY_SECRET', 'bench_sk')
+
+from iact3.plugin.base_plugin import REQUEST_SUFFIX
+from iact3.plugin.ros import StackPlugin
+
+NUMBER = 20000
+REQUEST_NAME = 'GetStackRequest'
+KWARGS = {'StackId': 'stack-id', 'OutputOption': 'Disabled'}
+
+
+def uncached(plugin):
+    api_name = plugin._get_api_name(REQUEST_NAME)
+    plugin._get_action_name(api_name)
+    module_path, class_name = plugin.models_path(f'{api_name}{REQUEST_SUFFIX}').rsplit('.', 1)
+    request_class = getattr(importlib.import_module(module_path), class_name)
+    return request_class().from_map(dict(KWARGS, RegionId=plugin.region_id))
+
+
+def cached(plugin):
+    plugin._resolve_action(REQUEST_NAME)
+    return plugin._build_request(REQUEST_NAME, **KWARGS)
+
+
+def main():
+    plugin = StackPlugin(region_id='cn-hangzhou')
+    cached(plugin)
+    for name, func in (('uncached', uncached), ('cached', cached)):
+        seconds = min(timeit.repeat(lambda func=func: func(plugin), number=NUMBER, repeat=5))
+        print(f'{name:>9}: {seconds / NUMBER * 1e6:7.2f} us/call')
+
+
+if __name__ == '__main__':
+    main()
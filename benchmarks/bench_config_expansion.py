@@ -0,0 +1,79 @@
+"""Benchmark expanding a config of 50 tests x 25 regions into per-region test configs.
+
+Compares the previous materialization, where the merged config was validated
+by every ``from_dict`` call and each region got a validated
+``to_dict``/``from_dict`` round trip of its test, with one validation by the
+compiled validator and per-region overlays from ``TestConfig.for_region``.
+
+    python benchmarks/bench_config_expansion.py
+"""
+import json
+import os
+import time
+
+os.environ.setdefault('ALIBABA_CLOUD_ACCESS_KEY_ID', 'bench_ak')
+os.environ.setdefault('ALIBABA_CLOUD_ACCESS_KEY_SECRET', 'bench_sk')
+
+from iact3.config import BaseConfig, TestConfig, validate_config
+
+TESTS = 50
+REGIONS = [f'region-{index}' for index in range(25)]
+ROUNDS = 3
+
+
+def merged_config():
+    resources = {
+        f'Sleep{index}': {'Type': 'ALIYUN::ROS::Sleep', 'Properties': {'CreateDuration': 1}} for index in range(500)
+    }
+    template_body = json.dumps({'ROSTemplateFormatVersion': '2015-09-01', 'Resources': resources})
+    project = {
+        'name': 'bench',
+        'regions': REGIONS,
+        'parameters': {f'Key{index}': f'Value{index}' for index in range(20)},
+        'tags': {'team': 'bench'},
+        'template_config': {'template_body': template_body},
+        'hooks': {'notify': {'execute_time': 'PreCreate', 'execute_command': ['echo', '$[stack.name]']}},
+    }
+    tests = {
+        f'test-{index}': dict(project, parameters=dict(project['parameters'], Name=f'test-{index}'))
+        for index in range(TESTS)
+    }
+    return {'general': {}, 'project': project, 'tests': tests}
+
+
+def previous(merged):
+    base_config = BaseConfig.from_dict(merged)
+    return [
+        TestConfig.from_dict(config.to_dict()) for config in base_config.tests.values() for _ in REGIONS
+    ]
+
+
+def overlays(merged):
+    validate_config(BaseConfig, merged)
+    base_config = BaseConfig.from_dict(merged, validate=False)
+    return [
+        config.for_region(name, region) for name, config in base_config.tests.items() for region in REGIONS
+    ]
+
+
+def measure(func, merged):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        configs = func(merged)
+    assert len(configs) == TESTS * len(REGIONS)
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+def main():
+    merged = merged_config()
+    overlays(merged)
+    previous_ms = measure(previous, merged)
+    overlays_ms = measure(overlays, merged)
+    print(
+        f'{TESTS} tests x {len(REGIONS)} regions  previous: {previous_ms:9.2f} ms  '
+        f'overlays: {overlays_ms:8.2f} ms  speedup: {previous_ms / overlays_ms:6.1f}x'
+    )
+
+
+if __name__ == '__main__':
+    main()
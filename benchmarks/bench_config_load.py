@@ -0,0 +1,82 @@
+"""Benchmark loading an unchanged project repeatedly, as the web server does per request.
+
+Each round runs ``BaseConfig.create`` and ``generate_template_args`` for a
+project of 20 tests with a 500 resource YAML template, once with the file
+cache, the parsed templates and the validated config digests cleared (every
+load reads, parses and validates again) and once with them kept.
+
+    python benchmarks/bench_config_load.py
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault('ALIBABA_CLOUD_ACCESS_KEY_ID', 'bench_ak')
+os.environ.setdefault('ALIBABA_CLOUD_ACCESS_KEY_SECRET', 'bench_sk')
+
+from iact3 import config as config_module
+from iact3.config import BaseConfig
+from iact3.file_cache import FILE_CACHE
+from iact3.template_cache import PARSED_TEMPLATES
+from iact3.util import yaml
+
+TESTS = 20
+ROUNDS = 20
+
+
+def write_project(directory: Path):
+    template = {
+        'ROSTemplateFormatVersion': '2015-09-01',
+        'Parameters': {f'Param{index}': {'Type': 'String', 'Default': 'value'} for index in range(50)},
+        'Resources': {
+            f'Sleep{index}': {'Type': 'ALIYUN::ROS::Sleep', 'Properties': {'CreateDuration': 1}} for index in range(500)
+        },
+    }
+    (directory / 'bench.template.yml').write_text(yaml.dump(template), encoding='utf-8')
+    project = {
+        'project': {
+            'name': 'bench',
+            'regions': ['cn-hangzhou', 'cn-beijing'],
+            'parameters': {f'Param{index}': f'value-{index}' for index in range(50)},
+            'template_config': {'template_location': str(directory / 'bench.template.yml')},
+        },
+        'tests': {f'test-{index}': {'parameters': {'Param0': f'test-{index}'}} for index in range(TESTS)},
+    }
+    (directory / '.iact3.yml').write_text(yaml.dump(project), encoding='utf-8')
+
+
+def load(directory: Path):
+    base_config = BaseConfig.create(
+        global_config_path=directory / 'global.yml', project_config_file='.iact3.yml', project_path=str(directory)
+    )
+    for test in base_config.tests.values():
+        test.template_config.generate_template_args()
+
+
+def measure(directory: Path, cached: bool):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        if not cached:
+            FILE_CACHE.clear()
+            PARSED_TEMPLATES.clear()
+            config_module._VALID_CONFIGS.clear()
+        load(directory)
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        write_project(directory)
+        load(directory)
+        uncached_ms = measure(directory, cached=False)
+        cached_ms = measure(directory, cached=True)
+    print(
+        f'{TESTS} tests  uncached: {uncached_ms:8.2f} ms  cached: {cached_ms:8.2f} ms  '
+        f'speedup: {uncached_ms / cached_ms:6.1f}x'
+    )
+
+
+if __name__ == '__main__':
+    main()
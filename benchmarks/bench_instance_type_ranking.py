@@ -0,0 +1,49 @@
+"""Benchmark ranking large DescribeAvailableResource answers with InstanceTypeCatalog.
+
+Compares ranking with a cold catalog (every type id parsed) against a warm
+one, which is what every generator after the first sees in a run.
+
+    python benchmarks/bench_instance_type_ranking.py
+"""
+import time
+
+from iact3.instance_types import InstanceTypeCatalog
+
+ROUNDS = 20
+FAMILIES = ('t6-c1m1', 't5-lc1m2', 'u1-c1m2', 'e-c1m2', 'g6', 'g7', 'c6', 'c7', 'r6', 'r7', 'g8a', 'gn7i-c8g1', 'hfg7')
+SIZES = ('small', 'medium', 'large', 'xlarge', '2xlarge', '4xlarge', '8xlarge', '12xlarge', '16xlarge', '32xlarge')
+
+
+def candidates(count):
+    types = []
+    while len(types) < count:
+        for family in FAMILIES:
+            for size in SIZES:
+                types.append(f'ecs.{family}{len(types) // 130 or ""}.{size}')
+    return types[:count]
+
+
+def measure(types, warm):
+    catalog = InstanceTypeCatalog()
+    if warm:
+        catalog.rank(types)
+    elapsed = 0.0
+    for _ in range(ROUNDS):
+        if not warm:
+            catalog.clear()
+        started = time.perf_counter()
+        catalog.rank(types)
+        elapsed += time.perf_counter() - started
+    return elapsed / ROUNDS * 1000
+
+
+def main():
+    for count in (200, 2000, 20000):
+        types = candidates(count)
+        cold_ms = measure(types, warm=False)
+        warm_ms = measure(types, warm=True)
+        print(f'{count:6d} types  cold: {cold_ms:8.2f} ms  warm: {warm_ms:8.2f} ms  speedup: {cold_ms / warm_ms:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
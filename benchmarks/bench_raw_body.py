@@ -0,0 +1,120 @@
+"""Benchmark the raw-body fast path of TeaSDKPlugin.send_request.
+
+Both paths get the same synthetic ListStackEvents/ListStacks payloads,
+shaped like real ROS responses. The model path does what the generated SDK
+clients do: TeaCore.from_map into the response model, then TeaCore.to_map
+back to a dict. The raw path, opt-in through ALIBABA_CLOUD_IACT3_RAW_BODY=1,
+returns the runtime's dict as-is.
+
+    python benchmarks/bench_raw_body.py
+"""
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault('ALIBABA_CLOUD_ACCESS_KEY_ID', 'bench_ak')
+os.environ.setdefault('ALIBABA_CLOUD_ACCESS_KEY_SECRET', 'bench_sk')
+
+from alibabacloud_ros20190910 import models as ros_models
+from Tea.core import TeaCore
+
+from iact3.plugin.base_plugin import RATE_LIMITER
+from iact3.plugin.ros import StackPlugin
+
+ROUNDS = 20
+
+
+def stack_events(count):
+    return {
+        'RequestId': 'B288A0BE-D927-4888-B0F7-B35EF84B6E6F',
+        'TotalCount': count,
+        'PageNumber': 1,
+        'PageSize': count,
+        'Events': [
+            {
+                'EventId': f'event-{index}',
+                'StackId': 'stack-id',
+                'StackName': 'iact3-default-cn-hangzhou',
+                'LogicalResourceId': f'Resource{index % 50}',
+                'PhysicalResourceId': f'i-{index:020d}',
+                'ResourceType': 'ALIYUN::ECS::InstanceGroup',
+                'Status': 'CREATE_COMPLETE',
+                'StatusReason': 'state changed',
+                'CreateTime': '2024-01-01T00:00:00',
+            }
+            for index in range(count)
+        ],
+    }
+
+
+def stacks(count):
+    return {
+        'RequestId': 'B288A0BE-D927-4888-B0F7-B35EF84B6E6F',
+        'TotalCount': count,
+        'PageNumber': 1,
+        'PageSize': count,
+        'Stacks': [
+            {
+                'StackId': f'stack-{index}',
+                'StackName': f'iact3-default-cn-hangzhou-{index}',
+                'RegionId': 'cn-hangzhou',
+                'Status': 'CREATE_COMPLETE',
+                'StatusReason': 'Stack CREATE completed successfully',
+                'CreateTime': '2024-01-01T00:00:00',
+                'DisableRollback': True,
+                'TimeoutInMinutes': 60,
+                'Tags': [
+                    {'Key': 'iact3-test-name', 'Value': 'default'},
+                    {'Key': 'iact3-project-name', 'Value': 'bench'},
+                ],
+            }
+            for index in range(count)
+        ],
+    }
+
+
+def plugin_for(action, body, raw):
+    plugin = StackPlugin(region_id='cn-hangzhou')
+    plugin.RAW_BODY_ENABLED = raw
+    response = {'body': body, 'headers': {}, 'statusCode': 200}
+    model_class = getattr(ros_models, f'{action}Response')
+
+    async def call_api_async(params, request, runtime):
+        return response
+
+    async def with_model(request, runtime):
+        return TeaCore.from_map(model_class(), response)
+
+    method = plugin._resolve_action(action)[1]
+    plugin._client = SimpleNamespace(call_api_async=call_api_async, **{method: with_model})
+    return plugin
+
+
+async def measure(action, body):
+    results = {}
+    for raw in (False, True):
+        plugin = plugin_for(action, body, raw)
+        await plugin.send_request(action)
+        started = time.perf_counter()
+        for _ in range(ROUNDS):
+            await plugin.send_request(action)
+        results[raw] = (time.perf_counter() - started) / ROUNDS * 1000
+    return results
+
+
+async def main():
+    RATE_LIMITER.ENABLED = False
+    for action, factory, count in (
+        ('ListStackEvents', stack_events, 5000),
+        ('ListStacks', stacks, 2000),
+    ):
+        results = await measure(action, factory(count))
+        print(
+            f'{action:<16} {count:>5} items  model: {results[False]:7.2f} ms  '
+            f'raw: {results[True]:7.2f} ms  speedup: {results[False] / results[True]:5.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
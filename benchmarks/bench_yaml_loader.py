@@ -0,0 +1,77 @@
+"""Benchmark CustomSafeLoader on large ROS templates, pure Python vs libyaml.
+
+The templates are synthetic but shaped like real ones: parameters with
+AssociationProperty and ParameterGroups metadata, and resources full of
+!Ref/!GetAtt/!Join/!Sub function tags.
+
+    python benchmarks/bench_yaml_loader.py
+"""
+import time
+
+from iact3.util import CCustomSafeLoader, PyCustomSafeLoader, yaml
+
+ROUNDS = 5
+
+
+def template(resource_count):
+    lines = [
+        "ROSTemplateFormatVersion: '2015-09-01'",
+        'Parameters:',
+        '  ZoneId:',
+        '    Type: String',
+        '    AssociationProperty: ALIYUN::ECS::Instance::ZoneId',
+        '  InstanceType:',
+        '    Type: String',
+        '    Default: ecs.g6.large',
+        'Resources:',
+    ]
+    for index in range(resource_count):
+        lines += [
+            f'  Instance{index}:',
+            '    Type: ALIYUN::ECS::Instance',
+            '    Properties:',
+            '      ZoneId: !Ref ZoneId',
+            '      InstanceType: !Ref InstanceType',
+            f'      VSwitchId: !GetAtt VSwitch{index % 8}.VSwitchId',
+            f'      SecurityGroupId: !GetAtt [SecurityGroup{index % 4}, SecurityGroupId]',
+            f"      InstanceName: !Join ['-', [!Ref ALIYUN::StackName, instance, '{index}']]",
+            "      UserData: !Sub |",
+            '        #!/bin/sh',
+            f'        echo ${{ALIYUN::StackId}} {index} > /tmp/stack',
+            '      Tags:',
+            '        - Key: iact3',
+            f'          Value: instance-{index}',
+        ]
+    lines += ['Outputs:']
+    for index in range(resource_count):
+        lines += [f'  InstanceId{index}:', f'    Value: !GetAtt Instance{index}.InstanceId']
+    return '\n'.join(lines) + '\n'
+
+
+def measure(content, loader):
+    yaml.load(content, Loader=loader)
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        yaml.load(content, Loader=loader)
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+def main():
+    if CCustomSafeLoader is None:
+        print('PyYAML is built without libyaml; only the pure Python loader is available.')
+    for resource_count in (100, 500, 1500):
+        content = template(resource_count)
+        size_kb = len(content.encode('utf-8')) / 1024
+        python_ms = measure(content, PyCustomSafeLoader)
+        if CCustomSafeLoader is None:
+            print(f'{size_kb:7.1f} KB  python: {python_ms:8.2f} ms')
+            continue
+        libyaml_ms = measure(content, CCustomSafeLoader)
+        print(
+            f'{size_kb:7.1f} KB  python: {python_ms:8.2f} ms  libyaml: {libyaml_ms:8.2f} ms  '
+            f'speedup: {python_ms / libyaml_ms:5.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
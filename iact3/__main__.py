@@ -41,9 +41,12 @@ options:
   --profile _PROFILE    set the default profile used.
   --log-prefix _LOG_PREFIX
                         set the log prefix.
+  --no-cache            do not read or write the discovery cache.
+  --refresh-cache       ignore cached discovery results and store fresh ones.
 
 commands:
   base - Create or delete or list basic resources which includes vpc,security group and several switches for testing
+  cache - Manage the local cache of discovered regions, zones, instance types and disk categories.
   cost - Give the price of the templates.
   delete - Manually clean up the stacks which were created by Iact3
   list - List stacks which were created by Iact3 for all regions.
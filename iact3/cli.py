@@ -57,6 +57,18 @@ class GlobalArgs:
         ],
         [['--profile'], {'help': 'set the default profile used.', 'dest': '_profile'}],
         [['--log-prefix'], {'help': 'set the log prefix.', 'dest': '_log_prefix'}],
+        [
+            ['--no-cache'],
+            {'action': 'store_true', 'help': 'do not read or write the discovery cache.', 'dest': '_no_cache'},
+        ],
+        [
+            ['--refresh-cache'],
+            {
+                'action': 'store_true',
+                'help': 'ignore cached discovery results and store fresh ones.',
+                'dest': '_refresh_cache',
+            },
+        ],
     ]
 
     def __init__(self):
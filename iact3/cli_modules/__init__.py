@@ -7,3 +7,4 @@ from .validate import Validate
 from .preview import Preview
 from .policy import Policy
 from .server import Server
+from .cache import Cache
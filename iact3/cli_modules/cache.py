@@ -0,0 +1,27 @@
+import logging
+
+from iact3.discovery_cache import DISCOVERY_CACHE
+
+LOG = logging.getLogger(__name__)
+
+
+class Cache:
+    '''
+    Manage the local cache of discovered regions, zones, instance types and disk categories.
+    '''
+
+    @staticmethod
+    def clear(kinds=None, regions=None) -> None:
+        '''
+        Remove cached discovery results
+        :param kinds: comma separated list of kinds to remove, default will remove all kinds
+        :param regions: comma separated list of regions to remove, default will remove all regions
+        '''
+        kinds = kinds.split(',') if kinds else None
+        unknown = [kind for kind in kinds or [] if kind not in DISCOVERY_CACHE.TTLS]
+        if unknown:
+            raise ValueError(f'Unknown cache kinds {",".join(unknown)}, choose from {",".join(DISCOVERY_CACHE.TTLS)}')
+        removed = 0
+        for region in regions.split(',') if regions else [None]:
+            removed += DISCOVERY_CACHE.invalidate(kinds, region)
+        LOG.info(f'removed {removed} cached discovery results from {DISCOVERY_CACHE.path}')
@@ -76,7 +76,7 @@ class List:
                 stack_name = stack['StackName']
                 if len(stack_name) > len(longest_stack_name):
                     longest_stack_name = stack_name
-                tags = stack['Tags']
+                tags = stack.get('Tags') or []
                 for tag in tags:
                     if tag['Key'] == f'{IAC_NAME}-test-name':
                         test_name = tag['Value']
@@ -1,10 +1,12 @@
 import json
 import logging
+from pathlib import Path
 
 from iact3.cli import CliCore
 from iact3.cli_modules.delete import Delete
 from iact3.cli_modules.list import List
 from iact3.config import DEFAULT_CONFIG_FILE
+from iact3.plan import DEFAULT_PLAN_FILE, ParameterPlan
 from iact3.testing.ros_stack import StackTest
 
 LOG = logging.getLogger(__name__)
@@ -22,6 +24,7 @@ class Test:
     @CliCore.longform_param_required('keep_failed')
     @CliCore.longform_param_required('dont_wait_for_delete')
     @CliCore.longform_param_required('failed')
+    @CliCore.longform_param_required('plan')
     async def run(
         template: str = None,
         config_file: str = None,
@@ -34,6 +37,7 @@ class Test:
         dont_wait_for_delete: bool = False,
         generate_parameters: bool = False,
         log_format: str = None,
+        plan=None,
     ) -> None:
         '''
         tests whether IaC templates are able to successfully launch
@@ -48,9 +52,11 @@ class Test:
         :param dont_wait_for_delete: exits immediately after calling delete stack
         :param generate_parameters: generate pseudo parameters
         :param log_format: comma separated list of log format (xml,json)
+        :param plan: path to a plan file written by "test plan", stale entries are resolved again and updated
         :return: None
         '''
         # todo --failed param
+        parameter_plan = ParameterPlan.load(plan) if plan else None
         tests = await StackTest.from_file(
             template=template,
             project_config_file=config_file,
@@ -61,7 +67,10 @@ class Test:
             dont_wait_for_delete=dont_wait_for_delete,
             test_names=test_names,
             output_directory=output_directory,
+            plan=parameter_plan,
         )
+        if parameter_plan is not None and parameter_plan.modified:
+            parameter_plan.save(plan)
         if generate_parameters:
             Test._get_parameters(tests)
             return
@@ -98,6 +107,41 @@ class Test:
         tests = await StackTest.from_file(template=template, project_config_file=config_file, regions=regions)
         Test._get_parameters(tests)
 
+    @staticmethod
+    @CliCore.longform_param_required('project_path')
+    @CliCore.longform_param_required('test_names')
+    async def plan(
+        template=None,
+        config_file=None,
+        regions=None,
+        test_names=None,
+        project_path=None,
+        plan_file: str = DEFAULT_PLAN_FILE,
+    ):
+        '''
+        Resolve test parameters once and lock them in a plan file for "test run --plan"
+        :param template: path to a template
+        :param config_file: path to a config file
+        :param regions: comma separated list of regions
+        :param test_names: comma separated list of tests to plan
+        :param project_path: root path of the project relative to config file and template file
+        :param plan_file: path of the plan file to write, entries of tests that are not planned are kept
+        '''
+        parameter_plan = ParameterPlan.load(plan_file) if Path(plan_file).exists() else ParameterPlan()
+        tests = await StackTest.from_file(
+            template=template,
+            project_config_file=config_file,
+            regions=regions,
+            project_path=project_path,
+            test_names=test_names,
+            plan=parameter_plan,
+        )
+        parameter_plan.save(plan_file)
+        for con in tests.configs:
+            if con.error:
+                LOG.warning(f'parameters of {con.test_name} in {con.region} are not planned: {con.error}')
+        LOG.info(f'wrote {len(parameter_plan.entries)} planned parameter sets to {plan_file}')
+
     @staticmethod
     def _get_parameters(tests: StackTest):
         all_configs = tests.configs
@@ -1,28 +1,37 @@
 import asyncio
+import copy
 import json
 import logging
 import os
 import sys
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from enum import Enum
 from functools import reduce, lru_cache
 from pathlib import Path
 from typing import Any, Dict, List, Mapping, NewType, Optional, Union, TypeVar, Type, get_type_hints
 from urllib.parse import urlparse
-from urllib.request import urlopen
+from urllib.request import url2pathname
 
 import aiofiles
 import dataclasses_jsonschema
+import jsonschema
 
 from iact3.util import yaml, CustomSafeLoader
 from alibabacloud_credentials.models import Config
 from dataclasses_jsonschema import JsonSchemaMixin, ValidationError
 
-from iact3.generate_params import ParamGenerator, IAC_NAME
+from iact3.discovery import DiscoveryRegistry
+from iact3.discovery_cache import DISCOVERY_CACHE
+from iact3.generate_params import ParamGenerator, ResolvedParameters, IAC_NAME
 from iact3.exceptions import Iact3Exception
-from iact3.plugin.base_plugin import CredentialClient
+from iact3.plugin.base_plugin import CREDENTIAL_CACHE, CredentialClient
 from iact3.plugin.oss import OssPlugin
 from iact3.plugin.ros import StackPlugin
+from iact3.preflight import SKIPPED, unsupported_reason
+from iact3.file_cache import FILE_CACHE
+from iact3.template_cache import PARSED_TEMPLATES, content_digest
 
 LOG = logging.getLogger(__name__)
 
@@ -112,6 +121,54 @@ METADATA: Mapping[str, Mapping[str, Any]] = {
     },
 }
 
+def _load_yaml(content: str):
+    return yaml.load(content, Loader=CustomSafeLoader)
+
+
+# Digests of the config documents that passed validation, per config class.
+_VALID_CONFIGS = OrderedDict()
+_VALID_CONFIGS_LOCK = threading.Lock()
+MAX_VALID_CONFIGS = 64
+
+
+@lru_cache(maxsize=None)
+def _schema_validator(config_class):
+    schema = config_class.json_schema()
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
+def validate_config(config_class, data: dict):
+    """Validate ``data`` against the JSON schema of ``config_class``.
+
+    ``JsonSchemaMixin.from_dict`` checks the schema itself and builds a new
+    validator on every call unless fastjsonschema is installed; the
+    validator here is built once per class. A document that validated before,
+    such as the merged config of an unchanged project loaded again by the web
+    server, is recognised by the digest of its canonical JSON and not
+    validated again.
+    """
+    try:
+        key = (config_class, content_digest(json.dumps(data, sort_keys=True)))
+    except (TypeError, ValueError):
+        key = None
+    with _VALID_CONFIGS_LOCK:
+        if key in _VALID_CONFIGS:
+            _VALID_CONFIGS.move_to_end(key)
+            return
+
+    error = jsonschema.exceptions.best_match(_schema_validator(config_class).iter_errors(data))
+    if error is not None:
+        raise ValidationError(str(error))
+    if key is None:
+        return
+    with _VALID_CONFIGS_LOCK:
+        _VALID_CONFIGS[key] = True
+        while len(_VALID_CONFIGS) > MAX_VALID_CONFIGS:
+            _VALID_CONFIGS.popitem(last=False)
+
+
 # types
 ParameterKey = NewType('ParameterKey', str)
 TagKey = NewType('TagKey', str)
@@ -132,9 +189,11 @@ class Auth(JsonSchemaMixin, allow_additional_props=False):
     def __hash__(self):
         return hash((self.name, self.location))
 
-    @lru_cache()
     def _get_credential(self) -> Union[CredentialClient, None]:
         file_path = Path(self.location).expanduser().resolve() if self.location else DEFAULT_AUTH_FILE
+        return CREDENTIAL_CACHE.get(('auth', self.name, str(file_path)), lambda: self._load_credential(file_path))
+
+    def _load_credential(self, file_path: Path):
         if not file_path.is_file():
             return None
         try:
@@ -210,6 +269,10 @@ class OssConfig(JsonSchemaMixin, allow_additional_props=False):
         if self.plugin is not None and not self.plugin.bucket_exist():
             raise Iact3Exception(f'oss bucket {self.bucket_name} in {self.bucket_region} region is not exist')
 
+    async def validate_bucket_async(self):
+        if self.plugin is not None and not await self.plugin.bucket_exist_async():
+            raise Iact3Exception(f'oss bucket {self.bucket_name} in {self.bucket_region} region is not exist')
+
 
 @dataclass
 class TemplateConfig(JsonSchemaMixin, allow_additional_props=False):
@@ -248,9 +311,7 @@ class TemplateConfig(JsonSchemaMixin, allow_additional_props=False):
                     if not file.endswith('.tf'):
                         continue
                     file_path = os.path.join(path, file)
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    tf_content[file_path] = content
+                    tf_content[file_path] = FILE_CACHE.load('text', file_path)
 
             if not tf_content:
                 return
@@ -263,8 +324,13 @@ class TemplateConfig(JsonSchemaMixin, allow_additional_props=False):
             }
         return template_file
 
-    @lru_cache()
     def generate_template_args(self) -> dict:
+        '''
+        Return the template arguments of this config, with local templates read
+        into the template body. Local files are loaded through the file cache,
+        so unchanged templates are not read and parsed again while changed ones
+        are picked up.
+        '''
         result = self.to_dict()
         if self.template_id or self.template_body:
             return result
@@ -276,8 +342,7 @@ class TemplateConfig(JsonSchemaMixin, allow_additional_props=False):
                 return result
             elif components.scheme == 'file':
                 try:
-                    tpl_body = urlopen(template_url).read()
-                    result[TEMPLATE_BODY] = tpl_body.decode('utf-8')
+                    result[TEMPLATE_BODY] = FILE_CACHE.load('text', url2pathname(components.netloc + components.path))
                     result.pop(TEMPLATE_URL)
                     return result
                 except Exception as ex:
@@ -300,9 +365,7 @@ class TemplateConfig(JsonSchemaMixin, allow_additional_props=False):
             if not file_path.is_file():
                 return result
             try:
-                with open(str(file_path), 'r', encoding='utf-8') as file_handle:
-                    tpl_body = yaml.load(file_handle, Loader=CustomSafeLoader)
-                    result[TEMPLATE_BODY] = json.dumps(tpl_body)
+                result[TEMPLATE_BODY] = FILE_CACHE.load('template', file_path, PARSED_TEMPLATES.to_json)
             except Exception as e:
                 LOG.debug(str(e), exc_info=True)
                 raise Iact3Exception(f'can not find a template: {str(e)}')
@@ -351,9 +414,9 @@ class HookConfig(JsonSchemaMixin, allow_additional_props=False):
             oss_prefix = f'{IAC_NAME}/{oss_prefix}'
             object_name = f"{oss_prefix}/{name_prefix}-{self.hook_name}-{self.execute_time}"
             if stdout_str:
-                self.oss_config.plugin.put_object_with_string(object_name=object_name, strings=stdout_str)
+                await self.oss_config.plugin.put_object_with_string_async(object_name=object_name, strings=stdout_str)
             elif stderr_str:
-                self.oss_config.plugin.put_object_with_string(object_name=object_name, strings=stderr_str)
+                await self.oss_config.plugin.put_object_with_string_async(object_name=object_name, strings=stderr_str)
             result.update(OSSLocation=f'oss://{self.oss_config.bucket_name}/{object_name}')
 
         return result
@@ -393,6 +456,20 @@ class TestConfig(ProjectConfig):
         self.error = None
         self.report_path = None
 
+    def for_region(self, test_name: str, region: str) -> 'TestConfig':
+        '''
+        Return a copy of this config for one region of a test. Everything but
+        the parameters, which parameter generation fills in place, is shared
+        with this config and must be treated as read-only.
+        '''
+        region_config = copy.copy(self)
+        region_config.parameters = copy.deepcopy(self.parameters)
+        region_config.test_name = test_name
+        region_config.region = region
+        region_config.error = None
+        region_config.report_path = None
+        return region_config
+
 
 T = TypeVar('T', bound='BaseConfig')
 
@@ -431,16 +508,10 @@ class BaseConfig(JsonSchemaMixin):
         if not file_path.is_file() and fail_ok:
             return config_dict
         try:
-            with open(str(file_path), 'r', encoding='utf-8') as file_handle:
-                config_dict = yaml.load(file_handle, Loader=CustomSafeLoader)
+            # The cached document is shared, while merging updates parameters in place.
+            config_dict = copy.deepcopy(FILE_CACHE.load('config', file_path, _load_yaml))
             if validate:
-                try:
-                    cls.from_dict(config_dict)
-                except ValidationError as e:
-                    LOG.warning(f'config from {file_path} is illegal.')
-                    LOG.debug(str(e), exc_info=True)
-                    if not fail_ok:
-                        raise e
+                cls._validate_source(file_path, config_dict, fail_ok)
             return config_dict
         except Exception as e:
             try:
@@ -456,6 +527,16 @@ class BaseConfig(JsonSchemaMixin):
                 raise e
         return config_dict
 
+    @classmethod
+    def _validate_source(cls, file_path: Path, config_dict: dict, fail_ok=True):
+        try:
+            validate_config(cls, config_dict)
+        except ValidationError as e:
+            LOG.warning(f'config from {file_path} is illegal.')
+            LOG.debug(str(e), exc_info=True)
+            if not fail_ok:
+                raise e
+
     @staticmethod
     def _init_oss_config(base_config):
         oss_config = base_config.project.oss_config
@@ -480,55 +561,66 @@ class BaseConfig(JsonSchemaMixin):
             project_path = DEFAULT_PROJECT_ROOT
         project_root: Path = Path(project_path).expanduser().resolve()
         project_config_path = project_root / project_config_file
-        sources = [
-            cls.generate_from_file(global_config_path),
-            cls.generate_from_file(project_config_path, fail_ok=fail_ok),
-            args or {},
-        ]
-        config = reduce(cls.merge, sources)
+        # Files are validated once, as part of the merged config; a file is only
+        # checked on its own to point at the culprit when the merged config is illegal.
+        files = {
+            global_config_path: cls.generate_from_file(global_config_path, validate=False),
+            project_config_path: cls.generate_from_file(project_config_path, fail_ok=fail_ok, validate=False),
+        }
+        config = reduce(cls.merge, [*files.values(), args or {}])
         general_config = config.get(GENERAL, {})
         merged_project_config = cls.merge(general_config, config.get(PROJECT, {}))
         merged_test_configs = {
             key: cls.merge(merged_project_config, value) for key, value in config.get(TESTS, {}).items()
         }
-        base_config = cls.from_dict(
-            {GENERAL: general_config, PROJECT: merged_project_config, TESTS: merged_test_configs}
-        )
+        merged_config = {GENERAL: general_config, PROJECT: merged_project_config, TESTS: merged_test_configs}
+        try:
+            validate_config(cls, merged_config)
+        except ValidationError:
+            for file_path, config_dict in files.items():
+                cls._validate_source(file_path, config_dict)
+            raise
+        base_config = cls.from_dict(merged_config, validate=False)
         cls._init_oss_config(base_config)
         return base_config
 
-    async def get_all_configs(self, test_names: str = None):
+    async def get_all_configs(self, test_names: str = None, plan=None):
         results = []
         base = self.tests
         test_names = test_names.split(',') if test_names else []
         param_tasks = []
+        # Generators for the same region and credential share their discovery lookups.
+        discovery = DiscoveryRegistry()
         for name, config in base.items():
             if test_names and name not in test_names:
                 continue
             regions = [region.lower() for region in config.regions]
-            if 'all' in regions or not regions:
+            # Regions the test only runs in because it runs everywhere are pruned
+            # when they can not support it; explicitly listed ones are reported as skipped.
+            prune = 'all' in regions or not regions
+            if prune:
                 all_regions = await self._get_test_regions()
                 regions = all_regions
 
             template_args = config.template_config.generate_template_args()
             if TEMPLATE_LOCATION in template_args:
                 template_args.pop(TEMPLATE_LOCATION)
-            config.template_config = TemplateConfig.from_dict(template_args)
+            config.template_config = TemplateConfig(**template_args)
+            config.oss_config = self.project.oss_config
+            for hook_name, hook_config in config.hooks.items():
+                hook_config.oss_config = self.project.oss_config
+                hook_config.hook_name = hook_name
 
             for region in regions:
-                region_config = TestConfig.from_dict(config.to_dict())
-                region_config.region = region
-                region_config.test_name = name
-                region_config.oss_config = self.project.oss_config
-                for hook_name, hook_config in region_config.hooks.items():
-                    hook_config.oss_config = self.project.oss_config
-                    hook_config.hook_name = hook_name
-
-                resolved_parameters_task = ParamGenerator.result(region_config)
+                region_config = config.for_region(name, region)
+                service = discovery.service(region, region_config.auth.credential)
+                resolved_parameters_task = self._resolve_parameters(region_config, service, plan, prune)
                 param_tasks.append(asyncio.create_task(resolved_parameters_task))
                 results.append(region_config)
         resolved_parameters = await asyncio.gather(*param_tasks)
-        for config, params in zip(results, resolved_parameters):
+        planned = [(config, params) for config, params in zip(results, resolved_parameters) if params is not None]
+        results = [config for config, _ in planned]
+        for config, params in planned:
             assert config.test_name == params.name
             assert config.region == params.region
             if params.error:
@@ -536,14 +628,30 @@ class BaseConfig(JsonSchemaMixin):
             config.parameters = params.parameters
         return results
 
+    @staticmethod
+    async def _resolve_parameters(config, discovery, plan=None, prune=False):
+        reason = await unsupported_reason(config, discovery)
+        if reason:
+            if prune:
+                LOG.info(f'test {config.test_name} will not run in {config.region}: {reason}')
+                return None
+            LOG.warning(f'skipping test {config.test_name} in {config.region}: {reason}')
+            error = Iact3Exception(f'skipped by pre-flight checks: {reason}', code=SKIPPED)
+            return ResolvedParameters(config.test_name, config.region, config.parameters, error=error)
+        if plan is None:
+            return await ParamGenerator.result(config, discovery=discovery)
+        # Locked parameters skip generation unless their entry is stale.
+        return await plan.resolve(config, discovery)
+
     def get_oss_config(self):
         oss_config = self.project.oss_config
         return oss_config.bucket_name, oss_config.bucket_region
 
     async def _get_test_regions(self):
         if self._all_regions is None:
-            plugin = StackPlugin('cn-hangzhou', self.general.auth.credential)
-            self._all_regions = await plugin.get_regions()
+            credential = self.general.auth.credential
+            plugin = StackPlugin('cn-hangzhou', credential)
+            self._all_regions = await DISCOVERY_CACHE.fetch('regions', credential, plugin.get_regions)
         return self._all_regions
 
     def get_credential(self):
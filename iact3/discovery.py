@@ -0,0 +1,302 @@
+import asyncio
+import copy
+import functools
+import logging
+import re
+import time
+
+from iact3.discovery_cache import DISCOVERY_CACHE
+from iact3.instance_types import load_instance_prices
+from iact3.plugin.base_plugin import credential_identity
+from iact3.plugin.ecs import EcsPlugin
+from iact3.plugin.ros import StackPlugin
+from iact3.plugin.vpc import VpcPlugin
+
+LOG = logging.getLogger(__name__)
+
+
+class DiscoveryService:
+    """Memoized zone, VPC, VSwitch and security group lookups for one region and credential.
+
+    One service is shared by every parameter generator of a run that targets
+    the same region with the same credential. Each distinct lookup is sent
+    once; concurrent callers wait on the same request and later callers get
+    the stored answer. Failed lookups are not stored. Callers receive their
+    own copy of every result, so choices such as which zone a generator
+    assigns to an exclusive ZoneId parameter stay per generator. VPC,
+    VSwitch and security group lookups are answered from one
+    :class:`NetworkInventory` scan of the region. Supported resource types,
+    zones, available instance types and disk categories are also kept in the
+    on-disk :data:`DISCOVERY_CACHE` for later runs. ``snapshots`` records
+    when each kind of lookup was first answered.
+    """
+
+    RE_INTERNAL_ZONE = re.compile(r'-x\d', re.IGNORECASE)
+
+    def __init__(self, region: str, credential=None):
+        self.region = region
+        self.credential = credential
+        self._tasks = {}
+        self._vpc_plugin = None
+        self._ecs_plugin = None
+        self._ros_plugin = None
+        self._instance_prices = None
+        self.snapshots = {}
+
+    @property
+    def vpc_plugin(self) -> VpcPlugin:
+        if self._vpc_plugin is None:
+            self._vpc_plugin = VpcPlugin(self.region, credential=self.credential)
+        return self._vpc_plugin
+
+    @property
+    def ecs_plugin(self) -> EcsPlugin:
+        if self._ecs_plugin is None:
+            self._ecs_plugin = EcsPlugin(self.region, credential=self.credential)
+        return self._ecs_plugin
+
+    @property
+    def ros_plugin(self) -> StackPlugin:
+        if self._ros_plugin is None:
+            self._ros_plugin = StackPlugin(self.region, credential=self.credential)
+        return self._ros_plugin
+
+    def _shared(self, key, func, *args, **kwargs):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            task.add_done_callback(lambda done: self._lookup_done(key, done))
+            self._tasks[key] = task
+        # A cancelled caller must not cancel the lookup other generators wait on.
+        return asyncio.shield(task)
+
+    async def _memoized(self, key, func, *args, **kwargs):
+        return copy.deepcopy(await self._shared(key, func, *args, **kwargs))
+
+    def _lookup_done(self, key, task):
+        if task.cancelled() or task.exception() is not None:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        else:
+            self.snapshots.setdefault(key[0], time.time())
+
+    def _persisted(self, kind: str, func, *args):
+        return functools.partial(DISCOVERY_CACHE.fetch, kind, self.credential, func, self.region, args)
+
+    async def resource_types(self) -> list:
+        """Return the resource types ROS supports; the list is account-wide, so it is cached without a region."""
+        fetch = functools.partial(
+            DISCOVERY_CACHE.fetch, 'resource_types', self.credential, self.ros_plugin.list_resource_types
+        )
+        return await self._memoized(('resource_types',), fetch)
+
+    async def zones(self) -> list:
+        try:
+            return await self._memoized(('zones',), self._persisted('zones', self._fetch_zones))
+        except Exception as ex:
+            LOG.warning(f'failed to describe zones in {self.region}: {ex}', exc_info=LOG.isEnabledFor(logging.DEBUG))
+        # The fallback answer is not kept, so the next lookup asks DescribeZones again.
+        return await self._fallback_zones()
+
+    async def available_instance_types(
+        self, zone_id=None, instance_charge_type=None, system_disk_category=None
+    ) -> list:
+        args = (zone_id, instance_charge_type, system_disk_category)
+        fetch = functools.partial(
+            self.ecs_plugin.describe_available_instance_types,
+            zone_id=zone_id,
+            instance_charge_type=instance_charge_type,
+            system_disk_category=system_disk_category,
+        )
+        return await self._memoized(('instance_types',) + args, self._persisted('instance_types', fetch, *args))
+
+    async def available_disk_categories(
+        self, zone_id=None, instance_type=None, disk_type: str = 'SystemDisk'
+    ) -> list:
+        args = (zone_id, instance_type, disk_type)
+        fetch = functools.partial(self._query_disk_categories, *args)
+        return await self._memoized(('disk_categories',) + args, self._persisted('disk_categories', fetch, *args))
+
+    async def instance_prices(self) -> dict:
+        """Hourly instance prices observed by earlier cost estimations, used as ranking weights."""
+        if self._instance_prices is None:
+            self._instance_prices = await load_instance_prices(self.region, self.credential)
+        return self._instance_prices
+
+    async def inventory(self) -> 'NetworkInventory':
+        """Return the region's network inventory, scanned once and shared; treat it as read-only."""
+        return await self._shared(('inventory',), self._scan_network)
+
+    async def get_one_vpc(self, vpc_id=None):
+        return copy.deepcopy((await self.inventory()).get_one_vpc(vpc_id))
+
+    async def describe_vpcs(self) -> list:
+        return copy.deepcopy((await self.inventory()).vpcs)
+
+    async def get_one_vswitch(self, vpc_id=None, zone_id=None):
+        return copy.deepcopy((await self.inventory()).get_one_vswitch(vpc_id, zone_id))
+
+    async def get_security_group(self, vpc_id=None):
+        return copy.deepcopy((await self.inventory()).get_security_group(vpc_id))
+
+    async def _scan_network(self) -> 'NetworkInventory':
+        vpcs, vswitches, security_groups = await asyncio.gather(
+            self.vpc_plugin.list_vpcs(), self.vpc_plugin.list_vswitches(), self.ecs_plugin.list_security_groups()
+        )
+        inventory = NetworkInventory(vpcs, vswitches, security_groups)
+        LOG.debug(
+            f'scanned network of {self.region}: {len(vpcs)} vpcs, {len(vswitches)} vswitches, '
+            f'{len(security_groups)} security groups'
+        )
+        return inventory
+
+    async def _query_disk_categories(self, zone_id, instance_type, disk_type) -> list:
+        """Query available disk categories for a given zone + instance type.
+
+        Passes InstanceChargeType=PostPaid, IoOptimized=optimized and
+        Network=vpc to match the actual ROS ECS creation parameters,
+        so the API only returns disk categories that are compatible with
+        the full property combination.
+
+        Returns a sorted list of available disk category strings. Failures
+        are raised, so they are not remembered and the next lookup retries.
+        """
+        kwargs = {
+            'DestinationResource': disk_type,
+            'InstanceChargeType': 'PostPaid',
+            'IoOptimized': 'optimized',
+            'Network': 'vpc',
+        }
+        if zone_id:
+            kwargs['ZoneId'] = zone_id
+        if instance_type:
+            kwargs['InstanceType'] = instance_type
+        resp = await self.ecs_plugin.send_request('DescribeAvailableResource', **kwargs)
+        zones = resp.get('AvailableZones', {}).get('AvailableZone', [])
+        candidates = []
+        for zone in zones:
+            resp_zone_id = zone.get('ZoneId', '')
+            if zone_id and resp_zone_id and resp_zone_id != zone_id:
+                continue
+            resources = zone.get('AvailableResources', {}).get('AvailableResource', [])
+            for res in resources:
+                items = res.get('SupportedResources', {}).get('SupportedResource', [])
+                for item in items:
+                    val = item.get('Value', '')
+                    if item.get('Status') == 'Available' and val:
+                        candidates.append(val)
+        return sorted(set(candidates))
+
+    async def _fetch_zones(self) -> list:
+        """Fetch list of available zones via ECS DescribeZones, with VSwitch fallback.
+
+        Zones are sorted in reverse alphabetical order so that newer zones
+        (e.g. cn-hangzhou-k) are preferred over older ones (e.g. cn-hangzhou-b).
+        Internal zones (e.g. cn-shenzhen-x2) are deprioritised to the end
+        of the list because they often lack VSwitches and standard resources.
+        A failing DescribeZones call is raised, so it is not remembered.
+        """
+        LOG.debug(f'resolving zones via ECS DescribeZones, region={self.region}, endpoint={self.ecs_plugin.endpoint}')
+        zones = await self.ecs_plugin.describe_zones()
+        if zones:
+            # Separate standard zones from internal zones (e.g. cn-shenzhen-x2)
+            # Internal zones have an '-x<digit>' component in the zone ID suffix.
+            standard = [z for z in zones if not self.RE_INTERNAL_ZONE.search(z)]
+            internal = [z for z in zones if self.RE_INTERNAL_ZONE.search(z)]
+            # Prefer newer standard zones first, then internal zones as last resort
+            return sorted(standard, reverse=True) + sorted(internal, reverse=True)
+        return await self._fallback_zones()
+
+    async def _fallback_zones(self) -> list:
+        """Return the zone of any VSwitch in the region, or [] when there is none."""
+        vpc_plugin = None
+        try:
+            vpc_plugin = self.vpc_plugin
+            LOG.debug(f'resolving zone via VPC VSwitch fallback, region={self.region}, endpoint={vpc_plugin.endpoint}')
+            vsw = await self.get_one_vswitch()
+            if vsw and vsw.get('ZoneId'):
+                return [vsw['ZoneId']]
+        except Exception as ex:
+            ep_info = ''
+            if vpc_plugin:
+                ep_info = f' (endpoint={vpc_plugin.endpoint})'
+            LOG.warning(
+                f'failed to find vswitch for zone fallback{ep_info}: {ex}', exc_info=LOG.isEnabledFor(logging.DEBUG)
+            )
+
+        return []
+
+
+class NetworkInventory:
+    """Index of a region's VPCs, VSwitches and security groups.
+
+    Built from one paginated scan of each kind, so choosing a VPC, VSwitch
+    and security group combination is a local lookup however many VPCs the
+    account has. VSwitches are indexed by VPC and zone, and only those with
+    at least ``MIN_FREE_IPS`` free addresses are kept; security groups are
+    indexed by VPC, leaving out service managed ones. Every lookup keeps the
+    order in which the API listed the resources.
+    """
+
+    MIN_FREE_IPS = 2
+
+    def __init__(self, vpcs: list, vswitches: list, security_groups: list):
+        self.vpcs = list(vpcs)
+        self._resource_ids = {vpc.get('VpcId') for vpc in self.vpcs}
+        self._vswitches = {}
+        for vswitch in vswitches:
+            if (vswitch.get('AvailableIpAddressCount') or 0) < self.MIN_FREE_IPS:
+                continue
+            zones = self._vswitches.setdefault(vswitch.get('VpcId'), {})
+            zones.setdefault(vswitch.get('ZoneId'), []).append(vswitch)
+            self._resource_ids.add(vswitch.get('VSwitchId'))
+        self._security_groups = {}
+        for security_group in security_groups:
+            if security_group.get('ServiceManaged'):
+                continue
+            self._security_groups.setdefault(security_group.get('VpcId'), []).append(security_group)
+            self._resource_ids.add(security_group.get('SecurityGroupId'))
+
+    def has_resource(self, resource_id: str) -> bool:
+        """Whether ``resource_id`` is a VPC, a usable VSwitch or a security group of the inventory."""
+        return resource_id in self._resource_ids
+
+    def get_one_vpc(self, vpc_id=None):
+        return next((vpc for vpc in self.vpcs if vpc_id in (None, vpc['VpcId']) and self.zones(vpc['VpcId'])), None)
+
+    def zones(self, vpc_id: str) -> list:
+        return list(self._vswitches.get(vpc_id, {}))
+
+    def get_one_vswitch(self, vpc_id=None, zone_id=None):
+        vpc_ids = [vpc_id] if vpc_id else list(self._vswitches)
+        for candidate_vpc_id in vpc_ids:
+            zones = self._vswitches.get(candidate_vpc_id, {})
+            for candidate_zone_id in [zone_id] if zone_id else list(zones):
+                vswitches = zones.get(candidate_zone_id)
+                if vswitches:
+                    return vswitches[0]
+        return None
+
+    def get_security_group(self, vpc_id=None):
+        if vpc_id:
+            security_groups = self._security_groups.get(vpc_id)
+            return security_groups[0] if security_groups else None
+        return next((groups[0] for groups in self._security_groups.values()), None)
+
+    def vpcs_with_security_groups(self) -> list:
+        """Return the ids of the VPCs that have both a usable VSwitch and a security group."""
+        return [vpc['VpcId'] for vpc in self.vpcs if self.zones(vpc['VpcId']) and vpc['VpcId'] in self._security_groups]
+
+
+class DiscoveryRegistry:
+    """The discovery services of one run, one per (region, credential)."""
+
+    def __init__(self):
+        self._services = {}
+
+    def service(self, region: str, credential=None) -> DiscoveryService:
+        key = (region, credential_identity(credential))
+        service = self._services.get(key)
+        if service is None:
+            service = self._services[key] = DiscoveryService(region, credential=credential)
+        return service
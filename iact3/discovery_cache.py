@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import ClassVar
+
+LOG = logging.getLogger(__name__)
+
+
+def account_key(credential):
+    """Return a stable, non-secret key for the account behind ``credential``.
+
+    The key is a digest of the access key id, so entries survive across
+    processes without writing the id itself to disk. ``None`` means the
+    credential has no usable access key id and results are not persisted.
+    """
+    try:
+        access_key_id = getattr(getattr(credential, 'cloud_credential', None), 'access_key_id', None)
+    except Exception:
+        LOG.debug('can not read the access key id of the credential', exc_info=True)
+        return None
+    if not access_key_id:
+        return None
+    return hashlib.sha256(access_key_id.encode('utf-8')).hexdigest()[:16]
+
+
+class DiscoveryCache:
+    """SQLite-backed cache of discovery lookups shared by CLI invocations.
+
+    Regions, supported resource types, zones, available instance types, disk
+    categories and observed instance prices change rarely, yet every run used
+    to look them up again. Answers are stored per account and region under
+    ``~/.iact3/cache`` and expire after the TTL of their kind. ``enabled``
+    turns the cache off (``--no-cache``) and ``refresh`` ignores stored
+    answers while still writing new ones (``--refresh-cache``). Empty answers
+    are never stored. Any SQLite failure disables the cache for the rest of
+    the process instead of failing the run.
+    """
+
+    DEFAULT_DIRECTORY = Path.home() / '.iact3' / 'cache'
+    FILE_NAME = 'discovery.sqlite3'
+    TTLS: ClassVar[dict] = {
+        'regions': 7 * 24 * 3600,
+        'resource_types': 24 * 3600,
+        'zones': 24 * 3600,
+        'instance_types': 3600,
+        'disk_categories': 3600,
+        'instance_prices': 7 * 24 * 3600,
+    }
+    # Failures meaning the stock or authorization a stored answer promised is gone.
+    RE_STALE_FAILURE = re.compile(
+        r'NoStock|OutOfStock|NotOnSale|ResourceNotAvailable|Unauthorized|\.NotSupported|InvalidInstanceType|'
+        r'InvalidSystemDiskCategory|InvalidDiskCategory|InvalidZoneId',
+        re.IGNORECASE,
+    )
+    # Kinds whose answers a stock or authorization failure can prove wrong.
+    STOCK_KINDS = ('instance_types', 'disk_categories', 'zones')
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory) if directory else self.DEFAULT_DIRECTORY
+        self.enabled = True
+        self.refresh = False
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self.directory / self.FILE_NAME
+
+    def configure(self, enabled: bool = True, refresh: bool = False):
+        self.enabled = enabled
+        self.refresh = refresh
+
+    def _connect(self):
+        if self._connection is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False)
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, kind TEXT NOT NULL, region TEXT, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS entries_kind_region ON entries (kind, region)')
+            with connection:
+                connection.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),))
+            self._connection = connection
+        return self._connection
+
+    def _execute(self, statement: str, parameters=()):
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    cursor = connection.execute(statement, parameters)
+                    return cursor.fetchall() if cursor.description else cursor.rowcount
+            except (sqlite3.Error, OSError) as ex:
+                LOG.warning(f'discovery cache at {self.path} is unavailable, disabling it: {ex}')
+                self.enabled = False
+                return None
+
+    @staticmethod
+    def _key(kind: str, account: str, region: str, args) -> str:
+        return json.dumps([kind, account, region, list(args)], sort_keys=True, default=str)
+
+    def get(self, kind: str, account: str, region=None, args=()):
+        if not self.enabled or self.refresh or account is None:
+            return None
+        rows = self._execute(
+            'SELECT value FROM entries WHERE key = ? AND expires_at > ?',
+            (self._key(kind, account, region, args), time.time()),
+        )
+        if not rows:
+            return None
+        return json.loads(rows[0][0])
+
+    def put(self, kind: str, account: str, region=None, args=(), value=None):
+        if not self.enabled or account is None or not value:
+            return
+        self._execute(
+            'INSERT OR REPLACE INTO entries (key, kind, region, value, expires_at) VALUES (?, ?, ?, ?, ?)',
+            (self._key(kind, account, region, args), kind, region, json.dumps(value), time.time() + self.TTLS[kind]),
+        )
+
+    async def fetch(self, kind: str, credential, func, region=None, args=()):
+        """Return the stored answer for the lookup, or await ``func()`` and store its result.
+
+        SQLite is read and written on the default executor, so a busy or slow
+        database never blocks the event loop.
+        """
+        if not self.enabled:
+            return await func()
+        account, value = await self.run(self._lookup, kind, credential, region, args)
+        if value is not None:
+            LOG.debug(f'discovery cache hit: {kind} {region} {list(args)}')
+            return value
+        value = await func()
+        await self.run(self.put, kind, account, region, args, value)
+        return value
+
+    @staticmethod
+    async def run(func, *args):
+        """Await the blocking cache call ``func(*args)`` on the default executor."""
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+    def _lookup(self, kind: str, credential, region: str, args) -> tuple:
+        account = account_key(credential)
+        return account, self.get(kind, account, region, args)
+
+    def invalidate(self, kinds=None, region=None) -> int:
+        """Drop entries of ``kinds`` (all kinds by default) in ``region`` (all regions by default)."""
+        clauses, parameters = [], []
+        if kinds:
+            clauses.append(f'kind IN ({", ".join("?" * len(kinds))})')
+            parameters += list(kinds)
+        if region:
+            clauses.append('region = ?')
+            parameters.append(region)
+        where = f' WHERE {" AND ".join(clauses)}' if clauses else ''
+        if not self.enabled or not self.path.exists():
+            return 0
+        return self._execute(f'DELETE FROM entries{where}', parameters) or 0
+
+    async def invalidate_on_failure(self, region: str, *reasons) -> bool:
+        """Drop the stock-sensitive entries of ``region`` if a failure reason shows they are stale.
+
+        Like :meth:`fetch`, the delete runs on the default executor.
+        """
+        if not region or not any(reason and self.RE_STALE_FAILURE.search(str(reason)) for reason in reasons):
+            return False
+        LOG.info(f'discarding cached discovery results for {region} after a stock or authorization failure')
+        await self.run(self.invalidate, self.STOCK_KINDS, region)
+        return True
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+DISCOVERY_CACHE = DiscoveryCache()
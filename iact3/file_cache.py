@@ -0,0 +1,63 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+LOG = logging.getLogger(__name__)
+
+
+def file_signature(path) -> tuple:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class FileLoadCache:
+    """Process-wide cache of local files read and parsed by a loader.
+
+    Entries are keyed by the kind of load and the file path and remember the
+    (mtime, size, inode) signature the file had when it was read. While that
+    signature is unchanged a load only costs a ``stat``, so long-lived
+    processes such as the web server do not read and parse unchanged config
+    and template files again. Editing, truncating or replacing a file changes
+    its signature and the next load reads it again; a file that changes
+    while it is being read is not cached. Loaded values are shared and must
+    be treated as read-only.
+    """
+
+    MAX_ENTRIES = 256
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, kind: str, path, parse=None):
+        """Return ``parse(content)`` of the file at ``path``, or its content when ``parse`` is None."""
+        path = os.fspath(path)
+        key = (kind, path)
+        signature = file_signature(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        with open(path, 'r', encoding='utf-8') as file_handle:
+            content = file_handle.read()
+        value = parse(content) if parse is not None else content
+        if file_signature(path) != signature:
+            LOG.debug(f'{path} changed while loading it, not caching it')
+            return value
+
+        with self._lock:
+            self._entries[key] = (signature, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+FILE_CACHE = FileLoadCache()
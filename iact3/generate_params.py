@@ -1,23 +1,72 @@
+import asyncio
+import functools
 import json
 import logging
 import random
 import re
 import string
+import time
 import uuid
-from urllib.parse import urlparse, parse_qs
-from urllib.request import urlopen
+from collections import OrderedDict
 
-import requests
-
-from iact3.util import yaml, CustomSafeLoader, pick_cheapest_instance_type, sort_cheapest_db_instance_classes
+from iact3.util import pick_cheapest_instance_type, sort_cheapest_db_instance_classes
+from iact3.discovery import DiscoveryService
 from iact3.exceptions import Iact3Exception
-from iact3.plugin.ecs import EcsPlugin
-from iact3.plugin.oss import OssPlugin
+from iact3.plugin.base_plugin import SINGLE_FLIGHT, RetryPolicy, credential_identity
 from iact3.plugin.ros import StackPlugin
-from iact3.plugin.vpc import VpcPlugin
+from iact3.template_cache import PARSED_TEMPLATES, TEMPLATE_CACHE, content_digest
 
 LOG = logging.getLogger(__name__)
 
+CONSTRAINTS_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=1.0, deadline=90.0)
+
+
+class ConstraintsCache:
+    """Allowed values returned by GetTemplateParameterConstraints, shared by all generators.
+
+    Entries are keyed by template digest, region, credential, parameter key
+    and the parameter values sent with the query. Identical queries in
+    flight are merged and timeouts are never stored.
+    """
+
+    TTL = 600.0
+    MAX_ENTRIES = 4096
+
+    def __init__(self):
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, values = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return list(values) if values is not None else None
+
+    def put(self, key, values):
+        self._entries[key] = (time.monotonic() + self.TTL, list(values) if values is not None else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    async def fetch(self, key, func):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return self.get(key)
+        values = await SINGLE_FLIGHT.do(('TemplateParameterConstraints',) + key, func)
+        if values != 'timeout':
+            self.put(key, values)
+        return values
+
+    def clear(self):
+        self._entries.clear()
+
+
+CONSTRAINTS_CACHE = ConstraintsCache()
+
 IAC_NAME = 'iact3'
 IAC_PACKAGE_NAME = 'alibabacloud-ros-iact3'
 
@@ -118,7 +167,7 @@ class ParamGenerator:
     # false positives from the DescribeAvailableResource API.
     SAFE_DISK_CATEGORIES = ('cloud_essd', 'cloud_ssd', 'cloud_efficiency', 'cloud_auto')
 
-    def __init__(self, config):
+    def __init__(self, config, discovery: DiscoveryService = None):
         self.config = config
         self.region = config.region
         self.parameters = config.parameters
@@ -126,21 +175,24 @@ class ParamGenerator:
         self.parameters_order = config.parameters_order
         self.credential = config.auth.credential
         self.plugin = StackPlugin(region_id=self.region, credential=self.credential)
+        self.discovery = discovery or DiscoveryService(self.region, credential=self.credential)
         self._vpc_id = None
         self._vsw_id = None
         self._vsw_assignments = {}
         self._not_support_keys = None
-        self._linked_list: LinkedList = LinkedList()
+        self._template_digest = None
+        self._associations = {}
         self._unresolved_parameters = {}
         self._template_defaults_cache = None
         self._association_property_cache = None
         self._zone_list_cache = None
         self._zone_assignments = {}
         self._resolved_disk_category = None  # Set by _resolve_instance_type when disk-aware query succeeds
+        self._candidate_types = {}  # {(zone_id, disk_category): set of instance types}
 
     @classmethod
-    async def result(cls, config) -> ResolvedParameters:
-        pg = cls(config)
+    async def result(cls, config, discovery: DiscoveryService = None) -> ResolvedParameters:
+        pg = cls(config, discovery=discovery)
         LOG.debug(f'start to generate parameters for {config.test_name}')
         error = None
         try:
@@ -228,8 +280,7 @@ class ParamGenerator:
         }
         for key in final_remaining:
             try:
-                plugin = VpcPlugin(self.region, credential=self.credential)
-                vsw = await plugin.get_one_vswitch()
+                vsw = await self.discovery.get_one_vswitch()
                 if vsw and vsw.get('ZoneId'):
                     self.parameters[key] = vsw['ZoneId']
                     LOG.warning(f'resolved zone parameter {key} via final VSwitch fallback: {vsw["ZoneId"]}')
@@ -259,6 +310,12 @@ class ParamGenerator:
                     LOG.debug(f'resolved parameter {key} via name-based fallback: {default_val}')
                     break
 
+    async def _get_parsed_template(self):
+        template = await self._get_template_body()
+        if not template:
+            return None
+        return PARSED_TEMPLATES.get(template)
+
     async def _get_template_defaults(self) -> dict:
         """Parse template and return a dict of {param_name: Default} for parameters that have Default values."""
         if self._template_defaults_cache is not None:
@@ -266,18 +323,9 @@ class ParamGenerator:
 
         defaults = {}
         try:
-            template = await self._get_template_body()
-            if not template:
-                self._template_defaults_cache = defaults
-                return defaults
-            parsed_tpl = yaml.load(template, Loader=CustomSafeLoader)
-            tpl_params = parsed_tpl.get('Parameters', {})
-            if isinstance(tpl_params, dict):
-                for param_name, param_def in tpl_params.items():
-                    if isinstance(param_def, dict) and 'Default' in param_def:
-                        default_val = param_def['Default']
-                        if default_val is not None:
-                            defaults[param_name] = str(default_val) if not isinstance(default_val, str) else default_val
+            parsed_tpl = await self._get_parsed_template()
+            if parsed_tpl:
+                defaults = dict(parsed_tpl.defaults)
         except Exception as ex:
             LOG.debug(f'failed to get template defaults: {ex}', exc_info=True)
 
@@ -291,16 +339,9 @@ class ParamGenerator:
 
         props = {}
         try:
-            template = await self._get_template_body()
-            if not template:
-                self._association_property_cache = props
-                return props
-            parsed_tpl = yaml.load(template, Loader=CustomSafeLoader)
-            tpl_params = parsed_tpl.get('Parameters', {})
-            if isinstance(tpl_params, dict):
-                for param_name, param_def in tpl_params.items():
-                    if isinstance(param_def, dict) and 'AssociationProperty' in param_def:
-                        props[param_name] = param_def['AssociationProperty']
+            parsed_tpl = await self._get_parsed_template()
+            if parsed_tpl:
+                props = dict(parsed_tpl.association_properties)
         except Exception as ex:
             LOG.debug(f'failed to get association properties: {ex}', exc_info=True)
 
@@ -336,14 +377,8 @@ class ParamGenerator:
                 resolved_zone = await self._resolve_zone_id(key)
                 if resolved_zone:
                     self.parameters[key] = resolved_zone
-            elif self.RE_K_COMMON_NAME.fullmatch(key):
-                value = self._gen_common_name()
-                self.parameters[key] = re.sub(self.RE_V_AUTO, value, unresolved_value)
-            elif self.RE_K_PASSWORD.fullmatch(key):
-                value = self._gen_password()
-                self.parameters[key] = re.sub(self.RE_V_AUTO, value, unresolved_value)
-            elif self.RE_K_UUID.fullmatch(key):
-                value = self._gen_uuid()
+            elif self._value_generator(key) is not None:
+                value = self.generate_value(key)
                 self.parameters[key] = re.sub(self.RE_V_AUTO, value, unresolved_value)
             elif self.RE_K_SECURITY_GROUP.fullmatch(key):
                 if self._vpc_id is None:
@@ -375,7 +410,7 @@ class ParamGenerator:
         return self.parameters
 
     async def resolve_auto_value(self):
-        linked_list = LinkedList()
+        auto_keys = []
         resolved_parameters = {}
         parameters_order = self.parameters_order
         if not parameters_order:
@@ -401,116 +436,224 @@ class ParamGenerator:
                     self._unresolved_parameters[key] = original_value  # For Pass 2
                     continue
                 resolved_parameters[key] = None
-                linked_list.append(key, original_value, parameters=resolved_parameters)
+                auto_keys.append(key)
             elif self.RE_V_CURRENT_REGION.fullmatch(original_value):
                 resolved_parameters[key] = self.region
             else:
                 resolved_parameters[key] = original_value
 
-        self._linked_list = linked_list
-        first_selector = linked_list.first()
-        if not first_selector:
+        if not auto_keys:
             return resolved_parameters
-        resolved_parameters = await self._select_value(first_selector)
+
+        await self._prefetch_constraints(auto_keys, resolved_parameters)
+        components = await self._independent_components(auto_keys)
+        linked_lists = []
+        for component in components:
+            # Each component queries constraints with only its own choices filled in.
+            component_parameters = dict(resolved_parameters)
+            component_list = LinkedList()
+            for key in component:
+                component_list.append(key, self.parameters[key], parameters=component_parameters)
+            linked_lists.append(component_list)
+        if len(linked_lists) > 1:
+            LOG.debug(f'resolving auto parameters as independent groups {components}')
+
+        results = await asyncio.gather(
+            *[self._select_value(component_list) for component_list in linked_lists], return_exceptions=True
+        )
+        error = None
+        for component, result in zip(components, results):
+            if isinstance(result, BaseException):
+                error = error or result
+                continue
+            resolved_parameters.update({key: result[key] for key in component})
         self.parameters.update(resolved_parameters)
         self.parameters.update(self._unresolved_parameters)
+        if error is not None:
+            raise error
         return self.parameters
 
-    async def _get_constraints(self, **kwargs):
-        for _ in range(3):
-            constraints = await self.plugin.get_parameter_constraints(**kwargs)
-            behavior = constraints[0].get('Behavior')
-            values = constraints[0].get('AllowedValues')
-            reason = constraints[0].get('BehaviorReason')
-            if behavior == 'QueryError' and reason and 'timeout' in reason:
-                LOG.debug(f'get constraints timeout, {constraints}')
+    async def _independent_components(self, auto_keys: list) -> list:
+        """Split the auto keys into groups whose constraints do not depend on each other.
+
+        Keys are linked when one references the other through
+        AssociationPropertyMetadata or is listed in the other's
+        AssociationParameterNames. Keys the constraints API reported no
+        associations for stay in one group, resolved in order as before.
+        Each group keeps the parameters order.
+        """
+        parent = {key: key for key in auto_keys}
+
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        def union(key, other):
+            if other in parent:
+                parent[find(other)] = find(key)
+
+        try:
+            parsed_tpl = await self._get_parsed_template()
+        except Exception as ex:
+            LOG.debug(f'failed to read association metadata: {ex}', exc_info=True)
+            parsed_tpl = None
+        references = parsed_tpl.association_references if parsed_tpl else {}
+
+        unknown = None
+        for key in auto_keys:
+            for other in references.get(key, ()):
+                union(key, other)
+            associations = self._associations.get(key)
+            if associations is None:
+                if unknown is None:
+                    unknown = key
+                union(unknown, key)
                 continue
-            if behavior == 'NotSupport':
-                return
-            return values
-        else:
-            return 'timeout'
+            for other in associations:
+                union(key, other)
 
-    async def _select_value(self, selector: Selector, error_message=None) -> dict:
-        key = selector.key
-        parameters = selector.parameters
-        allowed_values = selector.allowed_values
-        current_value = selector.current_value
-        error_msg = (
-            f'can not find any available value for {key} in {self.region} region '
-            f'in {allowed_values} for {self.config.test_name}'
+        components = {}
+        for key in auto_keys:
+            components.setdefault(find(key), []).append(key)
+        return list(components.values())
+
+    async def _get_constraints(self, **kwargs):
+        constraints = await CONSTRAINTS_RETRY_POLICY.call_async(
+            functools.partial(self.plugin.get_parameter_constraints, **kwargs),
+            retry_if_result=self._is_constraints_timeout,
+        )
+        if self._is_constraints_timeout(constraints):
+            LOG.debug(f'get constraints timeout, {constraints}')
+            return 'timeout'
+        if constraints[0].get('Behavior') == 'NotSupport':
+            return
+        return constraints[0].get('AllowedValues')
+
+    @staticmethod
+    def _is_constraints_timeout(constraints) -> bool:
+        behavior = constraints[0].get('Behavior')
+        reason = constraints[0].get('BehaviorReason')
+        return bool(behavior == 'QueryError' and reason and 'timeout' in reason)
+
+    async def _constraints_cache_key(self, key, parameters) -> tuple:
+        if self._template_digest is None:
+            self._template_digest = content_digest(await self._get_template_body() or '')
+        return (
+            self._template_digest,
+            self.region,
+            credential_identity(self.credential),
+            key,
+            json.dumps(parameters, sort_keys=True, default=str),
+            tuple(self.parameters_order or ()),
         )
 
-        if allowed_values:
-            next_selector = selector.next
-            if not next_selector:
-                return selector.parameters
-            index = allowed_values.index(current_value)
-            if index + 1 >= len(allowed_values):
-                prev_selector = selector.prev
-                if not prev_selector:
-                    raise Iact3Exception(error_message or error_msg)
-                return await self._select_value(prev_selector, error_message=error_message)
-            selector.current_value = allowed_values[index + 1]
-            next_selector.parameters[key] = selector.current_value
-            next_selector.allowed_values = []
-            return await self._select_value(next_selector, error_message=error_message)
-
-        values = await self._get_constraints(
-            parameters=parameters,
-            **self.template_config.to_dict(),
-            parameters_key_filter=[key],
-            parameters_order=self.parameters_order,
+    async def _get_allowed_values(self, key, parameters: dict):
+        if key in (self._not_support_keys or ()):
+            return None
+        cache_key = await self._constraints_cache_key(key, parameters)
+        independent = CONSTRAINTS_CACHE.get(cache_key[:4] + (None,) + cache_key[5:])
+        if independent is not None:
+            return independent
+        return await CONSTRAINTS_CACHE.fetch(
+            cache_key,
+            functools.partial(
+                self._get_constraints,
+                parameters=dict(parameters),
+                **self.template_config.to_dict(),
+                parameters_key_filter=[key],
+                parameters_order=self.parameters_order,
+            ),
         )
+
+    async def _prefetch_constraints(self, keys: list, parameters: dict):
+        """Query the constraints of every auto key in one call.
+
+        The response is exact for the first key, tells which keys are not
+        supported at all and which parameters each key is associated with;
+        all of that is reused so those keys are not queried one by one.
+        """
+        if len(keys) < 2 or self._not_support_keys is not None:
+            return
+        self._not_support_keys = set()
+
+        parameters = dict(parameters)
+        try:
+            constraints = await CONSTRAINTS_RETRY_POLICY.call_async(
+                functools.partial(
+                    self.plugin.get_parameter_constraints,
+                    parameters=dict(parameters),
+                    **self.template_config.to_dict(),
+                    parameters_key_filter=keys,
+                    parameters_order=self.parameters_order,
+                ),
+                retry_if_result=self._is_constraints_timeout,
+            )
+        except Exception as ex:
+            LOG.debug(f'failed to prefetch constraints for {keys}: {ex}', exc_info=True)
+            return
+
+        for constraint in constraints or []:
+            key = constraint.get('ParameterKey')
+            behavior = constraint.get('Behavior')
+            if key not in keys or behavior == 'QueryError':
+                continue
+            if behavior == 'NotSupport':
+                self._not_support_keys.add(key)
+                continue
+            associations = constraint.get('AssociationParameterNames')
+            if associations is not None:
+                self._associations[key] = list(associations)
+            values = constraint.get('AllowedValues')
+            if values is None:
+                continue
+            cache_key = await self._constraints_cache_key(key, parameters)
+            if key == keys[0]:
+                CONSTRAINTS_CACHE.put(cache_key, values)
+            elif associations == []:
+                CONSTRAINTS_CACHE.put(cache_key[:4] + (None,) + cache_key[5:], values)
+
+    async def _candidate_values(self, selector: Selector):
+        """Return the values to try for ``selector`` given the keys resolved before it.
+
+        Returns None when the key can not be resolved through constraints and
+        is left to later stages, or an empty list when nothing fits the
+        current prefix and the solver has to backtrack.
+        """
+        key = selector.key
+        values = await self._get_allowed_values(key, selector.parameters)
+        if values == 'timeout':
+            msg = f'get constraints timeout for {key} in {self.region} region for {self.config.test_name}'
+            raise Iact3Exception(msg)
+
         if values is None:
             # NotSupport from constraints API — try direct resolution for ZoneId
             if self.RE_K_ZONE_ID.fullmatch(key):
                 resolved_zone = await self._resolve_zone_id(key)
                 if resolved_zone:
-                    selector.parameters[key] = resolved_zone
                     LOG.debug(f'resolved zone parameter {key} via ECS DescribeZones: {resolved_zone}')
-                    next_selector = selector.next
-                    if not next_selector:
-                        return selector.parameters
-                    next_selector.parameters[key] = resolved_zone
-                    return await self._select_value(next_selector, error_message=error_message)
-            next_selector = selector.next
-            self._unresolved_parameters[key] = selector.original_value
-            self._linked_list.remove(key)
-            if not next_selector:
-                return selector.parameters
-            return await self._select_value(next_selector, error_message=error_message)
-        elif values == 'timeout':
-            msg = f'get constraints timeout for {key} in {self.region} region for {self.config.test_name}'
-            raise Iact3Exception(msg)
-        elif not values:
-            # Try template Default value as fallback before raising
+                    return [resolved_zone]
+            return None
+
+        if not values:
+            # Try template Default value as fallback before backtracking
             defaults = await self._get_template_defaults()
             if key in defaults:
-                selector.parameters[key] = defaults[key]
                 LOG.debug(f'used template default for {key} during constraint resolution: {defaults[key]}')
-                next_selector = selector.next
-                if not next_selector:
-                    return selector.parameters
-                next_selector.parameters[key] = defaults[key]
-                return await self._select_value(next_selector, error_message=error_message)
+                return [defaults[key]]
 
             # For ZoneId parameters, try direct ECS DescribeZones resolution
             if self.RE_K_ZONE_ID.fullmatch(key):
                 resolved_zone = await self._resolve_zone_id(key)
                 if resolved_zone:
-                    selector.parameters[key] = resolved_zone
-                    LOG.debug(f'resolved zone parameter {key} via ECS DescribeZones (empty constraints): {resolved_zone}')
-                    next_selector = selector.next
-                    if not next_selector:
-                        return selector.parameters
-                    next_selector.parameters[key] = resolved_zone
-                    return await self._select_value(next_selector, error_message=error_message)
-
-            prev_selector = selector.prev
-            if prev_selector:
-                error_msg = f'no available value found for {key} in {self.region} region for {self.config.test_name}'
-                return await self._select_value(prev_selector, error_message=error_msg)
+                    LOG.debug(
+                        f'resolved zone parameter {key} via ECS DescribeZones (empty constraints): {resolved_zone}'
+                    )
+                    return [resolved_zone]
+
+            if selector.prev is not None:
+                return []
 
             # No previous selector to backtrack to and no template Default.
             # Treat as unresolved (same as NotSupport) so later stages can handle it
@@ -519,41 +662,74 @@ class ParamGenerator:
                 f'constraints API returned empty values for {key} and no template Default available, '
                 f'marking as unresolved'
             )
-            next_selector = selector.next
-            self._unresolved_parameters[key] = selector.original_value
-            self._linked_list.remove(key)
-            if not next_selector:
-                return selector.parameters
-            return await self._select_value(next_selector, error_message=error_message)
+            return None
 
         # For RDS DBInstanceClass, sort values from cheapest to most expensive
         if self.RE_K_DB_INSTANCE_CLASS.fullmatch(key):
             values = sort_cheapest_db_instance_classes(values)
+        return values
+
+    async def _select_value(self, linked_list: LinkedList, error_message=None) -> dict:
+        """Pick a value for every selector in ``linked_list``, backtracking when a key has no value.
 
-        selector.allowed_values = values
-        selector.current_value = values[0]
-        selector.parameters[key] = selector.current_value
-        next_selector = selector.next
-        if not next_selector:
-            return selector.parameters
-        next_selector.parameters[key] = selector.current_value
-        return await self._select_value(next_selector, error_message=error_message)
+        Every selector after the current one is kept at None, so the
+        constraints of a key are always queried with exactly the values chosen
+        before it; repeated prefixes are answered from CONSTRAINTS_CACHE.
+        """
+        selector = linked_list.first()
+        parameters = selector.parameters
+
+        backtracking = False
+        while selector is not None:
+            key = selector.key
+            if backtracking:
+                allowed_values = selector.allowed_values
+                index = allowed_values.index(selector.current_value)
+                if index + 1 < len(allowed_values):
+                    selector.current_value = allowed_values[index + 1]
+                    selector.refresh_parameters()
+                    backtracking = False
+                    selector = selector.next
+                    continue
+
+                selector.allowed_values = []
+                parameters[key] = None
+                if selector.prev is None:
+                    raise Iact3Exception(
+                        error_message
+                        or f'can not find any available value for {key} in {self.region} region '
+                        f'in {allowed_values} for {self.config.test_name}'
+                    )
+                selector = selector.prev
+                continue
+
+            parameters[key] = None
+            values = await self._candidate_values(selector)
+            if values is None:
+                next_selector = selector.next
+                self._unresolved_parameters[key] = selector.original_value
+                linked_list.remove(key)
+                selector = next_selector
+            elif not values:
+                error_message = (
+                    f'no available value found for {key} in {self.region} region for {self.config.test_name}'
+                )
+                backtracking = True
+                selector = selector.prev
+            else:
+                selector.allowed_values = values
+                selector.current_value = values[0]
+                selector.refresh_parameters()
+                selector = selector.next
+        return parameters
 
     async def _get_parameters_order(self):
-        template = await self._get_template_body()
-        if not template:
+        parsed_tpl = await self._get_parsed_template()
+        if not parsed_tpl:
             raise Iact3Exception(f'failed to retrieve template by template config {self.template_config}')
-        parsed_tpl = yaml.load(template, Loader=CustomSafeLoader)
-        param_groups = parsed_tpl.get('Metadata', {}).get('ALIYUN::ROS::Interface', {}).get('ParameterGroups', [])
-        if not param_groups:
+        if parsed_tpl.parameter_groups_order is None:
             return
-        params_in_metadata = []
-        for param_group in param_groups:
-            params = param_group.get('Parameters', []) if param_group else None
-            if not params:
-                continue
-            standard_params = [p for p in params if isinstance(p, str)]
-            params_in_metadata += standard_params
+        params_in_metadata = list(parsed_tpl.parameter_groups_order)
 
         for key in self.parameters:
             if key not in params_in_metadata:
@@ -562,83 +738,11 @@ class ParamGenerator:
         self.parameters_order = params_in_metadata
         return params_in_metadata
 
-    template_max_size = 524288
-
     async def _get_template_body(self):
-        template_body = self.template_config.template_body
-        if template_body:
-            return template_body
-
-        template_id = self.template_config.template_id
-        if template_id:
-            try:
-                template_info = await self.plugin.get_template(
-                    template_id=template_id, template_version=self.template_config.template_version
-                )
-                return template_info['TemplateBody']
-            except Exception as ex:
-                raise Iact3Exception(f'Failed to retrieve {template_id}: {ex}')
-
-        template_url = self.template_config.template_url
-        if template_url:
-            components = urlparse(template_url)
-            if components.scheme == 'oss':
-                return self._get_template_from_oss(template_url, components)
-            elif components.scheme == 'file':
-                try:
-                    return urlopen(template_url).read()
-                except Exception as ex:
-                    raise Iact3Exception(f'Failed to retrieve {template_url}: {ex}')
-            else:
-                try:
-                    resp = requests.get(template_url, timeout=10, stream=True)
-                    resp.raise_for_status()
-
-                    reader = resp.iter_content(chunk_size=1000)
-                    result = b''
-                    max_size = self.template_max_size
-                    for chunk in reader:
-                        result += chunk
-                        if len(result) > max_size:
-                            raise Iact3Exception(
-                                f'template from {template_url}exceeds maximum allowed size ({max_size} bytes)'
-                            )
-                    return result
-                except Exception as ex:
-                    raise Iact3Exception(f'Failed to retrieve {template_url}: {ex}')
-
-    def _get_template_from_oss(self, template_url, components):
-        bucket_name = components.netloc
-        object_path = components.path.strip('/')
-        if not bucket_name or not object_path:
-            raise Iact3Exception(f'Invalid oss url {template_url}')
-        region_id = self.region
-        if components.query:
-            t = parse_qs(components.query)
-            region_ids = t.get('RegionId')
-            region_id = region_ids[0] if region_ids else self.region
-
-        oss_plugin = OssPlugin(region_id=region_id, bucket_name=bucket_name, credential=self.credential)
-        try:
-            object_meta = oss_plugin.get_object_meta(object_path)
-        except Exception as ex:
-            raise Iact3Exception(f'Oss failed: {ex}')
-        if object_meta is None:
-            raise Iact3Exception(f'Invalid oss url {template_url}')
-        if object_meta.content_length > self.template_max_size:
-            raise Iact3Exception(f'template from {template_url} exceeds maximum allowed size (524288 bytes)')
-
-        try:
-            r = oss_plugin.get_object_content(object_path)
-        except Exception as ex:
-            raise Iact3Exception(f'Oss failed: {ex}')
-        if r is None:
-            raise Iact3Exception(f'Invalid oss url {template_url}')
-        return r.read()
+        return await TEMPLATE_CACHE.get(self.template_config, self.region, self.credential)
 
     async def _gen_vpc_id(self, key, value):
-        plugin = VpcPlugin(self.region, credential=self.credential)
-        vpc = await plugin.get_one_vpc()
+        vpc = await self.discovery.get_one_vpc()
         if not vpc:
             msg = f'can not find any vpc in region {self.region}'
             raise Iact3Exception(_error_message(key, value, msg))
@@ -661,7 +765,7 @@ class ParamGenerator:
                 return zone_keys[index]
         return zone_keys[0] if len(zone_keys) == 1 else None
 
-    async def _vswitch_assignments_for_vpc(self, vpc_id, plugin):
+    def _vswitch_assignments_for_vpc(self, vpc_id, inventory):
         assignments = {}
         vswitch_parameters = [
             name for name in self.parameters if self.RE_K_VSW_ID.fullmatch(name)
@@ -680,10 +784,7 @@ class ParamGenerator:
                     and not self.RE_V_AUTO.fullmatch(candidate_zone)
                 ):
                     zone_id = candidate_zone
-            vswitch = await plugin.get_one_vswitch(
-                vpc_id=vpc_id,
-                zone_id=zone_id,
-            )
+            vswitch = inventory.get_one_vswitch(vpc_id=vpc_id, zone_id=zone_id)
             if not vswitch:
                 return None
             assignments[parameter_name] = {
@@ -728,8 +829,8 @@ class ParamGenerator:
                 self.parameters[zone_key] = zone_id
                 zone_unresolved = False
 
-        plugin = VpcPlugin(self.region, credential=self.credential)
-        vsw = await plugin.get_one_vswitch(
+        inventory = await self.discovery.inventory()
+        vsw = inventory.get_one_vswitch(
             vpc_id=self._vpc_id,
             zone_id=zone_id if not zone_unresolved else None,
         )
@@ -746,21 +847,15 @@ class ParamGenerator:
             for alt_zone in self._zone_list_cache:
                 if alt_zone == zone_id or alt_zone in used_zones:
                     continue
-                try:
-                    vsw = await plugin.get_one_vswitch(
-                        vpc_id=self._vpc_id,
-                        zone_id=alt_zone,
-                    )
-                    if vsw:
-                        LOG.debug(f'found vswitch in alternative zone {alt_zone}')
-                        # Update the zone parameter to the zone that actually has a VSwitch
-                        if zone_key:
-                            self.parameters[zone_key] = alt_zone
-                            self._zone_assignments[zone_key] = alt_zone
-                        zone_id = alt_zone
-                        break
-                except Exception:
-                    continue
+                vsw = inventory.get_one_vswitch(vpc_id=self._vpc_id, zone_id=alt_zone)
+                if vsw:
+                    LOG.debug(f'found vswitch in alternative zone {alt_zone}')
+                    # Update the zone parameter to the zone that actually has a VSwitch
+                    if zone_key:
+                        self.parameters[zone_key] = alt_zone
+                        self._zone_assignments[zone_key] = alt_zone
+                    zone_id = alt_zone
+                    break
 
         if not vsw:
             msg = f'can not find any vswitch in zone {zone_id}' if not zone_unresolved else f'can not find any vswitch in region {self.region}'
@@ -798,35 +893,9 @@ class ParamGenerator:
             for k, v in self.parameters.items()
             if isinstance(v, str) and self.RE_V_AUTO.fullmatch(v)
         )
-        if has_sg_param:
-            ecs_plugin = EcsPlugin(self.region, credential=self.credential)
-            sg = await ecs_plugin.get_security_group(vpc_id=self._vpc_id)
-            if not sg:
-                LOG.debug(f'vpc {self._vpc_id} has vswitch but no security group, trying other vpcs')
-                vpc_plugin = VpcPlugin(self.region, credential=self.credential)
-                response = await vpc_plugin.send_request('DescribeVpcsRequest', PageSize=50)
-                vpcs = response.get('Vpcs', {}).get('Vpc', [])
-                for vpc in vpcs:
-                    candidate_vpc_id = vpc['VpcId']
-                    if candidate_vpc_id == self._vpc_id:
-                        continue
-                    sg = await ecs_plugin.get_security_group(vpc_id=candidate_vpc_id)
-                    if sg:
-                        assignments = await self._vswitch_assignments_for_vpc(
-                            candidate_vpc_id,
-                            vpc_plugin,
-                        )
-                        if assignments is not None:
-                            old_vpc_id = self._vpc_id
-                            self._apply_vswitch_assignments(candidate_vpc_id, assignments)
-                            for pname in list(self.parameters):
-                                if self.RE_K_VPC_ID.fullmatch(pname):
-                                    self.parameters[pname] = self._vpc_id
-                            LOG.debug(
-                                f'switched from vpc {old_vpc_id} to {self._vpc_id} '
-                                f'(vswitches={self._vsw_assignments}, sg={sg["SecurityGroupId"]})'
-                            )
-                            break
+        if has_sg_param and not inventory.get_security_group(vpc_id=self._vpc_id):
+            LOG.debug(f'vpc {self._vpc_id} has vswitch but no security group, trying other vpcs')
+            self._switch_to_vpc_with_security_group(inventory)
 
         return self._vpc_id, self._vsw_id
 
@@ -872,102 +941,91 @@ class ParamGenerator:
         return zones[0]
 
     async def _fetch_available_zones(self) -> list:
-        """Fetch list of available zones via ECS DescribeZones, with VSwitch fallback.
-
-        Zones are sorted in reverse alphabetical order so that newer zones
-        (e.g. cn-hangzhou-k) are preferred over older ones (e.g. cn-hangzhou-b).
-        Internal zones (e.g. cn-shenzhen-x2) are deprioritised to the end
-        of the list because they often lack VSwitches and standard resources.
-        """
-        # Primary: use ECS DescribeZones API to get available zones in the region
-        ecs_plugin = None
-        try:
-            ecs_plugin = EcsPlugin(self.region, credential=self.credential)
-            LOG.debug(f'resolving zones via ECS DescribeZones, region={self.region}, endpoint={ecs_plugin.endpoint}')
-            zones = await ecs_plugin.describe_zones()
-            if zones:
-                # Separate standard zones from internal zones (e.g. cn-shenzhen-x2)
-                # Internal zones have an '-x<digit>' component in the zone ID suffix.
-                internal_pattern = re.compile(r'-x\d', re.IGNORECASE)
-                standard = [z for z in zones if not internal_pattern.search(z)]
-                internal = [z for z in zones if internal_pattern.search(z)]
-                # Prefer newer standard zones first, then internal zones as last resort
-                return sorted(standard, reverse=True) + sorted(internal, reverse=True)
-        except Exception as ex:
-            ep_info = ''
-            if ecs_plugin:
-                ep_info = f' (endpoint={ecs_plugin.endpoint})'
-            LOG.warning(f'failed to describe zones{ep_info}: {ex}')
-
-        # Fallback: find any VSwitch in the region and use its ZoneId
-        vpc_plugin = None
-        try:
-            vpc_plugin = VpcPlugin(self.region, credential=self.credential)
-            LOG.debug(f'resolving zone via VPC VSwitch fallback, region={self.region}, endpoint={vpc_plugin.endpoint}')
-            vsw = await vpc_plugin.get_one_vswitch()
-            if vsw and vsw.get('ZoneId'):
-                return [vsw['ZoneId']]
-        except Exception as ex:
-            ep_info = ''
-            if vpc_plugin:
-                ep_info = f' (endpoint={vpc_plugin.endpoint})'
-            LOG.warning(f'failed to find vswitch for zone fallback{ep_info}: {ex}')
-
-        return []
+        """Return the region's zones, newest standard zones first; see DiscoveryService.zones."""
+        return await self.discovery.zones()
 
     def _safe_endpoint(self, product) -> str:
         """Get expected endpoint string for logging without creating a plugin instance."""
         return f'{product}.{self.region}.aliyuncs.com'
 
     async def _query_disk_available(self, zone_id, instance_type, disk_type='SystemDisk'):
-        """Query available disk categories for a given zone + instance type.
-
-        Passes InstanceChargeType=PostPaid, IoOptimized=optimized and
-        Network=vpc to match the actual ROS ECS creation parameters,
-        so the API only returns disk categories that are compatible with
-        the full property combination.
-
-        Returns a list of available disk category strings, or [] on failure.
-        """
+        """Return the disk categories available for ``instance_type`` in ``zone_id``, or [] on failure."""
         try:
-            kwargs = {
-                'DestinationResource': disk_type,
-                'InstanceChargeType': 'PostPaid',
-                'IoOptimized': 'optimized',
-                'Network': 'vpc',
-            }
-            if zone_id:
-                kwargs['ZoneId'] = zone_id
-            if instance_type:
-                kwargs['InstanceType'] = instance_type
-            ecs_plugin = EcsPlugin(self.region, credential=self.credential)
-            resp = await ecs_plugin.send_request('DescribeAvailableResource', **kwargs)
-            zones = resp.get('AvailableZones', {}).get('AvailableZone', [])
-            candidates = []
-            for zone in zones:
-                resp_zone_id = zone.get('ZoneId', '')
-                if zone_id and resp_zone_id and resp_zone_id != zone_id:
-                    continue
-                resources = zone.get('AvailableResources', {}).get('AvailableResource', [])
-                for res in resources:
-                    items = res.get('SupportedResources', {}).get('SupportedResource', [])
-                    for item in items:
-                        val = item.get('Value', '')
-                        if item.get('Status') == 'Available' and val:
-                            candidates.append(val)
-            return list(set(candidates))
+            return await self.discovery.available_disk_categories(
+                zone_id=zone_id, instance_type=instance_type, disk_type=disk_type
+            )
         except Exception as ex:
             LOG.debug(f'failed to query {disk_type} for {instance_type} in {zone_id}: {ex}')
             return []
 
+    def _fixed_value(self, pattern, association_property, ap_map):
+        """Return the explicit (non-auto) value of the first parameter matching ``pattern`` or the AP."""
+        for name, val in self.parameters.items():
+            if not isinstance(val, str) or self.RE_V_AUTO.fullmatch(val):
+                continue
+            if pattern.fullmatch(name) or ap_map.get(name) == association_property:
+                return val
+        return None
+
+    async def _instance_types_by_disk_category(self, zone_id, disk_categories) -> dict:
+        """Probe every disk category at once; return ``{category: set of instance types}``.
+
+        Each probe is a DescribeAvailableResource call answered by the
+        discovery service, so the result per (region, zone, charge type,
+        disk category) is shared by every generator and cached on disk.
+        """
+        probes = await asyncio.gather(
+            *[
+                self.discovery.available_instance_types(
+                    zone_id=zone_id, instance_charge_type='PostPaid', system_disk_category=disk_category
+                )
+                for disk_category in disk_categories
+            ],
+            return_exceptions=True,
+        )
+        by_disk_category = {}
+        for disk_category, types in zip(disk_categories, probes):
+            if isinstance(types, Exception):
+                LOG.debug(f'failed to query InstanceType with SystemDiskCategory={disk_category} in {zone_id}: {types}')
+                types = []
+            LOG.info(f'query InstanceType with SystemDiskCategory={disk_category} in {zone_id}: got {len(types)} types')
+            by_disk_category[disk_category] = set(types)
+        return by_disk_category
+
+    async def _candidate_instance_types(self, zone_id, disk_categories) -> dict:
+        """Return ``{category: set of instance types}`` of ``zone_id``, probing each category once per generator."""
+        missing = tuple(category for category in disk_categories if (zone_id, category) not in self._candidate_types)
+        if missing:
+            probed = await self._instance_types_by_disk_category(zone_id, missing)
+            self._candidate_types.update({(zone_id, category): types for category, types in probed.items()})
+        return {category: self._candidate_types[(zone_id, category)] for category in disk_categories}
+
+    async def _disk_categories_of_fixed_instance_type(self, zone_id) -> tuple:
+        """Return the safe disk categories that an instance type pinned by the config also supports.
+
+        The SystemDiskCategory value is shared with that instance type, so only
+        the categories in both sets are worth probing.
+        """
+        ap_map = await self._get_association_properties()
+        instance_type = self._fixed_value(self.RE_K_INSTANCE_TYPE, 'ALIYUN::ECS::Instance::InstanceType', ap_map)
+        if not instance_type or not zone_id:
+            return self.SAFE_DISK_CATEGORIES
+        supported = set(await self._query_disk_available(zone_id, instance_type))
+        compatible = tuple(category for category in self.SAFE_DISK_CATEGORIES if category in supported)
+        return compatible or self.SAFE_DISK_CATEGORIES
+
     async def _resolve_instance_type(self, key) -> str:
         """Resolve an ECS instance type parameter.
 
-        If the template has a SystemDiskCategory parameter, queries InstanceType
-        with each disk category filter (cloud_essd → cloud_ssd → cloud_efficiency)
-        in priority order.  The first disk category that returns non-empty
-        instance types wins, and both values are set simultaneously.
-        This ensures InstanceType and SystemDiskCategory are always compatible.
+        If the template has a SystemDiskCategory parameter, the candidate
+        instance types of every disk category (cloud_essd → cloud_ssd →
+        cloud_efficiency → cloud_auto) are built once, concurrently, and the
+        first category in priority order with candidates wins. Once the
+        category is decided, by the config or by an earlier InstanceType
+        parameter, only its candidate set is used and no other category is
+        probed, so every InstanceType picked is compatible with the one
+        SystemDiskCategory value. An instance type the config pins narrows the
+        categories to those it supports as well.
         """
         zone_id = None
         for name, val in self.parameters.items():
@@ -977,7 +1035,8 @@ class ParamGenerator:
 
         # Check if template has a SystemDiskCategory parameter (by AP or name)
         ap_map = await self._get_association_properties()
-        has_disk_param = any(
+        fixed_disk_category = self._fixed_value(self.RE_K_SYSTEM_DISK, 'ALIYUN::ECS::Disk::SystemDiskCategory', ap_map)
+        has_disk_param = fixed_disk_category is not None or any(
             ap == 'ALIYUN::ECS::Disk::SystemDiskCategory'
             for ap in ap_map.values()
         ) or any(
@@ -987,33 +1046,27 @@ class ParamGenerator:
         )
 
         try:
-            ecs_plugin = EcsPlugin(self.region, credential=self.credential)
-
             if has_disk_param:
-                # Query InstanceType with each disk category filter in priority order.
-                # The first category that returns non-empty results wins.
-                for disk_cat in self.SAFE_DISK_CATEGORIES:
-                    types = await ecs_plugin.describe_available_instance_types(
-                        zone_id=zone_id, instance_charge_type='PostPaid',
-                        system_disk_category=disk_cat
-                    )
-                    LOG.info(f'query InstanceType with SystemDiskCategory={disk_cat} in {zone_id}: got {len(types)} types')
+                decided = fixed_disk_category or self._resolved_disk_category
+                disk_categories = (decided,) if decided else await self._disk_categories_of_fixed_instance_type(zone_id)
+                by_disk_category = await self._candidate_instance_types(zone_id, disk_categories)
+                for disk_cat in disk_categories:
+                    types = by_disk_category[disk_cat]
                     if types:
                         self._resolved_disk_category = disk_cat
-                        picked = pick_cheapest_instance_type(types)
+                        picked = pick_cheapest_instance_type(types, await self.discovery.instance_prices())
                         LOG.info(f'resolved instance type {picked} with disk category {disk_cat} in {zone_id}')
                         return picked
-                    LOG.info(f'no instance type found with {disk_cat} in {zone_id}, trying next disk category')
 
                 # All disk categories exhausted — query without filter as fallback
                 LOG.warning(f'no instance type found with any standard disk category in {zone_id}, using unfiltered')
 
             # No disk parameter, or all disk filters returned empty — query without filter
-            types = await ecs_plugin.describe_available_instance_types(
+            types = await self.discovery.available_instance_types(
                 zone_id=zone_id, instance_charge_type='PostPaid'
             )
             if types:
-                return pick_cheapest_instance_type(types)
+                return pick_cheapest_instance_type(types, await self.discovery.instance_prices())
         except Exception as ex:
             LOG.debug(f'failed to resolve instance type for {key}: {ex}', exc_info=True)
         return None
@@ -1022,21 +1075,64 @@ class ParamGenerator:
         """Resolve SystemDiskCategory.
 
         If _resolve_instance_type already determined a compatible disk category
-        (via disk-aware InstanceType query), use that directly.  Otherwise
-        default to cloud_essd.
+        (via disk-aware InstanceType query), use that directly. If the config
+        pins the instance type, pick the first safe category that the instance
+        type supports in the zone. Otherwise default to cloud_essd.
         """
         if self._resolved_disk_category:
             LOG.debug(f'using disk category from instance type resolution: {self._resolved_disk_category}')
             return self._resolved_disk_category
 
+        ap_map = await self._get_association_properties()
+        instance_type = self._fixed_value(self.RE_K_INSTANCE_TYPE, 'ALIYUN::ECS::Instance::InstanceType', ap_map)
+        zone_id = self._fixed_value(self.RE_K_ZONE_ID, 'ALIYUN::ECS::Instance::ZoneId', ap_map)
+        if instance_type and zone_id:
+            supported = set(await self._query_disk_available(zone_id, instance_type))
+            compatible = [category for category in self.SAFE_DISK_CATEGORIES if category in supported]
+            if compatible:
+                LOG.debug(f'using disk category {compatible[0]} supported by {instance_type} in {zone_id}')
+                return compatible[0]
+
         # Instance type was resolved without disk filter — default to cloud_essd
         LOG.debug('defaulting system disk category to cloud_essd')
         return 'cloud_essd'
 
-    def _gen_common_name(self):
+    @classmethod
+    def _value_generator(cls, key):
+        """Return the generator of a name, password or uuid parameter, or None for any other parameter."""
+        # Network, zone, instance type and disk parameters are resolved by discovery even when named like these.
+        discovered = (cls.RE_K_VSW_ID, cls.RE_K_VPC_ID, cls.RE_K_ZONE_ID, cls.RE_K_INSTANCE_TYPE, cls.RE_K_SYSTEM_DISK)
+        if any(pattern.fullmatch(key) for pattern in discovered):
+            return None
+        if cls.RE_K_COMMON_NAME.fullmatch(key):
+            return cls._gen_common_name
+        if cls.RE_K_PASSWORD.fullmatch(key):
+            return cls._gen_password
+        if cls.RE_K_UUID.fullmatch(key):
+            return cls._gen_uuid
+        return None
+
+    @classmethod
+    def is_regenerated(cls, key, value) -> bool:
+        """Whether ``key`` configured as ``value`` gets a fresh name, password or uuid on every use.
+
+        Such values are secrets or must be unique per stack, so they are
+        never locked into a parameter plan.
+        """
+        if not isinstance(value, str) or not cls.RE_V_AUTO.fullmatch(value):
+            return False
+        return cls._value_generator(key) is not None
+
+    @classmethod
+    def generate_value(cls, key) -> str:
+        return cls._value_generator(key)()
+
+    @staticmethod
+    def _gen_common_name():
         return f'{IAC_NAME}-{uuid.uuid1().hex}'[:50]
 
-    def _gen_password(self):
+    @staticmethod
+    def _gen_password():
         # RDS allows only: !@#$%^&*()_+-=
         # Use this restrictive set for cross-service compatibility
         special_chars = '!@#$%^&*()_+-='
@@ -1046,48 +1142,49 @@ class ParamGenerator:
         random.shuffle(password_chars)
         return ''.join(password_chars)
 
-    def _gen_uuid(self):
+    @staticmethod
+    def _gen_uuid():
         return str(uuid.uuid1())
 
+    def _switch_to_vpc_with_security_group(self, inventory):
+        """Move the VPC and VSwitch choice to another VPC that also has a security group.
+
+        The VPC must have VSwitches in every zone already chosen for the
+        VSwitch parameters. Returns the security group, or None if no VPC
+        qualifies.
+        """
+        old_vpc_id = self._vpc_id
+        for candidate_vpc_id in inventory.vpcs_with_security_groups():
+            if candidate_vpc_id == old_vpc_id:
+                continue
+            assignments = self._vswitch_assignments_for_vpc(candidate_vpc_id, inventory)
+            if assignments is None:
+                LOG.debug(
+                    f'vpc {candidate_vpc_id} has a security group but '
+                    'does not have VSwitches in every selected zone'
+                )
+                continue
+            sg = inventory.get_security_group(vpc_id=candidate_vpc_id)
+            self._apply_vswitch_assignments(candidate_vpc_id, assignments)
+            for pname in list(self.parameters):
+                if self.RE_K_VPC_ID.fullmatch(pname):
+                    self.parameters[pname] = self._vpc_id
+            LOG.debug(
+                f'switched from vpc {old_vpc_id} to {self._vpc_id} '
+                f'(vswitches={self._vsw_assignments}, sg={sg["SecurityGroupId"]})'
+            )
+            return sg
+        return None
+
     async def _gen_sg(self, key, value):
         if self._vpc_id is None:
             await self._gen_vpc_vsw_id(key, value)
-        ecs_plugin = EcsPlugin(region_id=self.region, credential=self.credential)
-        sg = await ecs_plugin.get_security_group(vpc_id=self._vpc_id)
+        inventory = await self.discovery.inventory()
+        sg = inventory.get_security_group(vpc_id=self._vpc_id)
         if not sg:
             # Current VPC has no usable security group; try other VPCs in the region.
-            old_vpc_id = self._vpc_id
             LOG.debug(f'no security group found in vpc {self._vpc_id}, trying other VPCs')
-            vpc_plugin = VpcPlugin(self.region, credential=self.credential)
-            response = await vpc_plugin.send_request('DescribeVpcsRequest', PageSize=50)
-            vpcs = response.get('Vpcs', {}).get('Vpc', [])
-            for vpc in vpcs:
-                candidate_vpc_id = vpc['VpcId']
-                if candidate_vpc_id == old_vpc_id:
-                    continue  # already tried
-                sg = await ecs_plugin.get_security_group(vpc_id=candidate_vpc_id)
-                if sg:
-                    assignments = await self._vswitch_assignments_for_vpc(
-                        candidate_vpc_id,
-                        vpc_plugin,
-                    )
-                    if assignments is None:
-                        LOG.debug(
-                            f'vpc {candidate_vpc_id} has a security group but '
-                            'does not have VSwitches in every selected zone'
-                        )
-                        sg = None
-                        continue
-                    LOG.debug(f'found security group {sg["SecurityGroupId"]} in vpc {candidate_vpc_id}')
-                    self._apply_vswitch_assignments(candidate_vpc_id, assignments)
-                    for pname in list(self.parameters):
-                        if self.RE_K_VPC_ID.fullmatch(pname):
-                            self.parameters[pname] = self._vpc_id
-                    LOG.debug(
-                        f'synced vpc {old_vpc_id} -> {self._vpc_id}, '
-                        f'vswitches={self._vsw_assignments}'
-                    )
-                    break
+            sg = self._switch_to_vpc_with_security_group(inventory)
         if not sg:
             msg = f'can not find security group in any vpc in {self.region} region'
             raise Iact3Exception(_error_message(key, value, msg))
@@ -0,0 +1,211 @@
+import math
+import re
+import threading
+from collections import namedtuple
+
+from iact3.discovery_cache import DISCOVERY_CACHE, account_key
+
+# Entry-level families (cheapest, suitable for testing)
+ENTRY_FAMILIES = frozenset((
+    't6', 't5', 's6', 's5', 'n4', 'mn4', 'xn4',
+    'e', 'e4', 'u1', 'u2',
+))
+
+# Secondary families — standard families that are acceptable for testing
+# when no entry-level family is available, but only at small sizes.
+SECONDARY_FAMILIES = frozenset((
+    'g7', 'g6', 'g5', 'g8a', 'g8i',
+    'c7', 'c6', 'c5', 'c8a', 'c8i',
+    'r7', 'r6', 'r5', 'r8a', 'r8i',
+))
+
+# Family priority for tie-breaking (lower = cheaper family)
+FAMILY_PRIORITY = {
+    # Entry-level (cheapest)
+    't6': 0, 't5': 1, 's6': 2, 's5': 3,
+    'n4': 4, 'mn4': 5, 'xn4': 6,
+    'u1': 7, 'u2': 8, 'e': 9, 'e4': 10,
+    # Economy / shared
+    'i5e': 11, 'i5': 12, 'i4': 13, 'i3': 14,
+    # General purpose (newer = slightly cheaper per-unit but larger absolute)
+    'g8a': 15, 'g8i': 16,
+    'g7': 17, 'g6': 18, 'g5': 19,
+    # Compute optimized
+    'c8a': 20, 'c8i': 21,
+    'c7': 22, 'c6': 23, 'c5': 24,
+    # Memory optimized
+    'r8a': 25, 'r8i': 26,
+    'r7': 27, 'r6': 28, 'r5': 29,
+}
+UNKNOWN_FAMILY_PRIORITY = 50
+
+# Size multipliers relative to ``large``; ``Nxlarge`` is 2 * N.
+_SMALL_SIZES = {'nano': 0.125, 'micro': 0.25, 'small': 0.5, 'medium': 0.75, 'large': 1.0}
+_SMALL_SIZE_VCPUS = {'nano': 1, 'micro': 1, 'small': 1, 'medium': 1, 'large': 2}
+
+# Max size for testing — avoid instances larger than 4 vCPU (xlarge)
+# unless nothing smaller is available.
+TEST_MAX_SIZE_RANK = 2.0  # xlarge
+
+TIER_ENTRY, TIER_SMALL_SECONDARY, TIER_OTHER = range(3)
+
+InstanceTypeSpec = namedtuple(
+    'InstanceTypeSpec', ('type_id', 'family', 'generation', 'size', 'size_rank', 'vcpus', 'family_priority', 'tier')
+)
+
+_RE_TYPE = re.compile(
+    r'ecs\.(?P<family>[a-z]+(?P<generation>\d+)?[a-z]*)(?:-[^.]+)?\.(?P<size>[0-9.]*x?large|nano|micro|small|medium)$'
+)
+_RE_SIZE = re.compile(r'(?P<count>\d+(?:\.\d+)?)?(?P<x>x)?large')
+
+
+def _parse_size(size: str):
+    if size in _SMALL_SIZES:
+        return _SMALL_SIZES[size], _SMALL_SIZE_VCPUS[size]
+    match = _RE_SIZE.fullmatch(size or '')
+    if not match or (match.group('count') and not match.group('x')):
+        return math.inf, None
+    count = float(match.group('count') or 1)
+    return 2 * count, round(4 * count)
+
+
+def parse_instance_type(type_id: str) -> InstanceTypeSpec:
+    """Parse an ECS instance type id such as ``ecs.t6-c1m1.large`` or ``ecs.g6.12xlarge``.
+
+    Ids that do not follow the ``ecs.<family>[-<variant>].<size>`` pattern
+    parse to an unknown family and size and rank after every known type.
+    """
+    match = _RE_TYPE.match(type_id.lower())
+    if not match:
+        return InstanceTypeSpec(type_id, None, None, None, math.inf, None, UNKNOWN_FAMILY_PRIORITY, TIER_OTHER)
+    family = match.group('family')
+    generation = int(match.group('generation')) if match.group('generation') else None
+    size = match.group('size')
+    size_rank, vcpus = _parse_size(size)
+    if family in ENTRY_FAMILIES:
+        tier = TIER_ENTRY
+    elif family in SECONDARY_FAMILIES and size_rank <= TEST_MAX_SIZE_RANK:
+        tier = TIER_SMALL_SECONDARY
+    else:
+        tier = TIER_OTHER
+    return InstanceTypeSpec(
+        type_id, family, generation, size, size_rank, vcpus, FAMILY_PRIORITY.get(family, UNKNOWN_FAMILY_PRIORITY), tier
+    )
+
+
+class InstanceTypeCatalog:
+    """Parsed ECS instance types with indexes by family and size.
+
+    Every type id is parsed once per process; ranking a list of candidates
+    is then a single sort on precomputed keys. The ranking is:
+
+    1. Entry-level families (t6, t5, s6, u1, etc.) — cheapest, any size.
+    2. Secondary families (g7, c7, etc.) at small sizes (<= xlarge / 4 vCPU).
+    3. Any other type.
+
+    Within a tier types sort by size, then family priority. When ``prices``
+    (hourly price per type id) are given, priced types of a tier come first
+    in price order, so observed prices override the heuristic where known.
+    """
+
+    def __init__(self):
+        self._specs = {}
+        self._by_family = {}
+        self._by_size = {}
+        self._lock = threading.Lock()
+
+    def spec(self, type_id: str) -> InstanceTypeSpec:
+        spec = self._specs.get(type_id)
+        if spec is None:
+            spec = parse_instance_type(type_id)
+            with self._lock:
+                if type_id not in self._specs:
+                    self._specs[type_id] = spec
+                    self._by_family.setdefault(spec.family, []).append(type_id)
+                    self._by_size.setdefault(spec.size, []).append(type_id)
+        return spec
+
+    def by_family(self, family: str) -> list:
+        return list(self._by_family.get(family, ()))
+
+    def by_size(self, size: str) -> list:
+        return list(self._by_size.get(size, ()))
+
+    def rank(self, types, prices=None) -> list:
+        """Return ``types`` without duplicates, sorted from cheapest to most expensive."""
+        prices = prices or {}
+        specs = [self.spec(type_id) for type_id in dict.fromkeys(types or ())]
+        specs.sort(
+            key=lambda spec: (
+                spec.tier,
+                prices.get(spec.type_id, math.inf),
+                spec.size_rank,
+                spec.family_priority,
+                spec.type_id,
+            )
+        )
+        return [spec.type_id for spec in specs]
+
+    def clear(self):
+        with self._lock:
+            self._specs.clear()
+            self._by_family.clear()
+            self._by_size.clear()
+
+
+INSTANCE_TYPES = InstanceTypeCatalog()
+
+ECS_INSTANCE_RESOURCE_TYPES = ('ALIYUN::ECS::Instance', 'ALIYUN::ECS::InstanceGroup')
+
+
+def instance_prices_from_estimate(template_price: dict, template: dict, parameters: dict) -> dict:
+    """Extract hourly ECS instance prices from a GetTemplateEstimateCost result.
+
+    ``template_price`` maps resource names to their price result. The
+    instance type of each ECS instance resource is read from the template,
+    following a ``Ref`` to ``parameters``. Only hourly, pay-as-you-go prices
+    are returned, divided by the quantity priced.
+    """
+    resources = (template or {}).get('Resources') or {}
+    prices = {}
+    for name, price in (template_price or {}).items():
+        if not isinstance(price, dict) or price.get('Type') not in ECS_INSTANCE_RESOURCE_TYPES:
+            continue
+        properties = (resources.get(name) or {}).get('Properties') or {}
+        instance_type = properties.get('InstanceType')
+        if isinstance(instance_type, dict) and 'Ref' in instance_type:
+            instance_type = (parameters or {}).get(instance_type['Ref'])
+        result = price.get('Result') or {}
+        supplement = result.get('OrderSupplement') or {}
+        amount = (result.get('Order') or {}).get('TradeAmount')
+        if (
+            not isinstance(instance_type, str)
+            or amount is None
+            or supplement.get('PriceUnit') != 'Hour'
+            or supplement.get('ChargeType', 'PostPaid') != 'PostPaid'
+        ):
+            continue
+        prices[instance_type] = float(amount) / max(supplement.get('Quantity') or 1, 1)
+    return prices
+
+
+async def record_instance_prices(region: str, credential, prices: dict):
+    """Merge observed hourly prices into the discovery cache of ``region``."""
+    if prices:
+        await DISCOVERY_CACHE.run(_merge_instance_prices, region, credential, prices)
+
+
+def _merge_instance_prices(region: str, credential, prices: dict):
+    account = account_key(credential)
+    known = DISCOVERY_CACHE.get('instance_prices', account, region) or {}
+    known.update(prices)
+    DISCOVERY_CACHE.put('instance_prices', account, region, value=known)
+
+
+async def load_instance_prices(region: str, credential) -> dict:
+    """Return the hourly prices observed for ``region`` by earlier cost estimations."""
+    return await DISCOVERY_CACHE.run(_load_instance_prices, region, credential)
+
+
+def _load_instance_prices(region: str, credential) -> dict:
+    return DISCOVERY_CACHE.get('instance_prices', account_key(credential), region) or {}
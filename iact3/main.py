@@ -4,8 +4,10 @@ import sys
 
 from iact3 import cli_modules
 from iact3.cli import CliCore, GLOBAL_ARGS, _get_log_level
+from iact3.discovery_cache import DISCOVERY_CACHE
 from iact3.generate_params import IAC_PACKAGE_NAME, IAC_NAME
 from iact3.logger import init_cli_logger
+from iact3.plugin.base_plugin import CLIENT_REGISTRY
 from iact3.util import exit_with_code, get_program_name
 
 LOG = init_cli_logger(loglevel="ERROR")
@@ -48,6 +50,8 @@ def sync_run():
                 loop.run_until_complete(
                     asyncio.gather(*pending, return_exceptions=True)
                 )
+            CLIENT_REGISTRY.close()
+            DISCOVERY_CACHE.close()
             loop.close()
         if interrupted[0]:
             raise SystemExit(130)
@@ -72,6 +76,11 @@ async def run():
         if _log_prefix:
             GLOBAL_ARGS.log_prefix = _log_prefix
             init_cli_logger(log_prefix=_log_prefix, logger=LOG)
+
+        DISCOVERY_CACHE.configure(
+            enabled=not cli.parsed_args.__dict__.get('_no_cache'),
+            refresh=bool(cli.parsed_args.__dict__.get('_refresh_cache')),
+        )
         await cli.run()
     except asyncio.CancelledError:
         raise
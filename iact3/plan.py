@@ -0,0 +1,143 @@
+import copy
+import json
+import logging
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from iact3.discovery_cache import account_key
+from iact3.exceptions import Iact3Exception
+from iact3.generate_params import IAC_NAME, ParamGenerator, ResolvedParameters
+from iact3.template_cache import TEMPLATE_CACHE, content_digest
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_PLAN_FILE = f'.{IAC_NAME}.plan.json'
+
+
+def _timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat(timespec='seconds')
+
+
+class ParameterPlan:
+    """Resolved test parameters locked per (test, region) for later runs.
+
+    ``iact3 test plan`` writes a plan and ``iact3 test run --plan`` reads it,
+    so parameter generation only runs for entries that are missing or stale.
+    Every entry keeps the resolved parameters together with what they were
+    resolved from: the template digest, a digest of the configured
+    parameters, the credential fingerprint and when the discovery lookups of
+    the region were answered. An entry is stale once any of its inputs
+    changed or a VPC, VSwitch or security group it generated no longer
+    exists; stale entries are resolved again and replaced.
+
+    Only discovered values such as zones, instance types, disk categories
+    and network ids are locked. Generated names, passwords and uuids are
+    listed under ``regenerate`` without their values and get fresh ones on
+    every use, so the plan holds no secrets and stacks of later runs do not
+    collide.
+    """
+
+    VERSION = 2
+    RE_RESOURCE_ID = re.compile(r'(vpc|vsw|sg)-\w+')
+
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+        self.modified = False
+
+    @staticmethod
+    def _key(test_name: str, region: str) -> tuple:
+        return test_name, region
+
+    @classmethod
+    def load(cls, path) -> 'ParameterPlan':
+        try:
+            with open(str(path), 'r', encoding='utf-8') as file_handle:
+                data = json.load(file_handle)
+        except (OSError, ValueError) as ex:
+            raise Iact3Exception(f'failed to read parameter plan {path}: {ex}')
+        if not isinstance(data, dict) or data.get('version') != cls.VERSION:
+            raise Iact3Exception(
+                f'{path} is not a version {cls.VERSION} parameter plan, run "{IAC_NAME} test plan" to write a new one'
+            )
+        entries = {cls._key(entry['test_name'], entry['region']): entry for entry in data.get('entries') or []}
+        return cls(entries)
+
+    def save(self, path):
+        data = {'version': self.VERSION, 'entries': [self.entries[key] for key in sorted(self.entries)]}
+        content = json.dumps(data, indent=2, sort_keys=True, ensure_ascii=False)
+        Path(path).write_text(content + '\n', encoding='utf-8')
+        self.modified = False
+
+    async def resolve(self, config, discovery) -> ResolvedParameters:
+        """Return the locked parameters of ``config``, resolving and locking them again when stale."""
+        configured = copy.deepcopy(config.parameters)
+        try:
+            template_hash, inputs_hash = await self._inputs(config, configured)
+        except Exception as ex:
+            LOG.debug(f'can not compute plan inputs of {config.test_name} in {config.region}: {ex}', exc_info=True)
+            return await ParamGenerator.result(config, discovery=discovery)
+
+        key = self._key(config.test_name, config.region)
+        entry = self.entries.get(key)
+        reason = await self._stale_reason(entry, config, configured, inputs_hash, discovery)
+        if reason is None:
+            LOG.debug(f'using planned parameters of {config.test_name} in {config.region}')
+            parameters = copy.deepcopy(entry['parameters'])
+            parameters.update({name: ParamGenerator.generate_value(name) for name in entry['regenerate']})
+            return ResolvedParameters(config.test_name, config.region, parameters)
+
+        LOG.info(f'resolving parameters of {config.test_name} in {config.region}: {reason}')
+        resolved = await ParamGenerator.result(config, discovery=discovery)
+        if resolved.error is None:
+            regenerate = sorted(
+                name for name, value in configured.items() if ParamGenerator.is_regenerated(name, value)
+            )
+            self.entries[key] = {
+                'test_name': config.test_name,
+                'region': config.region,
+                'template_hash': template_hash,
+                'inputs_hash': inputs_hash,
+                'credential': account_key(config.auth.credential),
+                'parameters': {
+                    name: copy.deepcopy(value) for name, value in resolved.parameters.items() if name not in regenerate
+                },
+                'regenerate': regenerate,
+                'resolved_at': _timestamp(time.time()),
+                'discovery': {kind: _timestamp(seconds) for kind, seconds in discovery.snapshots.items()},
+            }
+            self.modified = True
+        return resolved
+
+    @staticmethod
+    async def _inputs(config, parameters: dict) -> tuple:
+        body = await TEMPLATE_CACHE.get(config.template_config, config.region, config.auth.credential)
+        template_hash = content_digest(body or '')
+        inputs = {'template': template_hash, 'parameters': parameters, 'parameters_order': config.parameters_order}
+        return template_hash, content_digest(json.dumps(inputs, sort_keys=True, default=str))
+
+    async def _stale_reason(self, entry, config, configured: dict, inputs_hash: str, discovery):
+        if entry is None:
+            return 'not planned yet'
+        if entry.get('credential') != account_key(config.auth.credential):
+            return 'the credential changed'
+        if entry.get('inputs_hash') != inputs_hash:
+            return 'the template or the configured parameters changed'
+
+        generated = [
+            value
+            for name, value in entry['parameters'].items()
+            if configured.get(name) != value and isinstance(value, str) and self.RE_RESOURCE_ID.fullmatch(value)
+        ]
+        if not generated:
+            return None
+        try:
+            inventory = await discovery.inventory()
+        except Exception as ex:
+            LOG.debug(f'failed to scan the network inventory of {discovery.region}', exc_info=True)
+            return f'failed to check the planned resources: {ex}'
+        missing = [resource_id for resource_id in generated if not inventory.has_resource(resource_id)]
+        if missing:
+            return f'{", ".join(missing)} no longer exist'
+        return None
@@ -1,20 +1,32 @@
 import abc
 import asyncio
+import concurrent.futures
+import contextvars
+import copy
+import functools
 import importlib
+import itertools
+import json
 import logging
 import os
+import random
 import ssl as _ssl
+import threading
+import time
 import types
+from collections import OrderedDict, namedtuple
+from typing import ClassVar
 
 import Tea.core as _tea_core
 from Tea.core import TeaCore
-from Tea.exceptions import TeaException
+from Tea.exceptions import RetryError, TeaException, UnretryableException
 from Tea.model import TeaModel
-from alibabacloud_credentials import providers
+from alibabacloud_credentials import credentials, providers
 from alibabacloud_credentials.client import Client
 from alibabacloud_credentials.utils import auth_util
 from alibabacloud_credentials.utils.auth_constant import HOME
-from alibabacloud_tea_openapi.models import Config
+from alibabacloud_openapi_util.client import Client as OpenApiUtilClient
+from alibabacloud_tea_openapi.models import Config, OpenApiRequest, Params
 from alibabacloud_tea_util.models import RuntimeOptions
 
 from iact3.plugin import error_code
@@ -91,15 +103,576 @@ class CredentialClient(Client):
         super(CredentialClient, self).__init__(config)
 
 
+CredentialSnapshot = namedtuple(
+    'CredentialSnapshot', ('access_key_id', 'access_key_secret', 'security_token', 'expiration')
+)
+
+# The snapshot whose access key id was last handed out for signing in the current context.
+_SIGNING_SNAPSHOT = contextvars.ContextVar('iact3_signing_snapshot', default=None)
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class RefreshAheadCredential:
+    """Non-blocking view over an automatically refreshing SDK credential.
+
+    The SDK refreshes STS-style credentials inline, on whichever call notices
+    they are about to expire, and every concurrent caller does it again. Here
+    a single refresh runs on a worker thread as soon as the credential enters
+    the ``REFRESH_AHEAD`` window, while callers keep using the current token.
+    Callers only wait when the token is already inside the SDK's own expiry
+    margin: async callers then wait without blocking the event loop, and
+    synchronous callers on the event loop thread are served the current
+    snapshot instead of waiting at all.
+
+    The key id, secret and token are kept in one immutable
+    :class:`CredentialSnapshot` that a refresh replaces in a single
+    assignment. The SDK asks for the three values one call at a time, so the
+    secret and token are served from the snapshot whose key id was last handed
+    out in the same context, even when a refresh lands in between.
+    """
+
+    REFRESH_AHEAD = 600
+    EXPIRY_MARGIN = 180
+    _executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='iact3-credential')
+
+    def __init__(self, credential):
+        self._credential = credential
+        self.credential_type = credential.credential_type
+        self._lock = threading.Lock()
+        self._refreshing = None
+        self._snapshot = CredentialSnapshot(
+            credential.access_key_id,
+            credential.access_key_secret,
+            getattr(credential, 'security_token', None),
+            credential.expiration or 0,
+        )
+
+    @property
+    def expiration(self) -> int:
+        return self._snapshot.expiration
+
+    @property
+    def access_key_id(self):
+        return self._current().access_key_id
+
+    @property
+    def access_key_secret(self):
+        return self._current().access_key_secret
+
+    @property
+    def security_token(self):
+        return self._current().security_token
+
+    def _expired(self, margin: int) -> bool:
+        return time.time() >= self.expiration - margin
+
+    def refresh(self) -> concurrent.futures.Future:
+        with self._lock:
+            if self._refreshing is None:
+                self._refreshing = self._executor.submit(self._refresh)
+            return self._refreshing
+
+    def _refresh(self):
+        try:
+            fresh = self._credential._get_new_credential()
+            if fresh:
+                self._snapshot = CredentialSnapshot(
+                    fresh.access_key_id,
+                    fresh.access_key_secret,
+                    getattr(fresh, 'security_token', None),
+                    fresh.expiration,
+                )
+        finally:
+            with self._lock:
+                self._refreshing = None
+
+    def snapshot(self) -> CredentialSnapshot:
+        """Return the current credential without waiting for a refresh it starts.
+
+        Only a credential that has no valid token at all, such as one that was
+        never fetched, is waited for, and never on the event loop thread.
+        """
+        return self._current(0)
+
+    def _current(self, margin: int = EXPIRY_MARGIN) -> CredentialSnapshot:
+        if self._expired(self.REFRESH_AHEAD):
+            refreshing = self.refresh()
+            if self._expired(margin) and not _on_event_loop():
+                refreshing.result()
+            else:
+                refreshing.add_done_callback(self._log_failure)
+        return self._snapshot
+
+    async def _current_async(self) -> CredentialSnapshot:
+        if self._expired(self.EXPIRY_MARGIN):
+            await asyncio.wrap_future(self.refresh())
+        elif self._expired(self.REFRESH_AHEAD):
+            self.refresh().add_done_callback(self._log_failure)
+        return self._snapshot
+
+    def _pin(self, snapshot: CredentialSnapshot) -> str:
+        _SIGNING_SNAPSHOT.set((self, snapshot))
+        return snapshot.access_key_id
+
+    def _pinned(self, current: CredentialSnapshot) -> CredentialSnapshot:
+        owner, snapshot = _SIGNING_SNAPSHOT.get() or (None, None)
+        if owner is self and time.time() < snapshot.expiration - self.EXPIRY_MARGIN:
+            return snapshot
+        return current
+
+    @staticmethod
+    def _log_failure(future: concurrent.futures.Future):
+        if future.exception() is not None:
+            LOG.warning('background credential refresh failed: %s', future.exception())
+
+    def get_access_key_id(self):
+        return self._pin(self._current())
+
+    def get_access_key_secret(self):
+        return self._pinned(self._current()).access_key_secret
+
+    def get_security_token(self):
+        return self._pinned(self._current()).security_token
+
+    async def get_access_key_id_async(self):
+        return self._pin(await self._current_async())
+
+    async def get_access_key_secret_async(self):
+        return self._pinned(await self._current_async()).access_key_secret
+
+    async def get_security_token_async(self):
+        return self._pinned(await self._current_async()).security_token
+
+
+class CredentialCache:
+    """Process-wide cache of credential clients.
+
+    Profiles loaded through ``Auth(name, location)`` and the default provider
+    chain are each built once; a factory returning None is not cached. Credentials that expire are wrapped in
+    :class:`RefreshAheadCredential` and their first token is fetched in the
+    background right away.
+    """
+
+    DEFAULT_KEY = ('default',)
+
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, factory):
+        # The factory runs under the lock so that concurrent misses build a single client and refresher.
+        with self._lock:
+            if key in self._clients:
+                return self._clients[key]
+            client = factory()
+            if client is None:
+                return None
+            cloud_credential = getattr(client, 'cloud_credential', None)
+            if isinstance(cloud_credential, credentials._AutomaticallyRefreshCredentials):
+                client.cloud_credential = RefreshAheadCredential(cloud_credential)
+                client.cloud_credential.refresh().add_done_callback(RefreshAheadCredential._log_failure)
+            self._clients[key] = client
+            return client
+
+    def default(self) -> 'CredentialClient':
+        return self.get(self.DEFAULT_KEY, CredentialClient)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+
+CREDENTIAL_CACHE = CredentialCache()
+
+
+def credential_identity(credential) -> tuple:
+    """Return a hashable identity for a credential client.
+
+    Static access keys are compared by value so that separately constructed
+    clients for the same account share pooled SDK clients; every other
+    credential type is compared by object identity.
+    """
+    cloud_credential = getattr(credential, 'cloud_credential', None)
+    if getattr(cloud_credential, 'credential_type', None) == 'access_key':
+        return 'access_key', cloud_credential.access_key_id, cloud_credential.access_key_secret
+    return 'object', id(credential)
+
+
+class ClientRegistry:
+    """Process-wide pool of SDK clients.
+
+    One live client is kept per (client class, product, region, endpoint,
+    credential identity, extra config) and the least recently used client is
+    evicted once ``max_size`` is exceeded.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._clients)
+
+    def get(self, plugin: 'TeaSDKPlugin'):
+        key = plugin.client_key()
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+            client = plugin.api_client()(plugin.config)
+            self._clients[key] = client
+            while len(self._clients) > self.max_size:
+                _, evicted = self._clients.popitem(last=False)
+                self._close_client(evicted)
+            return client
+
+    def close(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            self._close_client(client)
+
+    @staticmethod
+    def _close_client(client):
+        close = getattr(client, 'close', None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception as ex:
+            LOG.debug('failed to close sdk client %s: %s', client, ex, exc_info=True)
+
+
+CLIENT_REGISTRY = ClientRegistry()
+
+
+class TokenBucket:
+    """AIMD token bucket for a single (product, region, action) scope.
+
+    The refill rate is raised additively after every successful call and cut
+    multiplicatively when the API answers with a throttling error code.
+    """
+
+    INITIAL_RATE = 10.0
+    MIN_RATE = 0.5
+    MAX_RATE = 50.0
+    INCREASE_STEP = 0.5
+    DECREASE_FACTOR = 0.5
+    DECREASE_COOLDOWN = 1.0
+
+    def __init__(self, rate=None, min_rate=None, max_rate=None):
+        self.rate = rate or self.INITIAL_RATE
+        self.min_rate = min_rate or self.MIN_RATE
+        self.max_rate = max_rate or self.MAX_RATE
+        self.tokens = self.capacity
+        self.waiting = 0
+        self.throttled = 0
+        self._updated_at = time.monotonic()
+        self._decreased_at = 0.0
+
+    @property
+    def capacity(self) -> float:
+        return max(self.rate, 1.0)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        self._refill()
+        if self.waiting == 0 and self.tokens >= 1:
+            self.tokens -= 1
+            return
+        self.waiting += 1
+        try:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.INCREASE_STEP)
+
+    def on_throttle(self):
+        self.throttled += 1
+        now = time.monotonic()
+        # Concurrent requests that were already in flight usually fail together,
+        # only the first of them should shrink the rate.
+        if now - self._decreased_at < self.DECREASE_COOLDOWN:
+            return
+        self._decreased_at = now
+        self._refill()
+        self.rate = max(self.min_rate, self.rate * self.DECREASE_FACTOR)
+        self.tokens = min(self.tokens, 0.0)
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            'rate': round(self.rate, 3),
+            'tokens': round(self.tokens, 3),
+            'waiting': self.waiting,
+            'throttled': self.throttled,
+        }
+
+
+class RateLimiter:
+    """Registry of :class:`TokenBucket` keyed by (product, region, action)."""
+
+    ENABLED = True
+
+    def __init__(self):
+        self._buckets = {}
+
+    def bucket(self, product: str, region_id: str, action: str) -> TokenBucket:
+        key = (product, region_id, action)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket()
+        return bucket
+
+    def stats(self) -> list:
+        return [
+            dict(product=product, region=region_id, action=action, **bucket.stats())
+            for (product, region_id, action), bucket in sorted(self._buckets.items(), key=lambda item: repr(item[0]))
+        ]
+
+    def reset(self):
+        self._buckets.clear()
+
+
+RATE_LIMITER = RateLimiter()
+
+
+class RetryPolicy:
+    """Error-classified retry with decorrelated-jitter backoff.
+
+    Throttling codes, ``BASE_RETRY_EXCEPTIONS`` and connection failures are
+    always retried; the remaining ``COMMON_RETRY_EXCEPTIONS`` may mean the
+    request was applied, so they are only retried for idempotent calls. Every
+    call gives up once ``deadline`` seconds have passed since its first
+    attempt, whatever ``max_attempts`` says.
+    """
+
+    THROTTLING, TRANSIENT, AMBIGUOUS = 'throttling', 'transient', 'ambiguous'
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        deadline: float = 120.0,
+        connection_errors: tuple = (),
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.connection_errors = (RetryError, ConnectionError, asyncio.TimeoutError) + tuple(connection_errors)
+
+    def classify(self, ex: Exception):
+        if isinstance(ex, UnretryableException) and isinstance(ex.inner_exception, self.connection_errors):
+            return self.TRANSIENT
+        if isinstance(ex, self.connection_errors):
+            return self.TRANSIENT
+        code = getattr(ex, 'code', None)
+        if code in error_code.THROTTLING_RETRY_EXCEPTIONS:
+            return self.THROTTLING
+        if code in error_code.BASE_RETRY_EXCEPTIONS:
+            return self.TRANSIENT
+        if code in error_code.COMMON_RETRY_EXCEPTIONS:
+            return self.AMBIGUOUS
+        return None
+
+    def is_retryable(self, ex: Exception, idempotent: bool = True) -> bool:
+        kind = self.classify(ex)
+        return kind is not None and (idempotent or kind != self.AMBIGUOUS)
+
+    def backoff(self, previous=None) -> float:
+        previous = previous or self.base_delay
+        return min(self.max_delay, random.uniform(self.base_delay, previous * 3))
+
+    def _next_delay(self, attempt: int, started: float, previous: float):
+        if attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(previous)
+        if time.monotonic() - started + delay > self.deadline:
+            return None
+        return delay
+
+    async def call_async(self, func, idempotent: bool = True, retry_if_result=None):
+        """Await ``func()`` until it succeeds, fails permanently or runs out of budget.
+
+        ``retry_if_result`` marks a returned value as retryable; the last such
+        value is returned once the budget is spent.
+        """
+        started = time.monotonic()
+        delay = None
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = await func()
+            except Exception as ex:
+                if not self.is_retryable(ex, idempotent):
+                    raise
+                delay = self._next_delay(attempt, started, delay)
+                if delay is None:
+                    raise
+                LOG.debug('retry %s/%s in %.2fs after %r', attempt, self.max_attempts, delay, ex)
+            else:
+                if retry_if_result is None or not retry_if_result(result):
+                    return result
+                delay = self._next_delay(attempt, started, delay)
+                if delay is None:
+                    return result
+                LOG.debug('retry %s/%s in %.2fs after result %r', attempt, self.max_attempts, delay, result)
+            await asyncio.sleep(delay)
+
+    def call(self, func, idempotent: bool = True):
+        """Blocking counterpart of :meth:`call_async`."""
+        started = time.monotonic()
+        delay = None
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func()
+            except Exception as ex:
+                if not self.is_retryable(ex, idempotent):
+                    raise
+                delay = self._next_delay(attempt, started, delay)
+                if delay is None:
+                    raise
+                LOG.debug('retry %s/%s in %.2fs after %r', attempt, self.max_attempts, delay, ex)
+            time.sleep(delay)
+
+    def wrap(self, idempotent: bool = True):
+        """Decorate a sync or async function with this policy."""
+
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    return await self.call_async(functools.partial(func, *args, **kwargs), idempotent=idempotent)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return self.call(functools.partial(func, *args, **kwargs), idempotent=idempotent)
+
+            return wrapper
+
+        return decorator
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class SingleFlight:
+    """Merge identical in-flight calls into one and keep results for an optional TTL.
+
+    Whenever a result is shared, by several waiters or through the TTL cache,
+    each caller receives its own deep copy, so callers are free to mutate what
+    they get back. At most ``MAX_RESULTS`` results are kept; beyond that the
+    least recently used one is evicted, whatever its TTL.
+    """
+
+    MAX_RESULTS = 1024
+
+    def __init__(self):
+        self._inflight = {}
+        self._results = OrderedDict()
+        self._callers = {}
+
+    async def do(self, key, func, ttl: float = 0):
+        cached = self._results.get(key)
+        if cached is not None:
+            expires_at, value = cached
+            if expires_at > time.monotonic():
+                self._results.move_to_end(key)
+                return copy.deepcopy(value)
+            self._results.pop(key, None)
+
+        # Calls are only shared within the loop that started them; Task.get_loop needs Python 3.8.
+        loop = asyncio.get_event_loop()
+        task_loop, task = self._inflight.get(key, (None, None))
+        if task is None or task_loop is not loop:
+            task = loop.create_task(func())
+            self._inflight[key] = (loop, task)
+            task.add_done_callback(functools.partial(self._on_done, key, ttl))
+        self._callers[task] = self._callers.get(task, 0) + 1
+        try:
+            # A cancelled caller must not cancel the call other callers are waiting on.
+            result = await asyncio.shield(task)
+            if ttl or self._callers[task] > 1:
+                result = copy.deepcopy(result)
+            return result
+        finally:
+            remaining = self._callers.get(task, 1) - 1
+            if remaining:
+                self._callers[task] = remaining
+            else:
+                self._callers.pop(task, None)
+
+    def _on_done(self, key, ttl, task):
+        if self._inflight.get(key, (None, None))[1] is task:
+            del self._inflight[key]
+        if not ttl or task.cancelled() or task.exception() is not None:
+            return
+        self._results[key] = (time.monotonic() + ttl, task.result())
+        self._results.move_to_end(key)
+        while len(self._results) > self.MAX_RESULTS:
+            self._results.popitem(last=False)
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def clear(self):
+        self._inflight.clear()
+        self._results.clear()
+        self._callers.clear()
+
+
+SINGLE_FLIGHT = SingleFlight()
+
+
 class TeaSDKPlugin(metaclass=abc.ABCMeta):
     product = None
+    retry_policy = DEFAULT_RETRY_POLICY
+    IDEMPOTENT_ACTION_PREFIXES = ('Get', 'List', 'Describe', 'Query', 'Check', 'Validate', 'Preview', 'Generate')
+    # Read actions whose identical concurrent requests are merged into one call,
+    # mapped to how many seconds the result may be reused afterwards (0 = no reuse).
+    SINGLE_FLIGHT_ACTIONS: ClassVar[dict] = {}
+    # Query-only RPC read actions whose JSON body can be returned as parsed by the
+    # runtime, skipping the response model round-trip. Requires api_version.
+    RAW_BODY_ACTIONS = ()
+    # Opt-in switch for RAW_BODY_ACTIONS, set ALIBABA_CLOUD_IACT3_RAW_BODY=1 to turn it on.
+    RAW_BODY_ENABLED = os.environ.get('ALIBABA_CLOUD_IACT3_RAW_BODY', '').strip().lower() in ('1', 'true')
+    api_version = None
 
     def __init__(
         self, region_id: str, credential: CredentialClient = None, config_kwargs: dict = None, endpoint: str = None
     ):
         self.region_id = region_id
         if not credential:
-            credential = CredentialClient()
+            credential = CREDENTIAL_CACHE.default()
         self.credential = credential
 
         if not config_kwargs:
@@ -108,11 +681,35 @@ class TeaSDKPlugin(metaclass=abc.ABCMeta):
         if endpoint:
             config_kwargs.update(endpoint=endpoint)
 
-        self.config = Config(**config_kwargs)
-        self.endpoint = self.config.endpoint
+        self._config_kwargs = config_kwargs
+        self._config = None
+        self.endpoint = config_kwargs.get('endpoint')
         self._client = None
         self.runtime_option = RuntimeOptions(**self.runtime_kwargs())
 
+    @property
+    def config(self) -> Config:
+        if self._config is None:
+            self._config = Config(**self._config_kwargs)
+        return self._config
+
+    def client_key(self) -> tuple:
+        extra = tuple(
+            sorted(
+                (k, repr(v))
+                for k, v in self._config_kwargs.items()
+                if k not in ('region_id', 'credential', 'endpoint')
+            )
+        )
+        return (
+            self.api_client(),
+            self.product,
+            self.region_id,
+            self._config_kwargs.get('endpoint'),
+            credential_identity(self.credential),
+            extra,
+        )
+
     @abc.abstractmethod
     def api_client(self):
         raise NotImplementedError
@@ -122,12 +719,12 @@ class TeaSDKPlugin(metaclass=abc.ABCMeta):
         raise NotImplementedError
 
     def runtime_kwargs(self):
-        return {'autoretry': True, 'max_attempts': 3}
+        return {'autoretry': False}
 
     @property
     def client(self):
         if not self._client:
-            self._client = self.api_client()(self.config)
+            self._client = CLIENT_REGISTRY.get(self)
             if not self.endpoint:
                 self.endpoint = getattr(self._client, '_endpoint', '')
             elif hasattr(self._client, '_endpoint'):
@@ -136,25 +733,92 @@ class TeaSDKPlugin(metaclass=abc.ABCMeta):
         return self._client
 
     async def send_request(self, request_name: str, ignore_exception: bool = False, **kwargs) -> dict:
-        request = self._build_request(request_name, **kwargs)
-        api_name = self._get_api_name(request_name)
-        action_name = self._get_action_name(api_name)
-        func = getattr(self.client, action_name)
+        api_name = self._resolve_action(request_name)[0]
         try:
-            resp = await func(request, self.runtime_option)
+            if self._is_single_flight(api_name):
+                key = self._single_flight_key(api_name, kwargs)
+                return await SINGLE_FLIGHT.do(
+                    key,
+                    functools.partial(self._send_request, request_name, api_name, kwargs),
+                    ttl=self.SINGLE_FLIGHT_ACTIONS[api_name],
+                )
+            return await self._send_request(request_name, api_name, kwargs)
         except TeaException as ex:
-            LOG.debug(f'plugin exception: {self.product} {self.endpoint} {api_name} {request.to_map()} {ex.data}')
             if ignore_exception:
                 return ex.data
             raise ex
-        if not isinstance(resp, TeaModel):
+
+    async def _send_request(self, request_name: str, api_name: str, kwargs: dict) -> dict:
+        request = self._build_request(request_name, **kwargs)
+        raw_body = self.RAW_BODY_ENABLED and api_name in self.RAW_BODY_ACTIONS
+        if raw_body:
+            func = functools.partial(self._call_raw_body, api_name)
+        else:
+            func = getattr(self.client, self._resolve_action(request_name)[1])
+        bucket = RATE_LIMITER.bucket(self.product, self.region_id, api_name) if RATE_LIMITER.ENABLED else None
+        debug = LOG.isEnabledFor(logging.DEBUG)
+
+        async def attempt():
+            if bucket:
+                await bucket.acquire()
+            try:
+                resp = await func(request, self.runtime_option)
+            except TeaException as ex:
+                if bucket and ex.code in error_code.THROTTLING_RETRY_EXCEPTIONS:
+                    bucket.on_throttle()
+                    if debug:
+                        LOG.debug(f'plugin throttled: {self.product} {self.region_id} {api_name} {bucket.stats()}')
+                raise
+            if bucket:
+                bucket.on_success()
+            return resp
+
+        try:
+            resp = await self.retry_policy.call_async(attempt, idempotent=self._is_idempotent(api_name, kwargs))
+        except TeaException as ex:
+            if debug:
+                LOG.debug(f'plugin exception: {self.product} {self.endpoint} {api_name} {request.to_map()} {ex.data}')
+            raise
+        if raw_body:
+            body = resp.get('body') or {}
+        elif isinstance(resp, TeaModel):
+            body = TeaCore.to_map(resp).get('body', {})
+        else:
             LOG.error(f'plugin response: {self.product} {self.endpoint} {api_name} {request.to_map()} {resp}')
             raise TeaException(
                 dict(code=error_code.UNKNOWN_ERROR, message='The response of TeaSDK is not TeaModel.', data=resp)
             )
-        resp = TeaCore.to_map(resp)
-        LOG.debug(f'plugin response: {self.product} {self.endpoint} {api_name} {request.to_map()} {resp}')
-        return resp.get('body', {})
+        if debug:
+            LOG.debug(f'plugin response: {self.product} {self.endpoint} {api_name} {request.to_map()} {body}')
+        return body
+
+    async def _call_raw_body(self, api_name: str, request: TeaModel, runtime: RuntimeOptions) -> dict:
+        """Send a query-only RPC request and return the runtime's dict response untouched."""
+        request.validate()
+        params = Params(
+            action=api_name,
+            version=self.api_version,
+            protocol='HTTPS',
+            pathname='/',
+            method='POST',
+            auth_type='AK',
+            style='RPC',
+            req_body_type='formData',
+            body_type='json',
+        )
+        api_request = OpenApiRequest(query=OpenApiUtilClient.query(request.to_map()))
+        return await self.client.call_api_async(params, api_request, runtime)
+
+    def _is_single_flight(self, api_name: str) -> bool:
+        return api_name in self.SINGLE_FLIGHT_ACTIONS and api_name.startswith(self.IDEMPOTENT_ACTION_PREFIXES)
+
+    def _single_flight_key(self, api_name: str, kwargs: dict) -> tuple:
+        params = dict(kwargs)
+        params.setdefault('RegionId', self.region_id)
+        return self.client_key(), api_name, json.dumps(params, sort_keys=True, default=str)
+
+    def _is_idempotent(self, api_name: str, kwargs: dict) -> bool:
+        return api_name.startswith(self.IDEMPOTENT_ACTION_PREFIXES) or bool(kwargs.get('ClientToken'))
 
     def _get_api_name(self, request_name):
         if request_name.endswith(REQUEST_SUFFIX):
@@ -172,14 +836,29 @@ class TeaSDKPlugin(metaclass=abc.ABCMeta):
             action_name = f'{action_name}{ASYNC_FLAG}'
         return action_name
 
+    def _resolve_action(self, request_name: str) -> tuple:
+        """Return (api name, client coroutine name, request model class) for ``request_name``.
+
+        Resolution imports the model module and runs two regex passes, so the
+        result is kept in a table owned by the concrete plugin class.
+        """
+        actions = type(self).__dict__.get('_resolved_actions')
+        if actions is None:
+            actions = {}
+            type(self)._resolved_actions = actions
+        resolved = actions.get(request_name)
+        if resolved is None:
+            api_name = self._get_api_name(request_name)
+            class_path = self.models_path(f'{api_name}{REQUEST_SUFFIX}')
+            module_path, class_name = class_path.rsplit('.', 1)
+            request_class = getattr(importlib.import_module(module_path), class_name)
+            resolved = actions[request_name] = (api_name, self._get_action_name(api_name), request_class)
+        return resolved
+
     def _build_request(self, request_name, **kwargs):
         if 'RegionId' not in kwargs:
             kwargs['RegionId'] = self.region_id
-        if not request_name.endswith('Request'):
-            request_name = f'{request_name}Request'
-        class_path = self.models_path(request_name)
-        module_path, class_name = class_path.rsplit('.', 1)
-        request_class = getattr(importlib.import_module(module_path), class_name)
+        request_class = self._resolve_action(request_name)[2]
         request = request_class()
         request = request.from_map(kwargs)
         return request
@@ -199,58 +878,65 @@ class TeaSDKPlugin(metaclass=abc.ABCMeta):
         'Total',
     )
     PAGE_OUTER_KEY = None
+    PAGE_CONCURRENCY = 5
 
     async def fetch_all(self, request, kwargs, *keys):
+        return [value async for value in self.iter_all(request, kwargs, *keys)]
+
+    async def iter_all(self, request, kwargs, *keys, concurrency=None, ordered: bool = True):
+        """Yield the items of every page, keeping at most ``concurrency`` pages in flight.
+
+        With ``ordered`` the items come out in page order, otherwise pages are
+        yielded as soon as they arrive. Pages still in flight are cancelled when
+        the consumer stops iterating early.
+        """
         kwargs = kwargs.copy()
         if self.PAGE_SIZE not in kwargs:
             kwargs[self.PAGE_SIZE] = 50
-
-        ex = []
-        result = []
-
-        # first fetch
-        kwargs[self.PAGE_NUMBER] = 1
-        resp = await self.send_request(request, **kwargs)
-        if self.PAGE_OUTER_KEY:
-            resp = resp.get(self.PAGE_OUTER_KEY)
-        values = self._get_from_resp(resp, *keys)
-        result.extend(values)
-
-        # calculate total pages
+        concurrency = max(1, concurrency or self.PAGE_CONCURRENCY)
+
+        async def fetch_page(page):
+            params = kwargs.copy()
+            params[self.PAGE_NUMBER] = page
+            resp = await self.send_request(request, **params)
+            if self.PAGE_OUTER_KEY:
+                resp = resp.get(self.PAGE_OUTER_KEY)
+            return resp
+
+        resp = await fetch_page(1)
+        for value in self._get_from_resp(resp, *keys):
+            yield value
+
+        pages = iter(range(2, self._get_total_pages(resp, kwargs[self.PAGE_SIZE]) + 1))
+        pending = [asyncio.ensure_future(fetch_page(page)) for page in itertools.islice(pages, concurrency)]
+        try:
+            while pending:
+                if ordered:
+                    task = pending.pop(0)
+                    await asyncio.wait([task])
+                else:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    task = next(t for t in pending if t in done)
+                    pending.remove(task)
+                resp = task.result()
+                page = next(pages, None)
+                if page is not None:
+                    pending.append(asyncio.ensure_future(fetch_page(page)))
+                for value in self._get_from_resp(resp, *keys):
+                    yield value
+        finally:
+            for task in pending:
+                if task.done() and not task.cancelled():
+                    task.exception()
+                else:
+                    task.cancel()
+
+    def _get_total_pages(self, resp, page_size):
         if self.TOTAL_COUNT in resp:
-            total_pages = (resp[self.TOTAL_COUNT] - 1) // kwargs[self.PAGE_SIZE] + 1
-        elif self.TOTAL in resp:
-            total_pages = (resp[self.TOTAL] - 1) // kwargs[self.PAGE_SIZE] + 1
-        else:
-            total_pages = resp[self.TOTAL_PAGES]
-
-        if total_pages <= 1:
-            return result
-
-        # concurrent fetch
-        async def fetch_one_page(page, params):
-            try:
-                params = params.copy()
-                params[self.PAGE_NUMBER] = page
-                resp = await self.send_request(request, **params)
-                if self.PAGE_OUTER_KEY:
-                    resp = resp.get(self.PAGE_OUTER_KEY)
-                values = self._get_from_resp(resp, *keys)
-                result.extend(values)
-            except Exception as e:
-                LOG.error(e)
-                ex.append(e)
-
-        tasks = []
-        for i in range(2, total_pages + 1):
-            task = asyncio.create_task(fetch_one_page(i, kwargs))
-            tasks.append(task)
-        await asyncio.gather(*tasks)
-
-        if ex:
-            raise ex[0]
-
-        return result
+            return (resp[self.TOTAL_COUNT] - 1) // page_size + 1
+        if self.TOTAL in resp:
+            return (resp[self.TOTAL] - 1) // page_size + 1
+        return resp[self.TOTAL_PAGES]
 
     @staticmethod
     def _get_from_resp(resp, *keys):
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+from typing import ClassVar
+
 from alibabacloud_ecs20140526.client import Client
 
 from iact3.plugin.base_plugin import TeaSDKPlugin
@@ -6,6 +8,7 @@ from iact3.plugin.base_plugin import TeaSDKPlugin
 
 class EcsBasePlugin(TeaSDKPlugin):
     product = 'ECS'
+    api_version = '2014-05-26'
 
     def __init__(self, region_id: str, credential=None, config_kwargs: dict = None, endpoint: str = None):
         if not endpoint:
@@ -19,10 +22,13 @@ class EcsBasePlugin(TeaSDKPlugin):
         return 'alibabacloud_ecs20140526.models.{}'.format(action_name)
 
     def runtime_kwargs(self):
-        return {'autoretry': True, 'max_attempts': 3, 'read_timeout': 60000, 'connect_timeout': 60000}
+        return {'autoretry': False, 'read_timeout': 60000, 'connect_timeout': 60000}
 
 
 class EcsPlugin(EcsBasePlugin):
+    SINGLE_FLIGHT_ACTIONS: ClassVar[dict] = {'DescribeZones': 30, 'DescribeAvailableResource': 30, 'DescribeSecurityGroups': 0}
+    RAW_BODY_ACTIONS = ('DescribeAvailableResource', 'DescribeZones', 'DescribeSecurityGroups')
+
     async def get_security_group(self, vpc_id: str = None, security_group_id: str = None):
         kwargs = dict(VpcId=vpc_id, SecurityGroupIds=security_group_id)
         sgs = await self.fetch_all('DescribeSecurityGroups', kwargs, 'SecurityGroups', 'SecurityGroup')
@@ -30,6 +36,9 @@ class EcsPlugin(EcsBasePlugin):
             if not sg['ServiceManaged']:
                 return sg
 
+    async def list_security_groups(self) -> list:
+        return await self.fetch_all('DescribeSecurityGroups', {}, 'SecurityGroups', 'SecurityGroup')
+
     async def describe_zones(self) -> list:
         """Return list of available zone IDs in the current region.
 
@@ -1,18 +1,30 @@
+import asyncio
 import base64
+import concurrent.futures
+import functools
+import hashlib
 import json
+import logging
+import os
 
 import oss2
 from alibabacloud_credentials import credentials
-from retrying import retry
 
-from iact3.plugin.base_plugin import CredentialClient
+from iact3.plugin.base_plugin import CREDENTIAL_CACHE, CredentialClient, RefreshAheadCredential, RetryPolicy
 
+LOG = logging.getLogger(__name__)
 
-def retry_on_exception(exception):
-    return isinstance(exception, oss2.exceptions.RequestError)
+OSS_RETRY_POLICY = RetryPolicy(max_attempts=3, deadline=60.0, connection_errors=(oss2.exceptions.RequestError,))
+# oss2 is blocking; async callers run each attempt on this pool so the event loop never waits on OSS.
+OSS_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix='iact3-oss')
 
 
 class OssPlugin:
+    MULTIPART_THRESHOLD = 8 * 1024 * 1024
+    PART_SIZE = 4 * 1024 * 1024
+    MULTIPART_THREADS = 4
+    DIGEST_META_HEADER = 'x-oss-meta-iact3-sha256'
+
     def __init__(
         self, region_id: str, bucket_name: str, endpoint: str = None, credential: CredentialClient = None, **kwargs
     ):
@@ -25,10 +37,14 @@ class OssPlugin:
 
     @staticmethod
     def _get_auth(cred: CredentialClient = None):
-        cred_client = CredentialClient() if cred is None else cred
+        cred_client = CREDENTIAL_CACHE.default() if cred is None else cred
         credential = cred_client.cloud_credential
         if isinstance(credential, credentials.AccessKeyCredential):
             auth = oss2.Auth(credential.access_key_id, credential.access_key_secret)
+        elif isinstance(credential, RefreshAheadCredential):
+            # Plugins are built on the event loop; do not wait for a refresh while a valid token is at hand.
+            snapshot = credential.snapshot()
+            auth = oss2.StsAuth(snapshot.access_key_id, snapshot.access_key_secret, snapshot.security_token)
         elif isinstance(credential, credentials.StsCredential):
             auth = oss2.StsAuth(credential.access_key_id, credential.access_key_secret, credential.security_token)
         else:
@@ -40,7 +56,6 @@ class OssPlugin:
         cb_str = json.dumps(callback_params).strip()
         return oss2.compat.to_string(base64.b64encode(oss2.compat.to_bytes(cb_str)))
 
-    @retry(retry_on_exception=retry_on_exception, stop_max_attempt_number=3, wait_fixed=5)
     def put_object_with_string(
         self, object_name: str, strings: str, callback_params: dict = None, callback_var_params: dict = None
     ):
@@ -50,27 +65,82 @@ class OssPlugin:
         if callback_var_params:
             params['x-oss-callback-var'] = self._encode_callback(callback_var_params)
         if params:
+            # A retry would call the callback server again, so puts with a callback are sent once.
             self.client.put_object(object_name, strings, params)
         else:
-            self.client.put_object(object_name, strings)
+            self._put_string(object_name, strings)
+
+    @OSS_RETRY_POLICY.wrap()
+    def _put_string(self, object_name: str, strings: str):
+        self.client.put_object(object_name, strings)
 
-    @retry(retry_on_exception=retry_on_exception, stop_max_attempt_number=3, wait_fixed=5)
+    @OSS_RETRY_POLICY.wrap()
     def put_local_file(self, object_name: str, local_file: str):
         self.client.put_object_from_file(object_name, local_file)
 
-    @retry(retry_on_exception=retry_on_exception, stop_max_attempt_number=3, wait_fixed=5)
+    @staticmethod
+    def file_digest(local_file) -> str:
+        digest = hashlib.sha256()
+        with open(local_file, 'rb') as file_handle:
+            for chunk in iter(lambda: file_handle.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _remote_digest(self, object_name: str):
+        try:
+            return self.client.head_object(object_name).headers.get(self.DIGEST_META_HEADER)
+        except oss2.exceptions.NotFound:
+            return None
+
+    @OSS_RETRY_POLICY.wrap()
+    def upload_file(self, object_name: str, local_file, skip_if_unchanged: bool = False) -> bool:
+        """Upload ``local_file`` and return whether it was uploaded.
+
+        With ``skip_if_unchanged`` the SHA-256 of the content is compared with
+        the one stored in the metadata of the remote object, at the cost of
+        reading the file and a HEAD request, and an identical object is not
+        uploaded again; only ask for it when ``object_name`` is stable across
+        runs. Files over ``MULTIPART_THRESHOLD`` go through oss2's resumable
+        multipart upload, so an interrupted upload continues from its last
+        finished part.
+        """
+        headers = None
+        if skip_if_unchanged:
+            digest = self.file_digest(local_file)
+            if self._remote_digest(object_name) == digest:
+                return False
+            headers = {self.DIGEST_META_HEADER: digest}
+        if os.path.getsize(local_file) >= self.MULTIPART_THRESHOLD:
+            oss2.resumable_upload(
+                self.client,
+                object_name,
+                str(local_file),
+                headers=headers,
+                multipart_threshold=self.MULTIPART_THRESHOLD,
+                part_size=self.PART_SIZE,
+                num_threads=self.MULTIPART_THREADS,
+            )
+        else:
+            self.client.put_object_from_file(object_name, str(local_file), headers=headers)
+        return True
+
+    @OSS_RETRY_POLICY.wrap()
     def object_exists(self, object_name: str):
         return self.client.object_exists(object_name)
 
-    @retry(retry_on_exception=retry_on_exception, stop_max_attempt_number=3, wait_fixed=5)
+    @OSS_RETRY_POLICY.wrap()
     def get_object_content(self, object_name: str):
         return self.client.get_object(object_name)
 
-    @retry(retry_on_exception=retry_on_exception, stop_max_attempt_number=3, wait_fixed=5)
+    @OSS_RETRY_POLICY.wrap()
     def get_object_meta(self, object_name: str):
         return self.client.get_object_meta(object_name)
 
-    @retry(retry_on_exception=retry_on_exception, stop_max_attempt_number=3, wait_fixed=5)
+    @OSS_RETRY_POLICY.wrap()
+    def read_object(self, object_name: str) -> bytes:
+        return self.client.get_object(object_name).read()
+
+    @OSS_RETRY_POLICY.wrap()
     def bucket_exist(self):
         try:
             self.client.get_bucket_info()
@@ -79,3 +149,80 @@ class OssPlugin:
                 return False
             raise
         return True
+
+    def _call_async(self, method, *args, **kwargs):
+        """Await a retried ``method`` with each attempt on OSS_EXECUTOR and asynchronous backoff in between."""
+        attempt = functools.partial(method.__wrapped__, self, *args, **kwargs)
+        loop = asyncio.get_event_loop()
+        return OSS_RETRY_POLICY.call_async(lambda: loop.run_in_executor(OSS_EXECUTOR, attempt))
+
+    async def put_object_with_string_async(
+        self, object_name: str, strings: str, callback_params=None, callback_var_params=None
+    ):
+        if callback_params or callback_var_params:
+            put = functools.partial(
+                self.put_object_with_string, object_name, strings, callback_params, callback_var_params
+            )
+            return await asyncio.get_event_loop().run_in_executor(OSS_EXECUTOR, put)
+        return await self._call_async(OssPlugin._put_string, object_name, strings)
+
+    async def put_local_file_async(self, object_name: str, local_file: str):
+        return await self._call_async(OssPlugin.put_local_file, object_name, local_file)
+
+    async def upload_file_async(self, object_name: str, local_file, skip_if_unchanged: bool = False) -> bool:
+        return await self._call_async(OssPlugin.upload_file, object_name, local_file, skip_if_unchanged)
+
+    async def object_exists_async(self, object_name: str):
+        return await self._call_async(OssPlugin.object_exists, object_name)
+
+    async def get_object_meta_async(self, object_name: str):
+        return await self._call_async(OssPlugin.get_object_meta, object_name)
+
+    async def read_object_async(self, object_name: str) -> bytes:
+        return await self._call_async(OssPlugin.read_object, object_name)
+
+    async def bucket_exist_async(self):
+        return await self._call_async(OssPlugin.bucket_exist)
+
+
+class OssUploader:
+    """Upload files to OSS concurrently, as soon as each one is submitted.
+
+    At most ``concurrency`` uploads run at a time. :meth:`wait` finishes the
+    remaining uploads and raises the first failure, if any. With
+    ``skip_if_unchanged``, for a prefix that is stable across runs, files
+    identical to the objects already there are not uploaded again.
+    """
+
+    CONCURRENCY = 8
+
+    def __init__(
+        self, plugin: OssPlugin, prefix: str, local_dir, concurrency=None, skip_if_unchanged: bool = False
+    ):
+        self.plugin = plugin
+        self.prefix = prefix
+        self.local_dir = local_dir
+        self.skip_if_unchanged = skip_if_unchanged
+        self.uploaded = []
+        self.skipped = []
+        self._semaphore = asyncio.Semaphore(concurrency or self.CONCURRENCY)
+        self._tasks = {}
+
+    def submit(self, file_name: str):
+        if file_name not in self._tasks:
+            self._tasks[file_name] = asyncio.ensure_future(self._upload(file_name))
+
+    async def _upload(self, file_name: str):
+        async with self._semaphore:
+            uploaded = await self.plugin.upload_file_async(
+                f'{self.prefix}/{file_name}', self.local_dir / file_name, self.skip_if_unchanged
+            )
+        (self.uploaded if uploaded else self.skipped).append(file_name)
+
+    async def wait(self):
+        results = await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        if self.skipped:
+            LOG.info(f'skipped {len(self.skipped)} unchanged report files already in oss')
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
@@ -1,4 +1,5 @@
 import json
+from typing import ClassVar
 
 from Tea.exceptions import TeaException
 from alibabacloud_ros20190910.client import Client as ROSClient
@@ -8,6 +9,7 @@ from iact3.plugin.base_plugin import TeaSDKPlugin
 
 class ROSPlugin(TeaSDKPlugin):
     product = 'ROS'
+    api_version = '2019-09-10'
 
     def api_client(self):
         return ROSClient
@@ -16,11 +18,13 @@ class ROSPlugin(TeaSDKPlugin):
         return 'alibabacloud_ros20190910.models.{}'.format(action_name)
 
     def runtime_kwargs(self):
-        return {'autoretry': True, 'max_attempts': 3, 'read_timeout': 60000, 'connect_timeout': 60000}
+        return {'autoretry': False, 'read_timeout': 60000, 'connect_timeout': 60000}
 
 
 class StackPlugin(ROSPlugin):
     IGNORE_ERRORS = ('StackNotFound',)
+    SINGLE_FLIGHT_ACTIONS: ClassVar[dict] = {'GetStack': 0, 'ListStacks': 0, 'DescribeRegions': 300}
+    RAW_BODY_ACTIONS = ('ListStacks', 'ListStackEvents', 'GetStack', 'ListStackResources')
 
     @staticmethod
     def _convert_parameters(parameters: dict, kwargs: dict):
@@ -120,10 +124,17 @@ class StackPlugin(ROSPlugin):
         result = await self.send_request('ListStacksRequest', **request_kwargs)
         return result.get('Stacks')
 
+    async def list_stacks_by_ids(self, stack_ids: list):
+        kwargs = {'StackIds': list(stack_ids)}
+        return await self.fetch_all('ListStacksRequest', kwargs, 'Stacks')
+
     async def fetch_all_stacks(self, tags, stack_id=None):
+        return [stack async for stack in self.iter_stacks(tags, stack_id=stack_id)]
+
+    def iter_stacks(self, tags, stack_id=None, concurrency=None):
         kwargs = {'StackId': stack_id}
         self._convert_tags(tags, kwargs, tag_key='Tag')
-        return await self.fetch_all('ListStacksRequest', kwargs, 'Stacks')
+        return self.iter_all('ListStacksRequest', kwargs, 'Stacks', concurrency=concurrency)
 
     async def list_stack_resources(self, stack_id):
         kwargs = dict(StackId=stack_id)
@@ -143,8 +154,11 @@ class StackPlugin(ROSPlugin):
         return await self.send_request('GetStackResourceRequest', **kwargs)
 
     async def list_stack_events(self, stack_id):
+        return [event async for event in self.iter_stack_events(stack_id)]
+
+    def iter_stack_events(self, stack_id, concurrency=None):
         kwargs = dict(StackId=stack_id)
-        return await self.fetch_all('ListStackEventsRequest', kwargs, 'Events')
+        return self.iter_all('ListStackEventsRequest', kwargs, 'Events', concurrency=concurrency)
 
     async def get_regions(self, lang: str = None) -> list:
         """Return a list of region ID strings.
@@ -172,6 +186,15 @@ class StackPlugin(ROSPlugin):
             for region in (response['Regions'] or [])
         ]
 
+    async def list_resource_types(self, entity_type=None) -> list:
+        """Return the resource types ROS supports.
+
+        ListResourceTypes has no RegionId and is served by the central
+        endpoint, so the list is the same whichever region the plugin is for.
+        """
+        result = await self.send_request('ListResourceTypesRequest', EntityType=entity_type)
+        return result.get('ResourceTypes') or []
+
     async def get_parameter_constraints(
         self,
         template_body: str = None,
@@ -1,3 +1,5 @@
+from typing import ClassVar
+
 from alibabacloud_vpc20160428.client import Client
 
 from iact3.plugin.base_plugin import TeaSDKPlugin
@@ -5,6 +7,7 @@ from iact3.plugin.base_plugin import TeaSDKPlugin
 
 class VpcBasePlugin(TeaSDKPlugin):
     product = 'VPC'
+    api_version = '2016-04-28'
 
     def __init__(self, region_id: str, credential=None, config_kwargs: dict = None, endpoint: str = None):
         if not endpoint:
@@ -19,6 +22,9 @@ class VpcBasePlugin(TeaSDKPlugin):
 
 
 class VpcPlugin(VpcBasePlugin):
+    SINGLE_FLIGHT_ACTIONS: ClassVar[dict] = {'DescribeVpcs': 0, 'DescribeVSwitches': 0}
+    RAW_BODY_ACTIONS = ('DescribeVpcs', 'DescribeVSwitches')
+
     async def get_one_vpc(self, vpc_id: str = None):
         kwargs = dict(VpcId=vpc_id, PageSize=50)
         response = await self.send_request('DescribeVpcsRequest', **kwargs)
@@ -34,3 +40,9 @@ class VpcPlugin(VpcBasePlugin):
         for vsw in vsws:
             if vsw['AvailableIpAddressCount'] > 1:
                 return vsw
+
+    async def list_vpcs(self) -> list:
+        return await self.fetch_all('DescribeVpcsRequest', {}, 'Vpcs', 'Vpc')
+
+    async def list_vswitches(self) -> list:
+        return await self.fetch_all('DescribeVSwitchesRequest', {}, 'VSwitches', 'VSwitch')
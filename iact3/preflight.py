@@ -0,0 +1,52 @@
+import logging
+
+from iact3.discovery import DiscoveryService
+from iact3.instance_types import ECS_INSTANCE_RESOURCE_TYPES
+from iact3.template_cache import PARSED_TEMPLATES, TEMPLATE_CACHE
+
+LOG = logging.getLogger(__name__)
+
+SKIPPED = 'SKIPPED'
+
+
+async def unsupported_reason(config, discovery: DiscoveryService):
+    """Return why the test of ``config`` can not run in its region, or ``None`` when it may.
+
+    Runs before parameter generation and only asks for answers the discovery
+    cache keeps across runs: every ``ALIYUN::`` resource type of the template
+    must be supported by ROS (ListResourceTypes, which is account-wide: ROS
+    offers no per-region list) and, when the template creates ECS instances,
+    the region must have pay-as-you-go instance types in stock. A check that
+    can not be completed passes, so the test still runs and reports the real
+    error.
+    """
+    try:
+        body = await TEMPLATE_CACHE.get(config.template_config, config.region, config.auth.credential)
+        resource_types = PARSED_TEMPLATES.get(body).resource_types if body else []
+    except Exception as ex:
+        LOG.debug(f'skipping pre-flight checks of {config.test_name} in {config.region}: {ex}', exc_info=True)
+        return None
+    required = [resource_type for resource_type in resource_types if resource_type.startswith('ALIYUN::')]
+    if not required:
+        return None
+
+    try:
+        supported = set(await discovery.resource_types())
+    except Exception as ex:
+        LOG.debug(f'failed to list resource types supported by ROS: {ex}', exc_info=True)
+        supported = None
+    if supported:
+        unsupported = [resource_type for resource_type in required if resource_type not in supported]
+        if unsupported:
+            return f'{", ".join(unsupported)} not supported by ROS'
+
+    if not any(resource_type in ECS_INSTANCE_RESOURCE_TYPES for resource_type in required):
+        return None
+    try:
+        instance_types = await discovery.available_instance_types(instance_charge_type='PostPaid')
+    except Exception as ex:
+        LOG.debug(f'failed to query available instance types of {config.region}: {ex}', exc_info=True)
+        return None
+    if not instance_types:
+        return f'no ECS instance type is available in {config.region}'
+    return None
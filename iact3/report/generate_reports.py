@@ -13,6 +13,7 @@ import aiofiles
 import tabulate
 import yattag
 
+from iact3.preflight import SKIPPED
 from iact3.stack import Stacker, Stack
 
 LOG = logging.getLogger(__name__)
@@ -96,7 +97,12 @@ class ReportBuilder:
                                 stack_name = stack.name
                                 region = stack.region
                                 stack_id = stack.id
-                                css = "class=test-green" if status == 'CREATE_COMPLETE' else 'class=test-red'
+                                if status == 'CREATE_COMPLETE':
+                                    css = 'class=test-green'
+                                elif status == SKIPPED:
+                                    css = 'class=test-skipped'
+                                else:
+                                    css = 'class=test-red'
 
                                 with tag("tr"):
                                     with tag("td", "class=test-info"):
@@ -115,7 +121,12 @@ class ReportBuilder:
                                         with tag("a", href=clog, target="_blank"):
                                             text("View Logs ")
                                 success = stack.launch_succeeded
-                                if not success:
+                                if status == SKIPPED:
+                                    result = 'Skipped'
+                                elif success:
+                                    result = 'Success'
+                                else:
+                                    result = 'Failed'
                                     test_result = 'Failed'
                                 details.append(
                                     {
@@ -125,7 +136,7 @@ class ReportBuilder:
                                         'StackId': stack.id,
                                         'TestResult': status,
                                         'TestLog': clog,
-                                        'Result': 'Success' if success else 'Failed',
+                                        'Result': result,
                                     }
                                 )
                         doc.stag("p")
@@ -198,7 +209,12 @@ class ReportBuilder:
             for h in stack.hook_results or []
         ]
 
-    async def create_logs(self, log_format: str):
+    async def create_logs(self, log_format: str, on_written=None):
+        """Write the per-stack log files and return their names.
+
+        ``on_written`` is called with each file name as soon as that stack's
+        files are complete, so they can be shipped while others are written.
+        """
         if log_format:
             log_formats = log_format.split(',')
         else:
@@ -207,17 +223,27 @@ class ReportBuilder:
         file_names = []
         for stack in self._stacks.stacks:
             file_name = f'{stack.name}-{stack.region}'
-            task = asyncio.create_task(self.write_logs(stack, self._output_file / file_name, log_formats))
-            tasks.append(task)
-            file_names.append(file_name + ".txt")
+            stack_file_names = [file_name + ".txt"]
             if "json" in log_formats:
-                file_names.append(file_name + ".json")
+                stack_file_names.append(file_name + ".json")
             if "xml" in log_formats:
-                file_names.append(file_name + ".xml")
+                stack_file_names.append(file_name + ".xml")
+            log_path = self._output_file / file_name
+            task = asyncio.create_task(
+                self._write_logs_and_notify(stack, log_path, log_formats, stack_file_names, on_written)
+            )
+            tasks.append(task)
+            file_names.extend(stack_file_names)
         await asyncio.gather(*tasks)
         file_names.append(self._report_json_name)
         return file_names
 
+    async def _write_logs_and_notify(self, stack: Stack, log_path: Path, log_formats: list, file_names, on_written):
+        await self.write_logs(stack, log_path, log_formats)
+        if on_written:
+            for file_name in file_names:
+                on_written(file_name)
+
     async def add_attr_minidom(self, doc: minidom.Document, father_node: minidom.Element, label, value):
         child = doc.createElement(label)
         father_node.appendChild(child)
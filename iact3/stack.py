@@ -1,22 +1,28 @@
 import asyncio
+import functools
 import logging
 import re
 import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, List
+from typing import ClassVar, Optional, List
 from uuid import UUID, uuid4
 
 from Tea.exceptions import TeaException
 
 from iact3.config import TestConfig, IAC_NAME, HookExecuteTime
+from iact3.discovery_cache import DISCOVERY_CACHE
 from iact3.exceptions import Iact3Exception
+from iact3.instance_types import instance_prices_from_estimate, record_instance_prices
 from iact3.plugin.ros import StackPlugin
+from iact3.template_cache import PARSED_TEMPLATES
 from iact3.util import generate_client_token_ex
-from iact3.plugin.base_plugin import CredentialClient
+from iact3.plugin.base_plugin import CredentialClient, RetryPolicy, credential_identity
 
 LOG = logging.getLogger(__name__)
 
+CREATE_RECOVERY_POLICY = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=5.0, deadline=30.0)
+
 
 class Timer:
     def __init__(self, interval, callback, *args, **kwargs):
@@ -38,6 +44,103 @@ class Timer:
         self._task.cancel()
 
 
+class StackSubscription:
+    def __init__(self, poller, stack):
+        self._poller = poller
+        self._stack = stack
+
+    def cancel(self):
+        self._poller.unsubscribe(self._stack)
+
+
+class StackStatusPoller:
+    '''
+    Refreshes every stack that shares a region and credential with one
+    ListStacks call per tick instead of one GetStack call per stack.
+    Stacks missing from the batched response (e.g. deleted stacks) fall
+    back to their own GetStack refresh.
+    '''
+
+    BATCH_SIZE = 10
+    ENABLED = True
+    _pollers: ClassVar[dict] = {}
+
+    def __init__(self, key, interval):
+        self._key = key
+        self._interval = interval
+        self._loop = asyncio.get_running_loop()
+        self._stacks = {}
+        self._task = None
+
+    @classmethod
+    def subscribe(cls, stack) -> StackSubscription:
+        key = (stack.region, credential_identity(stack.credential))
+        poller = cls._pollers.get(key)
+        if poller is None or poller._loop is not asyncio.get_running_loop():
+            poller = cls(key, stack.auto_refresh_interval.total_seconds())
+            cls._pollers[key] = poller
+        poller._stacks[id(stack)] = stack
+        if poller._task is None or poller._task.done():
+            poller._task = asyncio.create_task(poller._job())
+        return StackSubscription(poller, stack)
+
+    def unsubscribe(self, stack):
+        self._stacks.pop(id(stack), None)
+        if self._stacks:
+            return
+        if self._pollers.get(self._key) is self:
+            del self._pollers[self._key]
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    async def _job(self):
+        while self._stacks:
+            try:
+                await self.poll()
+            except Exception as ex:
+                LOG.debug('An error occurred while polling stacks in %s: %s', self._key[0], ex, exc_info=True)
+            if not self._stacks:
+                break
+            await asyncio.sleep(self._interval)
+
+    async def poll(self):
+        # A stack without an id is only worth waiting for while its creation is being requested.
+        for stack in list(self._stacks.values()):
+            if not stack.id and stack.status not in StackStatus.IN_PROGRESS:
+                self.unsubscribe(stack)
+        stacks = [stack for stack in self._stacks.values() if stack.id]
+        if not stacks:
+            return
+        stack_ids = [stack.id for stack in stacks]
+        chunks = [stack_ids[i : i + self.BATCH_SIZE] for i in range(0, len(stack_ids), self.BATCH_SIZE)]
+        plugin = stacks[0].plugin
+        results = await asyncio.gather(*(self._list_stacks(plugin, chunk) for chunk in chunks))
+        found = {}
+        for chunk, result in zip(chunks, results):
+            for props in result:
+                if props.get('StackId') in chunk:
+                    found[props['StackId']] = props
+        await asyncio.gather(*(self._refresh(stack, found.get(stack.id)) for stack in stacks))
+
+    @staticmethod
+    async def _list_stacks(plugin, stack_ids):
+        try:
+            return await plugin.list_stacks_by_ids(stack_ids) or []
+        except Exception as ex:
+            LOG.debug('Batched ListStacks failed, falling back to GetStack: %s', ex, exc_info=True)
+            return []
+
+    @staticmethod
+    async def _refresh(stack, props):
+        try:
+            if props:
+                await stack.set_stack_properties(props)
+            else:
+                await stack.refresh()
+        except Exception as ex:
+            LOG.debug('An error occurred while refreshing stack %s: %s', stack.id, ex, exc_info=True)
+
+
 class FilterableList(list):
     def filter(self, kwargs: Optional[dict] = None):
         if not kwargs:
@@ -324,6 +427,7 @@ class Stack:
         self.uuid: UUID = uuid if uuid else uuid4()
         self.id: str = stack_id
         self.region = region
+        self.credential = credential
         self.plugin: StackPlugin = StackPlugin(region_id=region, credential=credential)
         self.name = stack_name
         self.parameters = parameters
@@ -337,7 +441,7 @@ class Stack:
         self.auto_refresh_interval: timedelta = timedelta(seconds=5)
         self._last_event_refresh: datetime = datetime.fromtimestamp(0)
         self._last_resource_refresh: datetime = datetime.fromtimestamp(0)
-        self.timer = Timer(self.auto_refresh_interval.total_seconds(), self.refresh)
+        self.timer = self._start_auto_refresh()
         self.template_price = template_price
         self.preview_result = preview_result
         self.outputs = None
@@ -350,6 +454,11 @@ class Stack:
     def __repr__(self):
         return '<Stack object {} at {}>'.format(self.test_name, hex(id(self)))
 
+    def _start_auto_refresh(self):
+        if StackStatusPoller.ENABLED:
+            return StackStatusPoller.subscribe(self)
+        return Timer(self.auto_refresh_interval.total_seconds(), self.refresh)
+
     def _auto_refresh(self, last_refresh):
         if datetime.now() - last_refresh > self.auto_refresh_interval:
             return True
@@ -515,40 +624,31 @@ class Stack:
             )
         except TeaException as ex:
             recovered = None
-            for attempt in range(3):
-                try:
-                    candidates = await plugin.list_stacks(stack_name=stack_name) or []
-                    recovered = next(
-                        (
-                            candidate
-                            for candidate in candidates
-                            if (
-                                candidate.get('StackName') == stack_name
-                                and candidate.get('StackId')
-                            )
-                        ),
-                        None,
-                    )
-                except Exception as lookup_error:
-                    LOG.warning(
-                        'Could not check whether stack %s was created: %s',
-                        stack_name,
-                        lookup_error,
-                    )
-                if recovered:
-                    stack.id = recovered.get('StackId')
-                    stack.status = recovered.get('Status') or 'CREATE_IN_PROGRESS'
-                    stack.status_reason = recovered.get('StatusReason') or ''
-                    stack.create_time = recovered.get('CreateTime') or ''
-                    stack.status_time = recovered.get('StatusTime') or ''
-                    if stack_created_callback:
-                        stack_created_callback(stack)
-                    await stack.refresh()
-                    return stack
-                if attempt < 2:
-                    await asyncio.sleep(1)
+            try:
+                recovered = await CREATE_RECOVERY_POLICY.call_async(
+                    functools.partial(cls._find_created_stack, plugin, stack_name),
+                    retry_if_result=lambda candidate: candidate is None,
+                )
+            except Exception as lookup_error:
+                LOG.warning(
+                    'Could not check whether stack %s was created: %s',
+                    stack_name,
+                    lookup_error,
+                    exc_info=LOG.isEnabledFor(logging.DEBUG),
+                )
+            if recovered:
+                stack.id = recovered.get('StackId')
+                stack.status = recovered.get('Status') or 'CREATE_IN_PROGRESS'
+                stack.status_reason = recovered.get('StatusReason') or ''
+                stack.create_time = recovered.get('CreateTime') or ''
+                stack.status_time = recovered.get('StatusTime') or ''
+                if stack_created_callback:
+                    stack_created_callback(stack)
+                await stack.refresh()
+                return stack
             stack.status = 'CREATE_UNCONFIRMED'
             stack.status_reason = ex.message
+            await DISCOVERY_CACHE.invalidate_on_failure(region, ex.code, ex.message)
             stack._launch_succeeded = False
             stack.timer.cancel()
             if stack_created_callback:
@@ -560,6 +660,19 @@ class Stack:
         await stack.refresh()
         return stack
 
+    @staticmethod
+    async def _find_created_stack(plugin, stack_name: str):
+        '''Return the stack named ``stack_name`` if a failed CreateStack call actually created it.'''
+        candidates = await plugin.list_stacks(stack_name=stack_name) or []
+        return next(
+            (
+                candidate
+                for candidate in candidates
+                if candidate.get('StackName') == stack_name and candidate.get('StackId')
+            ),
+            None,
+        )
+
     @classmethod
     async def get_price(cls, test: TestConfig, tags: dict = None, uuid: UUID = None):
         parameters = test.parameters
@@ -592,6 +705,7 @@ class Stack:
                 parameters=parameters, **template_args, region_id=region
             )
         except TeaException as ex:
+            await DISCOVERY_CACHE.invalidate_on_failure(region, ex.code, ex.message)
             stack_id = None
             stack = cls(
                 region,
@@ -607,6 +721,7 @@ class Stack:
             stack._launch_succeeded = False
             stack.timer.cancel()
             return stack
+        await cls._record_instance_prices(test, template_price)
         stack_id = None
         stack = cls(
             region,
@@ -618,8 +733,22 @@ class Stack:
             credential=credential,
             template_price=template_price,
         )
+        stack.timer.cancel()
         return stack
 
+    @staticmethod
+    async def _record_instance_prices(test: TestConfig, template_price):
+        '''Keep the hourly ECS instance prices of an estimate as ranking weights for later runs.'''
+        template_body = test.template_config.template_body
+        if not template_body or not template_price:
+            return
+        try:
+            template = PARSED_TEMPLATES.get(template_body).tree
+            prices = instance_prices_from_estimate(template_price, template, test.parameters)
+            await record_instance_prices(test.region, test.auth.credential, prices)
+        except Exception as ex:
+            LOG.debug('Could not record instance prices of %s: %s', test.test_name, ex, exc_info=True)
+
     @classmethod
     async def preview_stack_result(cls, test: TestConfig, tags: dict = None, uuid: UUID = None):
         parameters = test.parameters
@@ -652,6 +781,7 @@ class Stack:
                 parameters=parameters, **template_args, region_id=region, stack_name=stack_name
             )
         except TeaException as ex:
+            await DISCOVERY_CACHE.invalidate_on_failure(region, ex.code, ex.message)
             stack_id = None
             stack = cls(
                 region,
@@ -678,6 +808,7 @@ class Stack:
             credential=credential,
             preview_result=preview_result,
         )
+        stack.timer.cancel()
         return stack
 
     async def refresh(self, properties: bool = True, events: bool = False, resources: bool = False) -> None:
@@ -695,8 +826,11 @@ class Stack:
         if not props:
             if self.id:
                 props = await self.plugin.get_stack(self.id, output_option='Disabled') or {}
+        previous_status = self._status
         self.status = props.get('Status') or self._status  # preserve previous status if API returns empty
         self.status_reason = props.get('StatusReason') or self.status_reason
+        if self.status != previous_status and self.status in StackStatus.FAILED:
+            await DISCOVERY_CACHE.invalidate_on_failure(self.region, self.status_reason)
         self.create_time = props.get('CreateTime') or self.create_time
         self.status_time = props.get('StatusTime') or self.status_time
 
@@ -717,8 +851,7 @@ class Stack:
     async def _fetch_stack_events(self) -> None:
         self._last_event_refresh = datetime.now()
         events = Events()
-        stack_events = await self.plugin.list_stack_events(self.id)
-        for event in stack_events:
+        async for event in self.plugin.iter_stack_events(self.id):
             events.append(Event(event))
         self._events = events
 
@@ -755,7 +888,7 @@ class Stack:
             stack.status = 'DELETE_COMPLETE'
         stack.timer.cancel()
         if stack.status in StackStatus.IN_PROGRESS:
-            stack.timer = Timer(stack.auto_refresh_interval.total_seconds(), stack.refresh)
+            stack.timer = stack._start_auto_refresh()
 
     def error_events(self, refresh=False) -> Events:
         errors = Events()
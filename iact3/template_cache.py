@@ -0,0 +1,331 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+from urllib.request import url2pathname
+
+import requests
+
+from iact3.exceptions import Iact3Exception
+from iact3.plugin.base_plugin import SINGLE_FLIGHT, credential_identity
+from iact3.plugin.oss import OssPlugin
+from iact3.plugin.ros import StackPlugin
+from iact3.util import CustomSafeLoader, yaml
+
+LOG = logging.getLogger(__name__)
+
+
+def content_digest(body) -> str:
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hashlib.sha256(body).hexdigest()
+
+
+class _CachedSource:
+    __slots__ = ('checked_at', 'digest', 'immutable', 'validators')
+
+    def __init__(self, digest: str, validators, checked_at: float, immutable: bool):
+        self.digest = digest
+        self.validators = validators
+        self.checked_at = checked_at
+        self.immutable = immutable
+
+
+class TemplateSourceCache:
+    """Content-addressed cache of template bodies fetched from remote sources.
+
+    Bodies are stored once per SHA-256 digest and every source (template id,
+    oss, http(s) or file url) points at the digest it last resolved to.
+    Concurrent lookups of one source share a single fetch. A source is served
+    from memory for ``FRESH_FOR`` seconds and then revalidated: OSS by ETag,
+    http(s) with If-None-Match/If-Modified-Since and files by mtime and size.
+    A template id with an explicit version never changes and is never
+    fetched twice. Template ids resolve to text and the other sources to
+    bytes, as fetched.
+    """
+
+    FRESH_FOR = 60.0
+    MAX_SIZE = 524288
+
+    def __init__(self):
+        self._bodies = {}
+        self._sources = {}
+
+    async def get(self, template_config, region: str, credential=None):
+        if template_config.template_body:
+            return template_config.template_body
+
+        source = self._source(template_config, region, credential)
+        if source is None:
+            return None
+        key, fetch, immutable = source
+
+        entry = self._sources.get(key)
+        if entry is not None and (entry.immutable or time.monotonic() - entry.checked_at < self.FRESH_FOR):
+            return self._body(key, entry.digest)
+
+        digest = await SINGLE_FLIGHT.do(
+            ('TemplateSource',) + key, functools.partial(self._refresh, key, fetch, immutable)
+        )
+        return self._body(key, digest)
+
+    def _body(self, key, digest: str):
+        # Bodies are kept as bytes for hashing; GetTemplate returns the body as text and callers expect it so.
+        body = self._bodies[digest]
+        return body.decode('utf-8') if key[0] == 'template' else body
+
+    def _source(self, template_config, region: str, credential):
+        identity = credential_identity(credential)
+        template_id = template_config.template_id
+        if template_id:
+            template_version = template_config.template_version
+            key = ('template', template_id, template_version, identity)
+            fetch = functools.partial(self._fetch_template, template_id, template_version, region, credential)
+            return key, fetch, bool(template_version)
+
+        template_url = template_config.template_url
+        if not template_url:
+            return None
+        components = urlparse(template_url)
+        if components.scheme == 'oss':
+            region_id = parse_qs(components.query).get('RegionId', [region])[0]
+            key = ('oss', template_url, region_id, identity)
+            fetch = functools.partial(self._fetch_oss, template_url, components, region_id, credential)
+        elif components.scheme == 'file':
+            key = ('file', template_url)
+            fetch = functools.partial(self._fetch_file, template_url, components)
+        else:
+            key = ('url', template_url)
+            fetch = functools.partial(self._fetch_url, template_url)
+        return key, fetch, False
+
+    async def _refresh(self, key, fetch, immutable: bool) -> str:
+        entry = self._sources.get(key)
+        body, validators = await fetch(entry.validators if entry else None)
+        now = time.monotonic()
+        if body is None:
+            LOG.debug(f'template source {key[:2]} not modified')
+            entry.checked_at = now
+            return entry.digest
+
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        digest = content_digest(body)
+        self._bodies.setdefault(digest, body)
+        self._sources[key] = _CachedSource(digest, validators, now, immutable)
+        if entry is not None and entry.digest != digest:
+            self._discard(entry.digest)
+        return digest
+
+    def _discard(self, digest: str):
+        if all(entry.digest != digest for entry in self._sources.values()):
+            self._bodies.pop(digest, None)
+
+    async def _fetch_template(self, template_id, template_version, region, credential, validators):
+        plugin = StackPlugin(region_id=region, credential=credential)
+        try:
+            template_info = await plugin.get_template(template_id=template_id, template_version=template_version)
+        except Exception as ex:
+            raise Iact3Exception(f'Failed to retrieve {template_id}: {ex}') from ex
+        return template_info['TemplateBody'], None
+
+    async def _fetch_oss(self, template_url, components, region_id, credential, validators):
+        bucket_name = components.netloc
+        object_path = components.path.strip('/')
+        if not bucket_name or not object_path:
+            raise Iact3Exception(f'Invalid oss url {template_url}')
+
+        oss_plugin = OssPlugin(region_id=region_id, bucket_name=bucket_name, credential=credential)
+        try:
+            object_meta = await oss_plugin.get_object_meta_async(object_path)
+        except Exception as ex:
+            raise Iact3Exception(f'Oss failed: {ex}') from ex
+        if object_meta is None:
+            raise Iact3Exception(f'Invalid oss url {template_url}')
+        if object_meta.content_length > self.MAX_SIZE:
+            raise Iact3Exception(f'template from {template_url} exceeds maximum allowed size ({self.MAX_SIZE} bytes)')
+        etag = object_meta.etag
+        if etag and validators == etag:
+            return None, etag
+
+        try:
+            return await oss_plugin.read_object_async(object_path), etag
+        except Exception as ex:
+            raise Iact3Exception(f'Oss failed: {ex}') from ex
+
+    async def _fetch_file(self, template_url, components, validators):
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(None, self._read_file, components, validators)
+        except Exception as ex:
+            raise Iact3Exception(f'Failed to retrieve {template_url}: {ex}') from ex
+
+    @staticmethod
+    def _read_file(components, validators):
+        path = url2pathname(components.netloc + components.path)
+        stat = os.stat(path)
+        file_validators = (stat.st_mtime_ns, stat.st_size)
+        if validators == file_validators:
+            return None, file_validators
+        with open(path, 'rb') as file_handle:
+            return file_handle.read(), file_validators
+
+    async def _fetch_url(self, template_url, validators):
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(None, self._get_url, template_url, validators)
+        except Exception as ex:
+            raise Iact3Exception(f'Failed to retrieve {template_url}: {ex}') from ex
+
+    def _get_url(self, template_url, validators):
+        headers = {}
+        etag, last_modified = validators or (None, None)
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        resp = requests.get(template_url, timeout=10, stream=True, headers=headers)
+        if resp.status_code == 304:
+            return None, validators
+        resp.raise_for_status()
+
+        result = b''
+        for chunk in resp.iter_content(chunk_size=1000):
+            result += chunk
+            if len(result) > self.MAX_SIZE:
+                raise Iact3Exception(
+                    f'template from {template_url} exceeds maximum allowed size ({self.MAX_SIZE} bytes)'
+                )
+        return result, (resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+
+    def clear(self):
+        self._bodies.clear()
+        self._sources.clear()
+
+
+TEMPLATE_CACHE = TemplateSourceCache()
+
+
+class ParsedTemplate:
+    """A parsed template plus the parameter metadata parameter generation reads.
+
+    Instances are shared between generators and must be treated as read-only.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        parameters = tree.get('Parameters') if isinstance(tree, dict) else None
+        parameters = parameters if isinstance(parameters, dict) else {}
+
+        self.defaults = {}
+        self.association_properties = {}
+        self.association_references = {}
+        for name, definition in parameters.items():
+            if not isinstance(definition, dict):
+                continue
+            default = definition.get('Default')
+            if default is not None:
+                self.defaults[name] = default if isinstance(default, str) else str(default)
+            if 'AssociationProperty' in definition:
+                self.association_properties[name] = definition['AssociationProperty']
+            references = self._references(definition.get('AssociationPropertyMetadata'), parameters)
+            if references:
+                self.association_references[name] = references
+
+        self.parameter_groups_order = self._parameter_groups_order(tree)
+        resources = tree.get('Resources') if isinstance(tree, dict) else None
+        self.resource_types = sorted(
+            {
+                resource['Type']
+                for resource in (resources.values() if isinstance(resources, dict) else ())
+                if isinstance(resource, dict) and isinstance(resource.get('Type'), str)
+            }
+        )
+
+    RE_REFERENCE = re.compile(r'\$\{([^}.]+)[^}]*}')
+
+    @classmethod
+    def _references(cls, metadata, parameters) -> list:
+        """Return the parameters referenced as ``${Name}`` anywhere in ``metadata``."""
+        references = []
+        pending = [metadata]
+        while pending:
+            value = pending.pop()
+            if isinstance(value, str):
+                references += [
+                    name for name in cls.RE_REFERENCE.findall(value) if name in parameters and name not in references
+                ]
+            elif isinstance(value, dict):
+                pending.extend(value.values())
+            elif isinstance(value, list):
+                pending.extend(value)
+        return references
+
+    @staticmethod
+    def _parameter_groups_order(tree):
+        metadata = tree.get('Metadata') if isinstance(tree, dict) else None
+        param_groups = (metadata or {}).get('ALIYUN::ROS::Interface', {}).get('ParameterGroups', [])
+        if not param_groups:
+            return None
+        order = []
+        for param_group in param_groups:
+            params = param_group.get('Parameters', []) if param_group else None
+            if not params:
+                continue
+            order += [p for p in params if isinstance(p, str)]
+        return order
+
+
+class ParsedTemplateStore:
+    """Process-wide store of parsed templates keyed by the SHA-256 of their body.
+
+    A template body is parsed at most once however many generators ask for
+    it. The JSON rendering produced by :meth:`to_json` is registered under
+    its own digest, so a template converted to JSON by the config layer is
+    not parsed again when the generators read the JSON body.
+    """
+
+    MAX_TEMPLATES = 64
+
+    def __init__(self):
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, body) -> ParsedTemplate:
+        digest = content_digest(body)
+        with self._lock:
+            parsed = self._templates.get(digest)
+            if parsed is not None:
+                self._templates.move_to_end(digest)
+                return parsed
+        parsed = ParsedTemplate(yaml.load(body, Loader=CustomSafeLoader))
+        self._put(digest, parsed)
+        return parsed
+
+    def to_json(self, body) -> str:
+        parsed = self.get(body)
+        json_body = json.dumps(parsed.tree)
+        self._put(content_digest(json_body), parsed)
+        return json_body
+
+    def _put(self, digest: str, parsed: ParsedTemplate):
+        with self._lock:
+            self._templates[digest] = parsed
+            self._templates.move_to_end(digest)
+            while len(self._templates) > self.MAX_TEMPLATES:
+                self._templates.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+
+PARSED_TEMPLATES = ParsedTemplateStore()
@@ -20,6 +20,7 @@ from iact3.config import (
     DEFAULT_OUTPUT_DIRECTORY,
 )
 from iact3.exceptions import Iact3Exception
+from iact3.plugin.oss import OssUploader
 from iact3.report.generate_reports import ReportBuilder
 from iact3.stack import Stacker
 from iact3.termial_print import TerminalPrinter
@@ -88,6 +89,7 @@ class Base(metaclass=abc.ABCMeta):
         output_directory: str = None,
         template_content: str = None,
         stack_observer=None,
+        plan=None,
     ) -> T:
         args = {}
         project_root = DEFAULT_PROJECT_ROOT  # default, may be overridden below
@@ -128,7 +130,7 @@ class Base(metaclass=abc.ABCMeta):
                 for test_cfg in base_config.tests.values():
                     test_cfg.regions = override_regions
 
-        configs = await base_config.get_all_configs(test_names)
+        configs = await base_config.get_all_configs(test_names, plan=plan)
 
         output_directory = output_directory or DEFAULT_OUTPUT_DIRECTORY
         report_path = project_root / output_directory
@@ -149,25 +151,40 @@ class Base(metaclass=abc.ABCMeta):
     async def report(self, log_format=None):
         report_path = self.report_path
         reporter = ReportBuilder(self.stacker, report_path)
-        file_names = await reporter.create_logs(log_format)
+        uploader = self._oss_uploader(report_path)
+        file_names = await reporter.create_logs(log_format, on_written=uploader.submit if uploader else None)
         index = await reporter.generate_report()
-        self._upload_to_oss(report_path, index, file_names)
+        await self._upload_to_oss(report_path, index, file_names, uploader)
 
-    def _upload_to_oss(self, report_path: Path, index: str, file_names: list):
+    def _oss_uploader(self, report_path: Path):
         oss_plugin = self.oss_config.plugin
         if oss_plugin is None:
-            return
+            return None
 
         LOG.info(
             f'starting upload reports to oss bucket {self.oss_config.bucket_name} '
             f'which is in {self.oss_config.bucket_region} region'
         )
+        # Only a configured prefix is reused across runs; the default one is unique to this run.
+        skip_if_unchanged = bool(self.oss_config.object_prefix)
+        return OssUploader(oss_plugin, self._oss_prefix(report_path), report_path, skip_if_unchanged=skip_if_unchanged)
+
+    def _oss_prefix(self, report_path: Path) -> str:
         oss_prefix = self.oss_config.object_prefix or f'{report_path.name}-{self.uid}'
-        oss_prefix = f'{IAC_NAME}/{oss_prefix}'
+        return f'{IAC_NAME}/{oss_prefix}'
+
+    async def _upload_to_oss(self, report_path: Path, index: str, file_names: list, uploader: OssUploader = None):
+        uploader = uploader or self._oss_uploader(report_path)
+        if uploader is None:
+            return
 
         for file_name in file_names:
-            oss_plugin.put_local_file(f'{oss_prefix}/{file_name}', report_path / file_name)
+            uploader.submit(file_name)
+        await uploader.wait()
 
+        # index.html goes last: its callback tells the receiver the report is complete.
+        oss_plugin = uploader.plugin
+        oss_prefix = uploader.prefix
         callback_config = self.oss_config.callback_params
         if callback_config.callback_url:
             callback_params = {
@@ -177,9 +194,11 @@ class Base(metaclass=abc.ABCMeta):
                 'callbackBodyType': callback_config.callback_body_type,
             }
             callback_var_params = callback_config.callback_var_params
-            oss_plugin.put_object_with_string(f'{oss_prefix}/index.html', index, callback_params, callback_var_params)
+            await oss_plugin.put_object_with_string_async(
+                f'{oss_prefix}/index.html', index, callback_params, callback_var_params
+            )
         else:
-            oss_plugin.put_object_with_string(f'{oss_prefix}/index.html', index)
+            await oss_plugin.put_object_with_string_async(f'{oss_prefix}/index.html', index)
 
     @abc.abstractmethod
     async def run(self):
@@ -5,6 +5,8 @@ import sys
 import uuid
 import yaml
 
+from iact3.instance_types import INSTANCE_TYPES
+
 LOG = logging.getLogger(__name__)
 
 
@@ -97,10 +99,23 @@ ROS_FUNCTION_NAMES = {
 }
 
 
-class CustomSafeLoader(yaml.SafeLoader):
+class PyCustomSafeLoader(yaml.SafeLoader):
     pass
 
 
+if getattr(yaml, '__with_libyaml__', False):
+
+    class CCustomSafeLoader(yaml.CSafeLoader):
+        pass
+
+else:
+    CCustomSafeLoader = None
+
+# Parsing with libyaml is several times faster on large templates; the pure
+# Python loader is only used when PyYAML was built without it.
+CustomSafeLoader = CCustomSafeLoader or PyCustomSafeLoader
+
+
 def make_constructor(fun_name):
     if fun_name == 'Ref':
         tag_name = fun_name
@@ -151,136 +166,32 @@ def make_constructor(fun_name):
     return constructor
 
 
-for f in ROS_FUNCTION_NAMES:
-    CustomSafeLoader.add_constructor(f'!{f}', make_constructor(f))
+for loader_class in filter(None, (PyCustomSafeLoader, CCustomSafeLoader)):
+    for f in ROS_FUNCTION_NAMES:
+        loader_class.add_constructor(f'!{f}', make_constructor(f))
 
 
-# Size priority for ECS instance types (smaller = cheaper)
-_INSTANCE_SIZE_ORDER = {
-    'micro': 0, 'small': 1, 'medium': 2, 'large': 3,
-    'xlarge': 4, '2xlarge': 5, '2.5xlarge': 6, '3xlarge': 7,
-    '4xlarge': 8, '6xlarge': 9, '8xlarge': 10, '10xlarge': 11,
-    '13xlarge': 12, '15xlarge': 13, '16xlarge': 14, '26xlarge': 15,
-    '32xlarge': 16, '52xlarge': 17,
-}
-
-# Max size priority for testing — avoid instances larger than 4 vCPU (xlarge)
-# unless nothing smaller is available.
-_TEST_MAX_SIZE_PRIORITY = 4  # xlarge
-
-# Entry-level families (cheapest, suitable for testing)
-_ENTRY_FAMILIES = (
-    't6', 't5', 's6', 's5', 'n4', 'mn4', 'xn4',
-    'e', 'e4', 'u1', 'u2',
-)
-
-# Secondary families — standard families that are acceptable for testing
-# when no entry-level family is available, but only at small sizes.
-_SECONDARY_FAMILIES = (
-    'g7', 'g6', 'g5', 'g8a', 'g8i',
-    'c7', 'c6', 'c5', 'c8a', 'c8i',
-    'r7', 'r6', 'r5', 'r8a', 'r8i',
-)
-
-# Family priority for tie-breaking (lower = cheaper family)
-_FAMILY_PRIORITY = {
-    # Entry-level (cheapest)
-    't6': 0, 't5': 1, 's6': 2, 's5': 3,
-    'n4': 4, 'mn4': 5, 'xn4': 6,
-    'u1': 7, 'u2': 8, 'e': 9, 'e4': 10,
-    # Economy / shared
-    'i5e': 11, 'i5': 12, 'i4': 13, 'i3': 14,
-    # General purpose (newer = slightly cheaper per-unit but larger absolute)
-    'g8a': 15, 'g8i': 16,
-    'g7': 17, 'g6': 18, 'g5': 19,
-    # Compute optimized
-    'c8a': 20, 'c8i': 21,
-    'c7': 22, 'c6': 23, 'c5': 24,
-    # Memory optimized
-    'r8a': 25, 'r8i': 26,
-    'r7': 27, 'r6': 28, 'r5': 29,
-}
-
-
-def rank_cheapest_instance_types(types):
+def rank_cheapest_instance_types(types, prices=None):
     """Return all instance types sorted from cheapest to most expensive.
 
     Uses the same 3-tier strategy as pick_cheapest_instance_type, but
     returns the full ranked list so callers can iterate through candidates.
+    See :class:`iact3.instance_types.InstanceTypeCatalog` for the ordering.
     """
-    if not types:
-        return []
+    return INSTANCE_TYPES.rank(types, prices)
 
-    def _size_key(type_id):
-        tl = type_id.lower()
-        for size, pri in sorted(_INSTANCE_SIZE_ORDER.items(), key=lambda x: -len(x[0])):
-            if size in tl:
-                return pri
-        return 99
 
-    def _family_key(type_id):
-        tl = type_id.lower()
-        if tl.startswith('ecs.'):
-            rest = tl[4:]
-            for sep in ('.', '-'):
-                idx = rest.find(sep)
-                if idx > 0:
-                    return _FAMILY_PRIORITY.get(rest[:idx], 50)
-        return 50
-
-    def _is_entry(type_id):
-        tl = type_id.lower()
-        for f in _ENTRY_FAMILIES:
-            if tl.startswith(f'ecs.{f}.') or tl.startswith(f'ecs.{f}-'):
-                return True
-        return False
-
-    def _is_secondary(type_id):
-        tl = type_id.lower()
-        for f in _SECONDARY_FAMILIES:
-            if tl.startswith(f'ecs.{f}.') or tl.startswith(f'ecs.{f}-'):
-                return True
-        return False
-
-    def sort_key(type_id):
-        return _size_key(type_id), _family_key(type_id)
-
-    ranked = []
-    seen = set()
-
-    # Tier 1: Entry-level families (cheapest overall)
-    entry = [t for t in types if _is_entry(t)]
-    entry_sorted = sorted(entry, key=sort_key)
-    for t in entry_sorted:
-        ranked.append(t)
-        seen.add(t)
-
-    # Tier 2: Standard families at small sizes (<= xlarge / 4 vCPU)
-    small_secondary = [
-        t for t in types
-        if _is_secondary(t) and _size_key(t) <= _TEST_MAX_SIZE_PRIORITY and t not in seen
-    ]
-    for t in sorted(small_secondary, key=sort_key):
-        ranked.append(t)
-        seen.add(t)
-
-    # Tier 3: All remaining types
-    remaining = [t for t in types if t not in seen]
-    for t in sorted(remaining, key=sort_key):
-        ranked.append(t)
-
-    return ranked
-
-
-def pick_cheapest_instance_type(types):
+def pick_cheapest_instance_type(types, prices=None):
     """Pick the cheapest instance type from a list.
 
     Uses a 3-tier strategy to minimize cost for testing:
     1. Entry-level families (t6, t5, s6, u1, etc.) — cheapest, any size.
     2. Standard families (g7, c7, etc.) at small sizes (<= xlarge / 4 vCPU).
     3. Any available type — smallest size, cheapest family.
+
+    ``prices`` optionally maps type ids to observed hourly prices.
     """
-    ranked = rank_cheapest_instance_types(types)
+    ranked = rank_cheapest_instance_types(types, prices)
     return ranked[0] if ranked else None
 
 
@@ -11,6 +11,7 @@ from pathlib import Path
 from aiohttp import web
 
 from iact3.config import DEFAULT_OUTPUT_DIRECTORY, DEFAULT_PROJECT_ROOT
+from iact3.plugin.base_plugin import CLIENT_REGISTRY
 from iact3.web.routes import setup_routes
 from iact3.web.runner import TestRunner
 
@@ -216,6 +217,7 @@ async def runner_lifecycle(app):
     if recovery_tasks:
         await asyncio.gather(*recovery_tasks, return_exceptions=True)
     await app['runner'].shutdown()
+    CLIENT_REGISTRY.close()
 
 
 def create_app(token=None):
@@ -15,6 +15,7 @@ from aiohttp import web
 from Tea.exceptions import TeaException
 
 from iact3.config import TemplateConfig, BaseConfig, DEFAULT_AUTH_FILE, DEFAULT_CONFIG_FILE, DEFAULT_OUTPUT_DIRECTORY, DEFAULT_PROJECT_ROOT, PROJECT, REGIONS, TEMPLATE_CONFIG, TEMPLATE_BODY, TEMPLATE_LOCATION
+from iact3.plugin.base_plugin import RATE_LIMITER
 from iact3.plugin.ros import StackPlugin
 from iact3.testing.ros_stack import StackTest
 from iact3.util import yaml as iact3_yaml, CustomSafeLoader, pick_cheapest_instance_type
@@ -1217,7 +1218,7 @@ def _resolve_stack_credential(stack, legacy_key_id=None, credentials=None):
     """Resolve the credential reference saved with a stack."""
     from iact3.cli_modules.list import List
     from iact3.config import Auth
-    from iact3.plugin.base_plugin import CredentialClient
+    from iact3.plugin.base_plugin import CREDENTIAL_CACHE
 
     credentials = credentials if credentials is not None else {}
     credential_ref = stack.get('credential_ref') or {}
@@ -1235,7 +1236,7 @@ def _resolve_stack_credential(stack, legacy_key_id=None, credentials=None):
         else:
             credential = List.get_credential()
             if credential is None:
-                credential = CredentialClient()
+                credential = CREDENTIAL_CACHE.default()
         if credential is None:
             raise ValueError('The credential used to create this stack is no longer available')
         credentials[credential_key] = credential
@@ -2421,15 +2422,17 @@ def setup_routes(app: web.Application):
             log_handler = _logging.StreamHandler(log_buf)
             log_handler.setLevel(_logging.DEBUG)
             log_handler.setFormatter(_logging.Formatter('%(levelname)s: %(message)s'))
-            gen_logger = _logging.getLogger('iact3.generate_params')
-            old_level = gen_logger.level
-            gen_logger.setLevel(_logging.DEBUG)
-            gen_logger.addHandler(log_handler)
+            gen_loggers = [_logging.getLogger(name) for name in ('iact3.generate_params', 'iact3.discovery')]
+            old_levels = [gen_logger.level for gen_logger in gen_loggers]
+            for gen_logger in gen_loggers:
+                gen_logger.setLevel(_logging.DEBUG)
+                gen_logger.addHandler(log_handler)
             try:
                 result = await ParamGenerator.result(test_config)
             finally:
-                gen_logger.removeHandler(log_handler)
-                gen_logger.setLevel(old_level)
+                for gen_logger, old_level in zip(gen_loggers, old_levels):
+                    gen_logger.removeHandler(log_handler)
+                    gen_logger.setLevel(old_level)
             captured_logs = log_buf.getvalue()
             
             # If there were errors, include them as warnings rather than failing.
@@ -2839,6 +2842,10 @@ def setup_routes(app: web.Application):
             if cli_creds.get('access_key_id') and len(cli_creds.get('access_key_id', '')) > 4 else '',
         })
 
+    async def get_rate_limits(request):
+        """GET /api/rate-limits - Current adaptive API rates and queue depth."""
+        return web.json_response({'rate_limits': RATE_LIMITER.stats()})
+
     # --- API: Update template location in .iact3.yml ---
 
     async def update_config_template(request):
@@ -3827,6 +3834,7 @@ def setup_routes(app: web.Application):
     app.router.add_get('/api/samples/{sample_id}', get_sample)
 
     app.router.add_get('/api/credentials', get_credentials)
+    app.router.add_get('/api/rate-limits', get_rate_limits)
 
     app.router.add_get('/api/history', list_history)
     app.router.add_post('/api/history/cleanup', cleanup_history)
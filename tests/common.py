@@ -2,11 +2,16 @@ import json
 import os
 import sys
 from pathlib import Path
+from types import SimpleNamespace
 from unittest import mock
 
+import oss2
 from alibabacloud_ros20190910 import models as ros_models
+from iact3.discovery_cache import DISCOVERY_CACHE
+from iact3.generate_params import CONSTRAINTS_CACHE
 from iact3.logger import init_cli_logger
 from iact3.plugin.base_plugin import TeaSDKPlugin
+from iact3.template_cache import TEMPLATE_CACHE
 
 if sys.version_info >= (3, 8):
     from unittest import IsolatedAsyncioTestCase as AsyncTestCase
@@ -27,6 +32,14 @@ else:
                 await async_teardown()
 
 
+try:
+    AsyncMock = mock.AsyncMock
+except AttributeError:
+    import asynctest
+
+    AsyncMock = asynctest.CoroutineMock
+
+
 def _mock_price_resources():
     def price(resource_type):
         return {
@@ -118,6 +131,19 @@ def _mock_preview_resources():
     return resources
 
 
+MOCK_RESOURCE_TYPES = (
+    'ALIYUN::ECS::Instance',
+    'ALIYUN::ECS::InstanceGroup',
+    'ALIYUN::ECS::SecurityGroup',
+    'ALIYUN::ECS::VPC',
+    'ALIYUN::ECS::VSwitch',
+    'ALIYUN::ROS::Sleep',
+    'ALIYUN::ROS::WaitCondition',
+    'ALIYUN::VPC::EIP',
+    'ALIYUN::VPC::EIPAssociation',
+)
+
+
 def _mock_template_body():
     return (Path(__file__).parent / 'data' / 'ecs_instance.template.json').read_text()
 
@@ -212,6 +238,8 @@ async def _mock_send_request(plugin, request_name: str, ignore_exception: bool =
         return {'ParameterConstraints': [{'AllowedValues': values_by_key.get(key, ['mock-value'])}]}
     if request_name == 'GetTemplate':
         return {'TemplateBody': _mock_template_body()}
+    if request_name == 'ListResourceTypes':
+        return {'ResourceTypes': list(MOCK_RESOURCE_TYPES)}
     if request_name == 'GetTemplateEstimateCost':
         if _has_invalid_disk(kwargs):
             from Tea.exceptions import TeaException
@@ -240,7 +268,8 @@ async def _mock_send_request(plugin, request_name: str, ignore_exception: bool =
                         'VSwitchIds': {'VSwitchId': ['vsw-mock']},
                     }
                 ]
-            }
+            },
+            'TotalCount': 1,
         }
     if request_name == 'DescribeVSwitches':
         return {
@@ -253,7 +282,8 @@ async def _mock_send_request(plugin, request_name: str, ignore_exception: bool =
                         'AvailableIpAddressCount': 8,
                     }
                 ]
-            }
+            },
+            'TotalCount': 1,
         }
     if request_name == 'DescribeSecurityGroups':
         return {
@@ -261,6 +291,7 @@ async def _mock_send_request(plugin, request_name: str, ignore_exception: bool =
                 'SecurityGroup': [
                     {
                         'SecurityGroupId': 'sg-mock',
+                        'VpcId': kwargs.get('VpcId') or 'vpc-mock',
                         'ServiceManaged': False,
                     }
                 ]
@@ -272,6 +303,7 @@ async def _mock_send_request(plugin, request_name: str, ignore_exception: bool =
 
 class _FakeOssObject:
     content_length = 128
+    etag = 'mock-etag'
 
     def read(self):
         return _mock_template_body().encode()
@@ -280,12 +312,19 @@ class _FakeOssObject:
 class _FakeBucket:
     def __init__(self, *args, **kwargs):
         self.objects = {}
+        self.headers = {}
 
     def put_object(self, object_name, content, params=None):
         self.objects[object_name] = content
 
-    def put_object_from_file(self, object_name, local_file):
+    def put_object_from_file(self, object_name, local_file, headers=None):
         self.objects[object_name] = local_file
+        self.headers[object_name] = dict(headers or {})
+
+    def head_object(self, object_name, headers=None, params=None):
+        if object_name not in self.objects:
+            raise oss2.exceptions.NotFound(404, {}, b'', {})
+        return SimpleNamespace(headers=self.headers.get(object_name, {}))
 
     def object_exists(self, object_name):
         return True
@@ -301,8 +340,11 @@ class _FakeBucket:
 
 
 class _FakeHttpResponse:
-    def __init__(self, body):
+    status_code = 200
+
+    def __init__(self, body, headers=None):
         self.body = body.encode() if isinstance(body, str) else body
+        self.headers = headers or {}
 
     def raise_for_status(self):
         return None
@@ -329,6 +371,7 @@ class BaseTest(AsyncTestCase):
             mock.patch('alibabacloud_credentials.utils.auth_util.environment_access_key_id', 'test_ak'),
             mock.patch('alibabacloud_credentials.utils.auth_util.environment_access_key_secret', 'test_sk'),
             mock.patch.object(TeaSDKPlugin, 'send_request', new=_mock_send_request),
+            mock.patch.object(DISCOVERY_CACHE, 'enabled', False),
             mock.patch('oss2.Bucket', new=_FakeBucket),
             mock.patch('requests.get', return_value=_FakeHttpResponse(_mock_template_body())),
             mock.patch(
@@ -339,6 +382,8 @@ class BaseTest(AsyncTestCase):
         for patcher in self._patchers:
             patcher.start()
             self.addCleanup(patcher.stop)
+        self.addCleanup(TEMPLATE_CACHE.clear)
+        self.addCleanup(CONSTRAINTS_CACHE.clear)
 
     @staticmethod
     async def _mock_sdk_list_stacks(*args, **kwargs):
@@ -1,15 +1,40 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import importlib
 import os
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
 
 from Tea.core import TeaCore
+from Tea.exceptions import RetryError, TeaException, UnretryableException
+from Tea.response import TeaResponse
 from alibabacloud_credentials.client import Client
 from alibabacloud_tea_openapi.models import Config
 from alibabacloud_ros20190910.client import Client as ROSClient
 from alibabacloud_ros20190910 import models as ros_models
 from alibabacloud_tea_util.models import RuntimeOptions
 
-from iact3.plugin.base_plugin import CredentialClient
-from tests.common import BaseTest
+from iact3.plugin.base_plugin import (
+    CREDENTIAL_CACHE,
+    RATE_LIMITER,
+    ClientRegistry,
+    CredentialCache,
+    CredentialClient,
+    RefreshAheadCredential,
+    RetryPolicy,
+    SINGLE_FLIGHT,
+    TeaSDKPlugin,
+    TokenBucket,
+)
+from iact3.plugin.ecs import EcsPlugin
+from iact3.plugin.oss import OssPlugin
+from iact3.plugin.ros import StackPlugin
+from iact3.plugin.vpc import VpcPlugin
+from tests.common import AsyncMock, BaseTest
+
+_send_request = TeaSDKPlugin.send_request
 
 
 class TestBasePlugin(BaseTest):
@@ -35,3 +60,600 @@ class TestBasePlugin(BaseTest):
         response = await client.list_stacks_with_options_async(request, runtime_option)
         response = TeaCore.to_map(response)
         print(response)
+
+
+class TestClientRegistry(BaseTest):
+    def test_plugins_with_the_same_identity_share_a_client(self):
+        registry = ClientRegistry()
+        first = StackPlugin(region_id='cn-hangzhou')
+        second = StackPlugin(region_id='cn-hangzhou')
+        other_region = StackPlugin(region_id='cn-beijing')
+
+        self.assertIs(registry.get(first), registry.get(second))
+        self.assertIsNot(registry.get(first), registry.get(other_region))
+        self.assertEqual(2, len(registry))
+
+    def test_least_recently_used_client_is_evicted(self):
+        registry = ClientRegistry(max_size=2)
+        hangzhou = registry.get(StackPlugin(region_id='cn-hangzhou'))
+        registry.get(StackPlugin(region_id='cn-beijing'))
+        registry.get(StackPlugin(region_id='cn-hangzhou'))
+        registry.get(StackPlugin(region_id='cn-shanghai'))
+
+        self.assertEqual(2, len(registry))
+        self.assertIs(hangzhou, registry.get(StackPlugin(region_id='cn-hangzhou')))
+        self.assertEqual(2, len(registry))
+
+    def test_close_drops_every_client(self):
+        registry = ClientRegistry()
+        registry.get(StackPlugin(region_id='cn-hangzhou'))
+
+        registry.close()
+
+        self.assertEqual(0, len(registry))
+
+
+class TestRateLimiter(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        RATE_LIMITER.reset()
+        self.addCleanup(RATE_LIMITER.reset)
+
+    def test_throttling_halves_the_rate_once_per_cooldown(self):
+        bucket = TokenBucket(rate=8)
+
+        bucket.on_throttle()
+        bucket.on_throttle()
+
+        self.assertEqual(4, bucket.rate)
+        self.assertEqual(2, bucket.throttled)
+        self.assertLessEqual(bucket.tokens, 0)
+
+    def test_success_ramps_the_rate_back_up_to_the_ceiling(self):
+        bucket = TokenBucket(rate=1, max_rate=2)
+
+        for _ in range(5):
+            bucket.on_success()
+
+        self.assertEqual(2, bucket.rate)
+
+    async def test_acquire_waits_for_a_token_and_reports_queue_depth(self):
+        bucket = TokenBucket(rate=20)
+        bucket.tokens = 0
+        depths = []
+
+        async def probe():
+            await asyncio.sleep(0)
+            depths.append(bucket.waiting)
+
+        await asyncio.gather(bucket.acquire(), bucket.acquire(), probe())
+
+        self.assertEqual([2], depths)
+        self.assertEqual(0, bucket.waiting)
+
+    async def test_send_request_feeds_throttling_errors_into_the_limiter(self):
+        plugin = StackPlugin(region_id='cn-hangzhou')
+        plugin.RAW_BODY_ENABLED = True
+        plugin.retry_policy = RetryPolicy(base_delay=0.001, max_delay=0.001)
+        responses = [TeaException({'code': 'Throttling.User', 'message': 'throttled', 'data': {}}), None]
+
+        async def call_api_async(params, request, runtime):
+            response = responses.pop(0)
+            if response is not None:
+                raise response
+            return {'body': {'Stacks': []}, 'headers': {}, 'statusCode': 200}
+
+        plugin._client = SimpleNamespace(call_api_async=call_api_async)
+
+        await _send_request(plugin, 'ListStacksRequest')
+
+        stats = RATE_LIMITER.stats()
+        self.assertEqual(1, len(stats))
+        stat = stats[0]
+        self.assertEqual(('ROS', 'cn-hangzhou', 'ListStacks'), (stat['product'], stat['region'], stat['action']))
+        self.assertEqual(1, stat['throttled'])
+        expected_rate = TokenBucket.INITIAL_RATE * TokenBucket.DECREASE_FACTOR + TokenBucket.INCREASE_STEP
+        self.assertEqual(expected_rate, stat['rate'])
+
+
+class TestRetryPolicy(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        self.policy = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.001)
+
+    @staticmethod
+    def _error(code):
+        return TeaException({'code': code, 'message': code, 'data': {}})
+
+    def test_errors_are_classified_by_code(self):
+        self.assertEqual(RetryPolicy.THROTTLING, self.policy.classify(self._error('Throttling.API')))
+        self.assertEqual(RetryPolicy.TRANSIENT, self.policy.classify(self._error('ServiceUnavailable')))
+        self.assertEqual(RetryPolicy.AMBIGUOUS, self.policy.classify(self._error('InternalError')))
+        self.assertEqual(RetryPolicy.TRANSIENT, self.policy.classify(UnretryableException(None, RetryError('reset'))))
+        self.assertIsNone(self.policy.classify(self._error('StackNotFound')))
+        self.assertFalse(self.policy.is_retryable(self._error('InternalError'), idempotent=False))
+
+    def test_backoff_is_jittered_and_capped(self):
+        policy = RetryPolicy(base_delay=1, max_delay=4)
+        delays = [policy.backoff(3) for _ in range(50)]
+        self.assertTrue(all(1 <= delay <= 4 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    async def test_call_async_stops_after_max_attempts(self):
+        func = AsyncMock(side_effect=self._error('Throttling'))
+
+        with self.assertRaises(TeaException):
+            await self.policy.call_async(func)
+
+        self.assertEqual(3, func.await_count)
+
+    async def test_call_async_does_not_retry_ambiguous_errors_for_writes(self):
+        func = AsyncMock(side_effect=self._error('InternalError'))
+
+        with self.assertRaises(TeaException):
+            await self.policy.call_async(func, idempotent=False)
+
+        self.assertEqual(1, func.await_count)
+
+    async def test_call_async_gives_up_at_the_deadline(self):
+        policy = RetryPolicy(max_attempts=10, base_delay=1, max_delay=1, deadline=0.5)
+        func = AsyncMock(side_effect=self._error('ServiceUnavailable'))
+
+        with self.assertRaises(TeaException):
+            await policy.call_async(func)
+
+        self.assertEqual(1, func.await_count)
+
+    async def test_call_async_retries_on_result(self):
+        func = AsyncMock(side_effect=['pending', 'pending', 'done'])
+
+        result = await self.policy.call_async(func, retry_if_result=lambda value: value == 'pending')
+
+        self.assertEqual('done', result)
+
+    def test_wrap_retries_sync_functions(self):
+        calls = []
+
+        @self.policy.wrap()
+        def put_object():
+            calls.append(1)
+            if len(calls) < 2:
+                raise ConnectionError('reset')
+            return 'ok'
+
+        self.assertEqual('ok', put_object())
+        self.assertEqual(2, len(calls))
+
+
+class TestSingleFlight(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        SINGLE_FLIGHT.clear()
+        self.addCleanup(SINGLE_FLIGHT.clear)
+        self.calls = []
+
+    def _plugin(self, error=None):
+        plugin = StackPlugin(region_id='cn-hangzhou')
+        plugin.RAW_BODY_ENABLED = True
+        plugin.retry_policy = RetryPolicy(max_attempts=1)
+
+        async def call_api_async(params, request, runtime):
+            stack_id = request.query['StackId']
+            self.calls.append(stack_id)
+            await asyncio.sleep(0.01)
+            if error:
+                raise error
+            return {'body': {'StackId': stack_id, 'Status': 'CREATE_COMPLETE'}, 'headers': {}, 'statusCode': 200}
+
+        async def delete_stack(request, runtime):
+            self.calls.append(request.stack_id)
+            await asyncio.sleep(0.01)
+            return ros_models.DeleteStackResponse(body=ros_models.DeleteStackResponseBody())
+
+        plugin._client = SimpleNamespace(call_api_async=call_api_async, delete_stack_with_options_async=delete_stack)
+        return plugin
+
+    async def test_identical_concurrent_reads_share_one_call(self):
+        plugin = self._plugin()
+
+        results = await asyncio.gather(
+            _send_request(plugin, 'GetStackRequest', StackId='stack-1'),
+            _send_request(plugin, 'GetStackRequest', StackId='stack-1'),
+            _send_request(plugin, 'GetStackRequest', StackId='stack-2'),
+        )
+
+        self.assertEqual(['stack-1', 'stack-2'], self.calls)
+        self.assertEqual(results[0], results[1])
+        self.assertIsNot(results[0], results[1])
+        self.assertEqual(0, SINGLE_FLIGHT.inflight())
+
+    async def test_writes_are_never_merged(self):
+        plugin = self._plugin()
+
+        await asyncio.gather(
+            _send_request(plugin, 'DeleteStackRequest', StackId='stack-1'),
+            _send_request(plugin, 'DeleteStackRequest', StackId='stack-1'),
+        )
+
+        self.assertEqual(['stack-1', 'stack-1'], self.calls)
+
+    async def test_errors_reach_every_waiter(self):
+        plugin = self._plugin(error=TeaException({'code': 'StackNotFound', 'message': 'gone', 'data': {'Code': 'x'}}))
+
+        results = await asyncio.gather(
+            _send_request(plugin, 'GetStackRequest', StackId='stack-1'),
+            _send_request(plugin, 'GetStackRequest', ignore_exception=True, StackId='stack-1'),
+            return_exceptions=True,
+        )
+
+        self.assertEqual(1, len(self.calls))
+        self.assertIsInstance(results[0], TeaException)
+        self.assertEqual({'Code': 'x'}, results[1])
+
+    async def test_results_are_reused_within_the_ttl(self):
+        plugin = self._plugin()
+        plugin.SINGLE_FLIGHT_ACTIONS = {'GetStack': 60}
+
+        await _send_request(plugin, 'GetStackRequest', StackId='stack-1')
+        await _send_request(plugin, 'GetStackRequest', StackId='stack-1')
+
+        self.assertEqual(['stack-1'], self.calls)
+
+    async def test_least_recently_used_results_are_evicted(self):
+        plugin = self._plugin()
+        plugin.SINGLE_FLIGHT_ACTIONS = {'GetStack': 3600}
+
+        with mock.patch.object(SINGLE_FLIGHT, 'MAX_RESULTS', 2):
+            for stack_id in ('stack-1', 'stack-2', 'stack-1', 'stack-3', 'stack-1', 'stack-2'):
+                await _send_request(plugin, 'GetStackRequest', StackId=stack_id)
+
+        self.assertEqual(['stack-1', 'stack-2', 'stack-3', 'stack-2'], self.calls)
+        self.assertEqual(2, len(SINGLE_FLIGHT._results))
+
+
+class TestIterAll(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        self.plugin = StackPlugin(region_id='cn-hangzhou')
+        self.requested = []
+        self.in_flight = 0
+        self.peak = 0
+
+        async def send_request(request_name, **kwargs):
+            page = kwargs['PageNumber']
+            self.requested.append(page)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            # later pages answer first so ordering is actually exercised
+            try:
+                await asyncio.sleep(0.001 * (10 - page))
+            finally:
+                self.in_flight -= 1
+            return {'TotalCount': 20, 'Events': [f'event-{page}-{index}' for index in range(2)]}
+
+        self.plugin.send_request = send_request
+
+    async def test_items_are_yielded_in_page_order_with_bounded_concurrency(self):
+        events = [
+            event async for event in self.plugin.iter_all('ListStackEvents', {'PageSize': 2}, 'Events', concurrency=3)
+        ]
+
+        self.assertEqual([f'event-{page}-{index}' for page in range(1, 11) for index in range(2)], events)
+        self.assertLessEqual(self.peak, 3)
+
+    async def test_unordered_iteration_yields_every_item(self):
+        events = [
+            event
+            async for event in self.plugin.iter_all('ListStackEvents', {'PageSize': 2}, 'Events', ordered=False)
+        ]
+
+        self.assertEqual(20, len(events))
+        self.assertEqual(20, len(set(events)))
+
+    async def test_stopping_early_cancels_outstanding_pages(self):
+        events = self.plugin.iter_all('ListStackEvents', {'PageSize': 2}, 'Events', concurrency=2)
+        async for event in events:
+            if event == 'event-2-0':
+                break
+        await events.aclose()
+        await asyncio.sleep(0.02)
+
+        # page 4 was scheduled once page 2 arrived but is cancelled before it is sent
+        self.assertEqual([1, 2, 3], self.requested)
+        self.assertEqual(0, self.in_flight)
+
+
+class TestResolveAction(BaseTest):
+    def test_resolution_is_cached_per_plugin_class(self):
+        plugin = StackPlugin(region_id='cn-hangzhou')
+
+        with mock.patch('iact3.plugin.base_plugin.importlib.import_module', wraps=importlib.import_module) as imported:
+            first = plugin._resolve_action('GetStackRequest')
+            second = StackPlugin(region_id='cn-beijing')._resolve_action('GetStackRequest')
+
+        self.assertIs(first, second)
+        self.assertEqual(('GetStack', 'get_stack_with_options_async', ros_models.GetStackRequest), first)
+        self.assertLessEqual(imported.call_count, 1)
+        self.assertIn('_resolved_actions', StackPlugin.__dict__)
+        self.assertNotIn('_resolved_actions', TeaSDKPlugin.__dict__)
+
+    def test_build_request_uses_the_resolved_class(self):
+        request = StackPlugin(region_id='cn-hangzhou')._build_request('GetStack', StackId='stack-1')
+
+        self.assertIsInstance(request, ros_models.GetStackRequest)
+        self.assertEqual('cn-hangzhou', request.region_id)
+        self.assertEqual('stack-1', request.stack_id)
+
+
+class TestRawBody(BaseTest):
+    """Both response paths are fed response bodies shaped like the API reference examples in tests/data/responses."""
+
+    CASES = (
+        (StackPlugin, 'GetStack', {'StackId': 'stack-id'}, 200, 'ros_get_stack.json'),
+        (StackPlugin, 'ListStackEvents', {'StackId': 'stack-id'}, 200, 'ros_list_stack_events.json'),
+        (StackPlugin, 'GetStack', {'StackId': 'stack-id'}, 404, 'ros_get_stack_not_found.json'),
+        (EcsPlugin, 'DescribeZones', {}, 200, 'ecs_describe_zones.json'),
+        (EcsPlugin, 'DescribeAvailableResource', {'DestinationResource': 'InstanceType'}, 200,
+         'ecs_describe_available_resource.json'),
+        (EcsPlugin, 'DescribeAvailableResource', {'DestinationResource': 'Invalid'}, 400, 'ecs_invalid_parameter.json'),
+        (VpcPlugin, 'DescribeVpcs', {'PageSize': 50}, 200, 'vpc_describe_vpcs.json'),
+        (VpcPlugin, 'DescribeVpcs', {}, 403, 'vpc_forbidden.json'),
+    )
+
+    def respond(self, status_code, file_name, requests=None):
+        body = (self.DATA_PATH / 'responses' / file_name).read_bytes()
+
+        async def async_do_action(request, runtime_option=None):
+            if requests is not None:
+                requests.append(request)
+            response = TeaResponse()
+            response.status_code = status_code
+            response.headers = {}
+            response.body = body
+            return response
+
+        return mock.patch.object(TeaCore, 'async_do_action', new=async_do_action)
+
+    @staticmethod
+    def _plugin(plugin_class, raw_body):
+        plugin = plugin_class(region_id='cn-hangzhou')
+        plugin.RAW_BODY_ENABLED = raw_body
+        return plugin
+
+    async def _send(self, plugin_class, action, kwargs, raw_body):
+        try:
+            return await _send_request(self._plugin(plugin_class, raw_body), action, **kwargs)
+        except TeaException as ex:
+            return ex
+
+    def assertContains(self, raw, model, path='body'):
+        """Everything the response model kept is in the raw body; the raw body may have fields the model lacks."""
+        if isinstance(model, dict):
+            self.assertIsInstance(raw, dict, path)
+            for key, value in model.items():
+                self.assertIn(key, raw, path)
+                self.assertContains(raw[key], value, f'{path}.{key}')
+        elif isinstance(model, list):
+            self.assertEqual(len(model), len(raw), path)
+            for index, (raw_item, model_item) in enumerate(zip(raw, model)):
+                self.assertContains(raw_item, model_item, f'{path}[{index}]')
+        else:
+            self.assertEqual(model, raw, path)
+
+    async def test_raw_body_is_off_by_default(self):
+        plugin = StackPlugin(region_id='cn-hangzhou')
+        plugin._client = SimpleNamespace(
+            call_api_async=AsyncMock(),
+            get_stack_with_options_async=AsyncMock(
+                return_value=ros_models.GetStackResponse(body=ros_models.GetStackResponseBody())
+            ),
+        )
+
+        await _send_request(plugin, 'GetStack', StackId='stack-id')
+
+        self.assertFalse(TeaSDKPlugin.RAW_BODY_ENABLED)
+        plugin._client.call_api_async.assert_not_awaited()
+        plugin._client.get_stack_with_options_async.assert_awaited_once()
+
+    async def test_raw_body_matches_the_model_path_on_recorded_responses(self):
+        for plugin_class, action, kwargs, status_code, file_name in self.CASES:
+            with self.subTest(file_name):
+                with self.respond(status_code, file_name):
+                    raw = await self._send(plugin_class, action, kwargs, raw_body=True)
+                    model = await self._send(plugin_class, action, kwargs, raw_body=False)
+                if status_code == 200:
+                    self.assertContains(raw, model)
+                else:
+                    self.assertIsInstance(raw, TeaException)
+                    self.assertIsInstance(model, TeaException)
+                    self.assertEqual((model.code, model.message, model.data), (raw.code, raw.message, raw.data))
+
+    async def test_raw_body_keeps_fields_the_model_does_not_know(self):
+        with self.respond(200, 'vpc_describe_vpcs.json'):
+            raw = await self._send(VpcPlugin, 'DescribeVpcs', {}, raw_body=True)
+            model = await self._send(VpcPlugin, 'DescribeVpcs', {}, raw_body=False)
+
+        self.assertEqual('DISABLED', raw['Vpcs']['Vpc'][0]['DnsHostnameStatus'])
+        self.assertEqual(['vsw-bp1nhbnpv2blyz8dl****'], model['Vpcs']['Vpc'][0]['VSwitchIds']['VSwitchId'])
+
+    async def test_raw_body_encodes_the_request_like_the_sdk(self):
+        kwargs = {'StackId': 'stack-id', 'Status': ['CREATE_COMPLETE', 'CREATE_FAILED'], 'PageNumber': 1}
+        requests = []
+        with self.respond(200, 'ros_list_stack_events.json', requests):
+            for raw_body in (True, False):
+                await _send_request(self._plugin(StackPlugin, raw_body), 'ListStackEvents', **kwargs)
+
+        raw, model = requests
+        self.assertEqual((model.method, model.pathname, model.query), (raw.method, raw.pathname, raw.query))
+        self.assertEqual('CREATE_FAILED', raw.query['Status.2'])
+        for header in ('x-acs-action', 'x-acs-version', 'host'):
+            self.assertEqual(model.headers[header], raw.headers[header])
+
+    async def test_request_and_response_are_not_formatted_without_debug(self):
+        with self.respond(200, 'ros_get_stack.json'), mock.patch(
+            'iact3.plugin.base_plugin.LOG.isEnabledFor', return_value=False
+        ), mock.patch('iact3.plugin.base_plugin.LOG.debug') as debug:
+            await _send_request(self._plugin(StackPlugin, True), 'GetStack', StackId='stack-id')
+
+        debug.assert_not_called()
+
+
+class _FakeRoleCredential:
+    credential_type = 'ram_role_arn'
+
+    def __init__(self, expiration=0):
+        self.access_key_id = 'old-ak'
+        self.access_key_secret = 'old-sk'
+        self.security_token = 'old-token'
+        self.expiration = expiration
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def _get_new_credential(self):
+        self.calls += 1
+        self.release.wait(5)
+        return SimpleNamespace(
+            access_key_id=f'ak-{self.calls}',
+            access_key_secret='sk',
+            security_token=f'token-{self.calls}',
+            expiration=int(time.time()) + 3600,
+        )
+
+
+class TestCredentialCache(BaseTest):
+    def test_plugins_without_credential_share_the_default_client(self):
+        CREDENTIAL_CACHE.clear()
+        self.addCleanup(CREDENTIAL_CACHE.clear)
+
+        first = StackPlugin(region_id='cn-hangzhou')
+        second = StackPlugin(region_id='cn-beijing')
+
+        self.assertIs(first.credential, second.credential)
+
+    def test_missing_profiles_are_not_cached(self):
+        cache = CredentialCache()
+        factory = mock.Mock(side_effect=[None, 'credential'])
+
+        self.assertIsNone(cache.get(('auth', None, 'missing'), factory))
+        self.assertEqual('credential', cache.get(('auth', None, 'missing'), factory))
+        self.assertEqual('credential', cache.get(('auth', None, 'missing'), factory))
+        self.assertEqual(2, factory.call_count)
+
+    def test_concurrent_misses_build_one_client(self):
+        cache = CredentialCache()
+        started = threading.Event()
+        release = threading.Event()
+
+        built = []
+
+        def factory():
+            started.set()
+            release.wait(5)
+            built.append(object())
+            return built[-1]
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(('auth', None, 'slow'), factory)))]
+        threads[0].start()
+        started.wait(5)
+        threads.append(threading.Thread(target=lambda: results.append(cache.get(('auth', None, 'slow'), factory))))
+        threads[1].start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(1, len(built))
+        self.assertEqual(built * 2, results)
+
+    def test_auth_profiles_are_loaded_once_per_name_and_location(self):
+        from iact3.config import Auth
+
+        with mock.patch.object(Auth, '_load_credential', return_value=CredentialClient()) as load:
+            first = Auth(name='bench', location='/tmp/iact3-missing-auth.json').credential
+            second = Auth(name='bench', location='/tmp/iact3-missing-auth.json').credential
+        CREDENTIAL_CACHE.clear()
+
+        self.assertIs(first, second)
+        self.assertEqual(1, load.call_count)
+
+
+class TestRefreshAheadCredential(BaseTest):
+    async def test_expired_credential_is_refreshed_once_without_blocking_the_loop(self):
+        inner = _FakeRoleCredential()
+        inner.release.clear()
+        credential = RefreshAheadCredential(inner)
+        ticks = []
+
+        async def ticker():
+            for _ in range(3):
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+            inner.release.set()
+
+        results = await asyncio.gather(
+            credential.get_access_key_id_async(), credential.get_security_token_async(), ticker()
+        )
+
+        self.assertEqual(['ak-1', 'token-1'], results[:2])
+        self.assertEqual(3, len(ticks))
+        self.assertEqual(1, inner.calls)
+
+    async def test_credential_in_refresh_window_is_served_while_refreshing(self):
+        inner = _FakeRoleCredential(expiration=int(time.time()) + RefreshAheadCredential.REFRESH_AHEAD - 60)
+        inner.release.clear()
+        credential = RefreshAheadCredential(inner)
+
+        self.assertEqual('old-ak', await credential.get_access_key_id_async())
+        in_flight = credential.refresh()
+        inner.release.set()
+        in_flight.result(5)
+        self.assertEqual('ak-1', await credential.get_access_key_id_async())
+        self.assertEqual(1, inner.calls)
+
+    def test_refresh_between_getters_keeps_the_pair_consistent(self):
+        inner = _FakeRoleCredential(expiration=int(time.time()) + 3600)
+        credential = RefreshAheadCredential(inner)
+
+        self.assertEqual('old-ak', credential.get_access_key_id())
+        credential.refresh().result(5)
+        self.assertEqual('old-sk', credential.get_access_key_secret())
+        self.assertEqual('old-token', credential.get_security_token())
+
+        self.assertEqual('ak-1', credential.get_access_key_id())
+        self.assertEqual(('sk', 'token-1'), (credential.get_access_key_secret(), credential.get_security_token()))
+
+    def test_snapshot_does_not_wait_for_a_refresh_of_a_valid_token(self):
+        inner = _FakeRoleCredential(expiration=int(time.time()) + RefreshAheadCredential.EXPIRY_MARGIN - 60)
+        inner.release.clear()
+        credential = RefreshAheadCredential(inner)
+
+        snapshot = credential.snapshot()
+        self.assertEqual(('old-ak', 'old-sk', 'old-token'), snapshot[:3])
+        with mock.patch('oss2.StsAuth') as sts_auth:
+            OssPlugin._get_auth(SimpleNamespace(cloud_credential=credential))
+        sts_auth.assert_called_once_with('old-ak', 'old-sk', 'old-token')
+        inner.release.set()
+        credential.refresh().result(5)
+        self.assertEqual('ak-1', credential.snapshot().access_key_id)
+
+    async def test_synchronous_getters_do_not_block_the_loop(self):
+        inner = _FakeRoleCredential()
+        inner.release.clear()
+        credential = RefreshAheadCredential(inner)
+
+        self.assertEqual('old-ak', credential.get_access_key_id())
+        self.assertEqual('old-token', credential.security_token)
+        self.assertEqual('old-ak', credential.snapshot().access_key_id)
+        inner.release.set()
+        await asyncio.wrap_future(credential.refresh())
+        self.assertEqual('ak-1', credential.get_access_key_id())
+        self.assertEqual(1, inner.calls)
+
+    def test_fresh_credential_is_not_refreshed(self):
+        inner = _FakeRoleCredential(expiration=int(time.time()) + 3600)
+        credential = RefreshAheadCredential(inner)
+
+        self.assertEqual('old-ak', credential.get_access_key_id())
+        self.assertEqual('old-token', credential.security_token)
+        self.assertEqual(0, inner.calls)
@@ -1,8 +1,16 @@
+import asyncio
+import hashlib
+import tempfile
+import time
 from pathlib import Path
+from unittest import mock
+
+import oss2
 
 from iact3.config import DEFAULT_OUTPUT_DIRECTORY
 from iact3.generate_params import IAC_NAME
-from iact3.plugin.oss import OssPlugin
+from iact3.plugin.base_plugin import RetryPolicy
+from iact3.plugin.oss import OssPlugin, OssUploader
 from tests.common import BaseTest
 
 
@@ -18,3 +26,158 @@ class TestOssPlugin(BaseTest):
 
     def test_exist(self):
         self.plugin.object_exists('')
+
+    async def test_async_calls_do_not_block_the_event_loop(self):
+        ticks = []
+        ticks_seen_by_put = []
+
+        def slow_put(object_name, content, params=None):
+            time.sleep(0.05)
+            ticks_seen_by_put.append(len(ticks))
+            self.plugin.client.objects[object_name] = content
+
+        async def ticker():
+            for _ in range(3):
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        with mock.patch.object(self.plugin.client, 'put_object', side_effect=slow_put):
+            await asyncio.gather(
+                self.plugin.put_object_with_string_async('a.txt', 'a'),
+                self.plugin.put_object_with_string_async('b.txt', 'b'),
+                ticker(),
+            )
+
+        # the loop kept ticking while both uploads were blocked in oss2
+        self.assertTrue(all(seen >= 2 for seen in ticks_seen_by_put))
+        self.assertEqual({'a.txt': 'a', 'b.txt': 'b'}, self.plugin.client.objects)
+
+    async def test_async_calls_retry_request_errors(self):
+        policy = RetryPolicy(
+            max_attempts=3, base_delay=0.001, max_delay=0.001, connection_errors=(oss2.exceptions.RequestError,)
+        )
+        error = oss2.exceptions.RequestError(ConnectionResetError('reset'))
+
+        with mock.patch('iact3.plugin.oss.OSS_RETRY_POLICY', policy), mock.patch.object(
+            self.plugin.client, 'object_exists', side_effect=[error, True]
+        ) as object_exists:
+            self.assertTrue(await self.plugin.object_exists_async('a.txt'))
+
+        self.assertEqual(2, object_exists.call_count)
+
+    async def test_callback_puts_are_not_retried(self):
+        policy = RetryPolicy(
+            max_attempts=3, base_delay=0.001, max_delay=0.001, connection_errors=(oss2.exceptions.RequestError,)
+        )
+        error = oss2.exceptions.RequestError(ConnectionResetError('reset'))
+
+        with mock.patch('iact3.plugin.oss.OSS_RETRY_POLICY', policy), mock.patch.object(
+            self.plugin.client, 'put_object', side_effect=[error, error, error, None]
+        ) as put_object:
+            with self.assertRaises(oss2.exceptions.RequestError):
+                await self.plugin.put_object_with_string_async('a.txt', 'a', callback_params={'callbackUrl': 'url'})
+            with self.assertRaises(oss2.exceptions.RequestError):
+                self.plugin.put_object_with_string('a.txt', 'a', callback_var_params={'x:run': '1'})
+            self.assertEqual(2, put_object.call_count)
+            await self.plugin.put_object_with_string_async('b.txt', 'b')
+
+        self.assertEqual(4, put_object.call_count)
+
+    async def test_read_object_async_returns_the_body(self):
+        body = await self.plugin.read_object_async('template.yml')
+
+        self.assertIn(b'ROSTemplateFormatVersion', body)
+
+    async def test_upload_file_skips_unchanged_content(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            local_file = Path(tmp) / 'report.txt'
+            local_file.write_text('report')
+
+            self.assertTrue(await self.plugin.upload_file_async('reports/report.txt', local_file, True))
+            self.assertFalse(await self.plugin.upload_file_async('reports/report.txt', local_file, True))
+
+            local_file.write_text('changed report')
+            self.assertTrue(await self.plugin.upload_file_async('reports/report.txt', local_file, True))
+
+        headers = self.plugin.client.headers['reports/report.txt']
+        self.assertEqual(hashlib.sha256(b'changed report').hexdigest(), headers[OssPlugin.DIGEST_META_HEADER])
+
+    async def test_upload_file_does_not_probe_by_default(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            local_file = Path(tmp) / 'report.txt'
+            local_file.write_text('report')
+            with mock.patch.object(self.plugin.client, 'head_object') as head_object, mock.patch.object(
+                OssPlugin, 'file_digest'
+            ) as file_digest:
+                self.assertTrue(await self.plugin.upload_file_async('run-1/report.txt', local_file))
+                self.assertTrue(await self.plugin.upload_file_async('run-1/report.txt', local_file))
+
+        head_object.assert_not_called()
+        file_digest.assert_not_called()
+
+    def test_large_files_use_resumable_upload(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            local_file = Path(tmp) / 'large.json'
+            local_file.write_bytes(b'x' * 64)
+
+            with mock.patch.object(OssPlugin, 'MULTIPART_THRESHOLD', 32), mock.patch(
+                'iact3.plugin.oss.oss2.resumable_upload'
+            ) as resumable_upload:
+                self.assertTrue(self.plugin.upload_file('reports/large.json', local_file, skip_if_unchanged=True))
+
+        args, kwargs = resumable_upload.call_args
+        self.assertEqual((self.plugin.client, 'reports/large.json', str(local_file)), args)
+        self.assertEqual(32, kwargs['multipart_threshold'])
+        self.assertIn(OssPlugin.DIGEST_META_HEADER, kwargs['headers'])
+        self.assertNotIn('reports/large.json', self.plugin.client.objects)
+
+
+class TestOssUploader(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        self.plugin = OssPlugin(region_id=self.REGION_ID, bucket_name='iact3-beijing')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.local_dir = Path(self.tmp.name)
+        for index in range(6):
+            (self.local_dir / f'{index}.txt').write_text(str(index))
+
+    async def test_uploads_are_bounded_and_deduplicated(self):
+        running = []
+        peak = []
+
+        async def upload_file_async(object_name, local_file, skip_if_unchanged=False):
+            running.append(object_name)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(object_name)
+            return True
+
+        uploader = OssUploader(self.plugin, 'reports', self.local_dir, concurrency=2)
+        with mock.patch.object(self.plugin, 'upload_file_async', side_effect=upload_file_async) as upload:
+            for index in range(6):
+                uploader.submit(f'{index}.txt')
+            uploader.submit('0.txt')
+            await uploader.wait()
+
+        self.assertEqual(6, upload.call_count)
+        self.assertFalse(any(args[2] for args, _ in upload.call_args_list))
+        self.assertEqual(2, max(peak))
+        self.assertEqual(sorted(f'{index}.txt' for index in range(6)), sorted(uploader.uploaded))
+
+    async def test_wait_raises_the_first_failure_after_all_uploads_finish(self):
+        error = oss2.exceptions.ServerError(500, {}, b'', {})
+
+        async def upload_file_async(object_name, local_file, skip_if_unchanged=False):
+            if object_name == 'reports/1.txt':
+                raise error
+            return True
+
+        uploader = OssUploader(self.plugin, 'reports', self.local_dir)
+        with mock.patch.object(self.plugin, 'upload_file_async', side_effect=upload_file_async):
+            for index in range(3):
+                uploader.submit(f'{index}.txt')
+            with self.assertRaises(oss2.exceptions.ServerError):
+                await uploader.wait()
+
+        self.assertEqual(['0.txt', '2.txt'], sorted(uploader.uploaded))
@@ -95,6 +95,26 @@ class TestConfig(BaseTest):
             configs = await config.get_all_configs()
         self.assertEqual(8, len(configs))
 
+    def test_for_region(self):
+        config = BaseConfig.from_dict(self.config_data).tests['test1']
+        hangzhou = config.for_region('test1', 'cn-hangzhou')
+        shanghai = config.for_region('test1', 'cn-shanghai')
+        self.assertEqual(('test1', 'cn-hangzhou'), (hangzhou.test_name, hangzhou.region))
+        self.assertIs(hangzhou.hooks, shanghai.hooks)
+        self.assertIs(hangzhou.template_config, config.template_config)
+
+        hangzhou.parameters['Key1'] = 'generated'
+        self.assertEqual('Value1-base-test', shanghai.parameters['Key1'])
+        self.assertEqual('Value1-base-test', config.parameters['Key1'])
+
+    def test_validate_config(self):
+        validate_config(BaseConfig, self.config_data)
+        illegal = {TESTS: {'test1': {REGIONS: 'cn-hangzhou'}}}
+        with self.assertRaises(ValidationError):
+            validate_config(BaseConfig, illegal)
+        with self.assertRaises(ValidationError):
+            BaseConfig.create(project_config_file=self.DATA_PATH / 'test_project_config.yml', args=illegal)
+
     def test_auth(self):
         default_auth = Auth()
         default_file = Path(DEFAULT_AUTH_FILE).expanduser().resolve()
@@ -0,0 +1,162 @@
+import asyncio
+from unittest import mock
+
+from iact3.config import TestConfig
+from iact3.discovery import DiscoveryRegistry, DiscoveryService, NetworkInventory
+from iact3.generate_params import ParamGenerator
+from iact3.plugin.ecs import EcsPlugin
+from iact3.plugin.vpc import VpcPlugin
+from tests.common import AsyncMock, BaseTest
+
+
+class TestDiscoveryService(BaseTest):
+    async def test_concurrent_lookups_are_sent_once(self):
+        async def describe_zones(plugin):
+            await asyncio.sleep(0.01)
+            return ['cn-hangzhou-h', 'cn-hangzhou-k', 'cn-hangzhou-x1']
+
+        service = DiscoveryService('cn-hangzhou')
+        with mock.patch.object(EcsPlugin, 'describe_zones', autospec=True, side_effect=describe_zones) as zones:
+            results = await asyncio.gather(*[service.zones() for _ in range(20)])
+            results.append(await service.zones())
+
+        self.assertEqual(1, zones.call_count)
+        self.assertEqual([['cn-hangzhou-k', 'cn-hangzhou-h', 'cn-hangzhou-x1']] * 21, results)
+
+    async def test_results_are_copies(self):
+        vswitches = [{'VSwitchId': 'vsw-1', 'VpcId': 'vpc-1', 'ZoneId': 'zone-a', 'AvailableIpAddressCount': 8}]
+        service = DiscoveryService('cn-hangzhou')
+        with mock.patch.object(VpcPlugin, 'list_vswitches', AsyncMock(return_value=vswitches)) as list_vswitches:
+            first = await service.get_one_vswitch(vpc_id='vpc-1', zone_id='zone-a')
+            first['ZoneId'] = 'changed'
+            second = await service.get_one_vswitch(vpc_id='vpc-1', zone_id='zone-a')
+            missing = await service.get_one_vswitch(vpc_id='vpc-1', zone_id='zone-b')
+
+        self.assertEqual('zone-a', second['ZoneId'])
+        self.assertIsNone(missing)
+        self.assertEqual(1, list_vswitches.await_count)
+
+    async def test_failed_lookups_are_retried(self):
+        service = DiscoveryService('cn-hangzhou')
+        security_groups = [{'SecurityGroupId': 'sg-1', 'VpcId': 'vpc-1', 'ServiceManaged': False}]
+        list_security_groups = AsyncMock(side_effect=[RuntimeError('throttled'), security_groups])
+        with mock.patch.object(EcsPlugin, 'list_security_groups', list_security_groups):
+            with self.assertRaises(RuntimeError):
+                await service.get_security_group(vpc_id='vpc-1')
+            sg = await service.get_security_group(vpc_id='vpc-1')
+            await service.get_security_group(vpc_id='vpc-1')
+
+        self.assertEqual('sg-1', sg['SecurityGroupId'])
+        self.assertEqual(2, list_security_groups.await_count)
+
+    async def test_failed_zone_and_disk_lookups_are_retried(self):
+        service = DiscoveryService('cn-hangzhou')
+        vswitch = {'VSwitchId': 'vsw-1', 'VpcId': 'vpc-1', 'ZoneId': 'zone-v', 'AvailableIpAddressCount': 8}
+        service.inventory = AsyncMock(return_value=NetworkInventory([], [vswitch], []))
+        describe_zones = AsyncMock(side_effect=[RuntimeError('throttled'), ['zone-a']])
+        with mock.patch.object(EcsPlugin, 'describe_zones', describe_zones):
+            self.assertEqual(['zone-v'], await service.zones())
+            self.assertEqual(['zone-a'], await service.zones())
+            self.assertEqual(['zone-a'], await service.zones())
+        self.assertEqual(2, describe_zones.await_count)
+
+        supported = {'SupportedResource': [{'Value': 'cloud_essd', 'Status': 'Available'}]}
+        zone = {'ZoneId': 'zone-a', 'AvailableResources': {'AvailableResource': [{'SupportedResources': supported}]}}
+        available = {'AvailableZones': {'AvailableZone': [zone]}}
+        send_request = AsyncMock(side_effect=[RuntimeError('throttled'), available])
+        with mock.patch.object(EcsPlugin, 'send_request', send_request):
+            with self.assertRaises(RuntimeError):
+                await service.available_disk_categories(zone_id='zone-a', instance_type='ecs.g6.large')
+            for _ in range(2):
+                categories = await service.available_disk_categories(zone_id='zone-a', instance_type='ecs.g6.large')
+                self.assertEqual(['cloud_essd'], categories)
+        self.assertEqual(2, send_request.await_count)
+
+    async def test_network_is_scanned_once_with_every_page(self):
+        pages = {
+            'DescribeVpcs': [
+                {'VpcId': f'vpc-{index}', 'VSwitchIds': {'VSwitchId': []}} for index in range(120)
+            ],
+            'DescribeVSwitches': [
+                {'VpcId': 'vpc-7', 'VSwitchId': 'vsw-7', 'ZoneId': 'zone-a', 'AvailableIpAddressCount': 8}
+            ],
+            'DescribeSecurityGroups': [
+                {'VpcId': 'vpc-7', 'SecurityGroupId': 'sg-7', 'ServiceManaged': False}
+            ],
+        }
+        outer_keys = {
+            'DescribeVpcs': ('Vpcs', 'Vpc'),
+            'DescribeVSwitches': ('VSwitches', 'VSwitch'),
+            'DescribeSecurityGroups': ('SecurityGroups', 'SecurityGroup'),
+        }
+        requests = []
+
+        async def send_request(plugin, request_name, **kwargs):
+            request_name = request_name.replace('Request', '')
+            requests.append((request_name, kwargs['PageNumber']))
+            items = pages[request_name]
+            start = (kwargs['PageNumber'] - 1) * kwargs['PageSize']
+            outer, inner = outer_keys[request_name]
+            return {outer: {inner: items[start:start + kwargs['PageSize']]}, 'TotalCount': len(items)}
+
+        service = DiscoveryService('cn-hangzhou')
+        with mock.patch('iact3.plugin.base_plugin.TeaSDKPlugin.send_request', new=send_request):
+            inventories = await asyncio.gather(*[service.inventory() for _ in range(5)])
+
+        self.assertEqual(5, len(requests))
+        self.assertEqual(120, len(inventories[0].vpcs))
+        self.assertTrue(all(inventory is inventories[0] for inventory in inventories))
+        self.assertEqual(['vpc-7'], inventories[0].vpcs_with_security_groups())
+
+    def test_inventory_index(self):
+        inventory = NetworkInventory(
+            vpcs=[{'VpcId': 'vpc-empty'}, {'VpcId': 'vpc-1'}, {'VpcId': 'vpc-2'}],
+            vswitches=[
+                {'VpcId': 'vpc-empty', 'VSwitchId': 'vsw-full', 'ZoneId': 'zone-a', 'AvailableIpAddressCount': 1},
+                {'VpcId': 'vpc-1', 'VSwitchId': 'vsw-1a', 'ZoneId': 'zone-a', 'AvailableIpAddressCount': 8},
+                {'VpcId': 'vpc-1', 'VSwitchId': 'vsw-1b', 'ZoneId': 'zone-b', 'AvailableIpAddressCount': 8},
+                {'VpcId': 'vpc-2', 'VSwitchId': 'vsw-2b', 'ZoneId': 'zone-b', 'AvailableIpAddressCount': 8},
+            ],
+            security_groups=[
+                {'VpcId': 'vpc-1', 'SecurityGroupId': 'sg-managed', 'ServiceManaged': True},
+                {'VpcId': 'vpc-2', 'SecurityGroupId': 'sg-2', 'ServiceManaged': False},
+            ],
+        )
+
+        self.assertEqual('vpc-1', inventory.get_one_vpc()['VpcId'])
+        self.assertIsNone(inventory.get_one_vpc('vpc-empty'))
+        self.assertEqual(['zone-a', 'zone-b'], inventory.zones('vpc-1'))
+        self.assertEqual('vsw-1a', inventory.get_one_vswitch()['VSwitchId'])
+        self.assertEqual('vsw-1b', inventory.get_one_vswitch(vpc_id='vpc-1', zone_id='zone-b')['VSwitchId'])
+        self.assertEqual('vsw-2b', inventory.get_one_vswitch(vpc_id='vpc-2')['VSwitchId'])
+        self.assertIsNone(inventory.get_one_vswitch(zone_id='zone-c'))
+        self.assertIsNone(inventory.get_security_group(vpc_id='vpc-1'))
+        self.assertEqual('sg-2', inventory.get_security_group()['SecurityGroupId'])
+        self.assertEqual(['vpc-2'], inventory.vpcs_with_security_groups())
+        self.assertTrue(all(inventory.has_resource(resource_id) for resource_id in ('vpc-empty', 'vsw-1a', 'sg-2')))
+        self.assertFalse(any(inventory.has_resource(resource_id) for resource_id in ('vsw-full', 'sg-managed')))
+
+    def test_registry_shares_services_per_region_and_credential(self):
+        registry = DiscoveryRegistry()
+        credential = object()
+
+        self.assertIs(registry.service('cn-hangzhou', credential), registry.service('cn-hangzhou', credential))
+        self.assertIsNot(registry.service('cn-hangzhou', credential), registry.service('cn-beijing', credential))
+        self.assertIsNot(registry.service('cn-hangzhou', credential), registry.service('cn-hangzhou', object()))
+
+    async def test_generators_keep_exclusive_zones(self):
+        auto = '$[iact3-auto]'
+        service = DiscoveryService(self.REGION_ID)
+        generators = []
+        for _ in range(3):
+            config = TestConfig.from_dict({'parameters': {'ZoneId1': auto, 'ZoneId2': auto}})
+            config.region = self.REGION_ID
+            generators.append(ParamGenerator(config, discovery=service))
+
+        describe_zones = AsyncMock(return_value=['zone-a', 'zone-b'])
+        with mock.patch.object(EcsPlugin, 'describe_zones', describe_zones):
+            for generator in generators:
+                zones = [await generator._resolve_zone_id(key) for key in ('ZoneId1', 'ZoneId2')]
+                self.assertEqual(['zone-b', 'zone-a'], zones)
+
+        self.assertEqual(1, describe_zones.await_count)
@@ -0,0 +1,198 @@
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+from Tea.exceptions import TeaException
+
+from iact3.cli_modules.cache import Cache
+from iact3.config import TestConfig
+from iact3.discovery import DiscoveryService
+from iact3.discovery_cache import DISCOVERY_CACHE, DiscoveryCache, account_key
+from iact3.plugin.ecs import EcsPlugin
+from iact3.plugin.ros import StackPlugin
+from iact3.stack import Stack
+from tests.common import AsyncMock, BaseTest
+
+
+def _credential(access_key_id='test_ak'):
+    return SimpleNamespace(cloud_credential=SimpleNamespace(access_key_id=access_key_id))
+
+
+class TestDiscoveryCache(BaseTest):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = DiscoveryCache(directory.name)
+        self.addCleanup(self.cache.close)
+        self.credential = _credential()
+
+    def use_cache(self):
+        patcher = mock.patch('iact3.discovery.DISCOVERY_CACHE', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_results_persist_across_instances(self):
+        fetch = AsyncMock(return_value=['cn-hangzhou', 'cn-beijing'])
+        self.assertEqual(['cn-hangzhou', 'cn-beijing'], await self.cache.fetch('regions', self.credential, fetch))
+        self.cache.close()
+
+        reopened = DiscoveryCache(self.cache.directory)
+        self.addCleanup(reopened.close)
+        self.assertEqual(['cn-hangzhou', 'cn-beijing'], await reopened.fetch('regions', self.credential, fetch))
+        self.assertEqual(1, fetch.await_count)
+
+        await reopened.fetch('regions', _credential('other_ak'), fetch)
+        self.assertEqual(2, fetch.await_count)
+
+    async def test_resource_types_are_shared_by_all_regions(self):
+        self.use_cache()
+        listed = AsyncMock(return_value=['ALIYUN::ROS::Sleep'])
+        with mock.patch.object(StackPlugin, 'list_resource_types', listed):
+            for region in ('cn-hangzhou', 'cn-beijing'):
+                service = DiscoveryService(region, credential=self.credential)
+                self.assertEqual(['ALIYUN::ROS::Sleep'], await service.resource_types())
+        listed.assert_awaited_once_with()
+
+    async def test_sqlite_runs_off_the_event_loop(self):
+        threads = []
+        execute = self.cache._execute
+
+        def record(*args):
+            threads.append(threading.get_ident())
+            return execute(*args)
+
+        with mock.patch.object(self.cache, '_execute', side_effect=record):
+            await self.cache.fetch('regions', self.credential, AsyncMock(return_value=['cn-hangzhou']))
+            await self.cache.fetch('regions', self.credential, AsyncMock())
+
+        self.assertEqual(3, len(threads))
+        self.assertNotIn(threading.get_ident(), threads)
+
+    async def test_entries_expire_per_kind(self):
+        fetch = AsyncMock(return_value=['ecs.g6.large'])
+        with mock.patch('iact3.discovery_cache.time.time', return_value=1000.0):
+            await self.cache.fetch('instance_types', self.credential, fetch, 'cn-hangzhou', ('zone-a',))
+            await self.cache.fetch('regions', self.credential, fetch)
+        with mock.patch('iact3.discovery_cache.time.time', return_value=1000.0 + self.cache.TTLS['instance_types']):
+            await self.cache.fetch('instance_types', self.credential, fetch, 'cn-hangzhou', ('zone-a',))
+            await self.cache.fetch('regions', self.credential, fetch)
+
+        self.assertEqual(3, fetch.await_count)
+
+    async def test_flags_and_unstorable_results(self):
+        fetch = AsyncMock(return_value=['zone-a'])
+        empty = AsyncMock(return_value=[])
+        for _ in range(2):
+            await self.cache.fetch('zones', self.credential, empty, 'cn-hangzhou')
+            await self.cache.fetch('zones', SimpleNamespace(), fetch, 'cn-hangzhou')
+        self.assertEqual(2, empty.await_count)
+        self.assertEqual(2, fetch.await_count)
+
+        self.cache.configure(refresh=True)
+        await self.cache.fetch('zones', self.credential, fetch, 'cn-hangzhou')
+        self.cache.configure()
+        await self.cache.fetch('zones', self.credential, fetch, 'cn-hangzhou')
+        self.assertEqual(3, fetch.await_count)
+
+        self.cache.configure(enabled=False)
+        await self.cache.fetch('zones', self.credential, fetch, 'cn-hangzhou')
+        self.assertEqual(4, fetch.await_count)
+
+    async def test_invalidation(self):
+        for region in ('cn-hangzhou', 'cn-beijing'):
+            for kind in ('zones', 'instance_types'):
+                self.cache.put(kind, account_key(self.credential), region, value=[kind])
+        self.cache.put('regions', account_key(self.credential), value=['cn-hangzhou'])
+
+        self.assertFalse(await self.cache.invalidate_on_failure('cn-hangzhou', 'Stack timed out'))
+        self.assertTrue(
+            await self.cache.invalidate_on_failure(
+                'cn-hangzhou', 'Resource [Instance] failed: code: 403, OperationDenied.NoStock'
+            )
+        )
+        self.assertIsNone(self.cache.get('zones', account_key(self.credential), 'cn-hangzhou'))
+        self.assertEqual(['zones'], self.cache.get('zones', account_key(self.credential), 'cn-beijing'))
+        self.assertEqual(['cn-hangzhou'], self.cache.get('regions', account_key(self.credential)))
+
+        self.assertEqual(1, self.cache.invalidate(['instance_types'], 'cn-beijing'))
+        self.assertEqual(2, self.cache.invalidate())
+
+    def test_unusable_directory_disables_the_cache(self):
+        with tempfile.NamedTemporaryFile() as not_a_directory:
+            cache = DiscoveryCache(not_a_directory.name)
+            cache.put('regions', 'account', value=['cn-hangzhou'])
+        self.assertFalse(cache.enabled)
+        self.assertIsNone(cache.get('regions', 'account'))
+
+    def test_clear_command(self):
+        self.cache.put('zones', 'account', 'cn-hangzhou', value=['zone-a'])
+        self.cache.put('regions', 'account', value=['cn-hangzhou'])
+        with mock.patch('iact3.cli_modules.cache.DISCOVERY_CACHE', self.cache):
+            with self.assertRaises(ValueError):
+                Cache.clear(kinds='zone')
+            Cache.clear(kinds='zones,instance_types', regions='cn-hangzhou')
+            self.assertEqual(['cn-hangzhou'], self.cache.get('regions', 'account'))
+            Cache.clear()
+        self.assertIsNone(self.cache.get('regions', 'account'))
+
+    async def test_discovery_service_persists_lookups(self):
+        self.use_cache()
+        describe_zones = AsyncMock(return_value=['cn-hangzhou-h', 'cn-hangzhou-k'])
+        available = AsyncMock(return_value=['ecs.g6.large'])
+        with mock.patch.object(EcsPlugin, 'describe_zones', describe_zones), mock.patch.object(
+            EcsPlugin, 'describe_available_instance_types', available
+        ):
+            for _ in range(2):
+                service = DiscoveryService(self.REGION_ID, credential=self.credential)
+                self.assertEqual(['cn-hangzhou-k', 'cn-hangzhou-h'], await service.zones())
+                types = await service.available_instance_types(zone_id='cn-hangzhou-k', instance_charge_type='PostPaid')
+                self.assertEqual(['ecs.g6.large'], types)
+
+        self.assertEqual(1, describe_zones.await_count)
+        self.assertEqual(1, available.await_count)
+
+    def sqlite_off_the_loop(self):
+        """Fail the test if the cache opens its connection on the event loop thread."""
+        loop_thread = threading.get_ident()
+        connect = self.cache._connect
+
+        def connect_off_the_loop():
+            self.assertNotEqual(loop_thread, threading.get_ident(), 'sqlite was used on the event loop')
+            return connect()
+
+        return mock.patch.object(self.cache, '_connect', side_effect=connect_off_the_loop)
+
+    async def test_failed_stacks_invalidate_cached_results(self):
+        self.cache.put('instance_types', account_key(self.credential), self.REGION_ID, value=['ecs.g6.large'])
+        stack = Stack(self.REGION_ID, 'stack-id')
+        stack.timer.cancel()
+        with mock.patch('iact3.stack.DISCOVERY_CACHE', self.cache):
+            with self.sqlite_off_the_loop():
+                await stack.set_stack_properties({'Status': 'CREATE_FAILED', 'StatusReason': 'Resource timed out'})
+            self.assertEqual(
+                ['ecs.g6.large'], self.cache.get('instance_types', account_key(self.credential), self.REGION_ID)
+            )
+
+            stack = Stack(self.REGION_ID, 'stack-id')
+            stack.timer.cancel()
+            reason = 'InvalidInstanceType.ValueUnauthorized: The specified InstanceType is not authorized.'
+            with self.sqlite_off_the_loop() as connected:
+                await stack.set_stack_properties({'Status': 'CREATE_FAILED', 'StatusReason': reason})
+            connected.assert_called()
+            self.assertIsNone(self.cache.get('instance_types', account_key(self.credential), self.REGION_ID))
+
+            self.cache.put('zones', account_key(self.credential), self.REGION_ID, value=['zone-a'])
+            error = TeaException({'code': 'OperationDenied.NoStock', 'message': 'no stock'})
+            config = TestConfig.from_dict({'template_config': {'template_body': '{}'}})
+            config.region = self.REGION_ID
+            with mock.patch.object(
+                StackPlugin, 'get_template_estimate_cost', AsyncMock(side_effect=error)
+            ), self.sqlite_off_the_loop() as connected:
+                await Stack.get_price(config)
+            connected.assert_called()
+            self.assertIsNone(self.cache.get('zones', account_key(self.credential), self.REGION_ID))
+
+    def test_shared_cache_is_disabled_in_tests(self):
+        self.assertFalse(DISCOVERY_CACHE.enabled)
@@ -43,7 +43,16 @@ class TestFastHelpConsistency(unittest.TestCase):
             )
 
     def test_global_options_listed(self):
-        for opt in ('--quiet', '--debug', '--profile', '--log-prefix', '--version', '--help'):
+        for opt in (
+            '--quiet',
+            '--debug',
+            '--profile',
+            '--log-prefix',
+            '--no-cache',
+            '--refresh-cache',
+            '--version',
+            '--help',
+        ):
             self.assertIn(opt, self.text, f'Global option {opt} missing from _fast_help()')
 
     def test_nested_help_uses_the_real_command_parser(self):
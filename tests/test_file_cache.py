@@ -0,0 +1,79 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from iact3.config import BaseConfig, TemplateConfig
+from iact3.file_cache import FILE_CACHE, FileLoadCache
+from iact3.util import yaml
+from tests.common import BaseTest
+
+
+class TestFileLoadCache(BaseTest):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        FILE_CACHE.clear()
+        self.addCleanup(FILE_CACHE.clear)
+
+    def write(self, name, content, mtime_ns=None):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file_handle:
+            file_handle.write(content)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        return path
+
+    def test_unchanged_files_are_parsed_once(self):
+        cache = FileLoadCache()
+        parse = mock.Mock(side_effect=str.upper)
+        path = self.write('file.txt', 'first', mtime_ns=10**18)
+        self.assertEqual('FIRST', cache.load('upper', path, parse))
+        self.assertEqual('FIRST', cache.load('upper', path, parse))
+        self.assertEqual('first', cache.load('text', path))
+        self.assertEqual(1, parse.call_count)
+
+        self.write('file.txt', 'second', mtime_ns=10**18)
+        self.assertEqual('SECOND', cache.load('upper', path, parse))
+        self.write('file.txt', 'third!', mtime_ns=10**18 + 1)
+        self.assertEqual('THIRD!', cache.load('upper', path, parse))
+        self.assertEqual(3, parse.call_count)
+
+    def test_replaced_files_are_loaded_again(self):
+        cache = FileLoadCache()
+        path = self.write('file.txt', 'first', mtime_ns=10**18)
+        self.assertEqual('first', cache.load('text', path))
+        replacement = self.write('replacement.txt', 'other', mtime_ns=10**18)
+        os.replace(replacement, path)
+        self.assertEqual('other', cache.load('text', path))
+
+    def test_failed_loads_are_not_cached(self):
+        cache = FileLoadCache()
+        path = self.write('file.txt', 'content')
+        with self.assertRaises(ValueError):
+            cache.load('broken', path, mock.Mock(side_effect=ValueError))
+        self.assertEqual('content', cache.load('broken', path, str))
+        with self.assertRaises(FileNotFoundError):
+            cache.load('text', os.path.join(self.directory, 'missing.txt'))
+
+    def test_changed_templates_are_picked_up(self):
+        path = self.write('test.template.yml', 'ROSTemplateFormatVersion: "2015-09-01"\n')
+        first = TemplateConfig(template_location=path).generate_template_args()
+        self.assertEqual('{"ROSTemplateFormatVersion": "2015-09-01"}', first['template_body'])
+
+        self.write('test.template.yml', 'ROSTemplateFormatVersion: "2015-09-01"\nDescription: changed\n')
+        second = TemplateConfig(template_location=path).generate_template_args()
+        self.assertIn('changed', second['template_body'])
+
+    def test_unchanged_config_files_are_not_parsed_again(self):
+        config_file = self.write('.iact3.yml', 'project:\n  parameters:\n    Name: name\ntests:\n  default: {}\n')
+        global_config = Path(self.directory) / 'global.yml'
+        with mock.patch('iact3.config.yaml.load', wraps=yaml.load) as load:
+            for _ in range(2):
+                config = BaseConfig.create(
+                    global_config_path=global_config, project_config_file=config_file, args={'project': {}}
+                )
+                self.assertEqual({'Name': 'name'}, config.tests['default'].parameters)
+        self.assertEqual(1, load.call_count)
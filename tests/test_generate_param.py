@@ -1,9 +1,14 @@
+import asyncio
 import yaml
 from unittest import mock
 
 from iact3.config import TestConfig, TemplateConfig
+from iact3.discovery import DiscoveryService, NetworkInventory
+from iact3.exceptions import Iact3Exception
 from iact3.generate_params import ParamGenerator
-from tests.common import BaseTest
+from iact3.plugin.base_plugin import RetryPolicy
+from iact3.plugin.ros import StackPlugin
+from tests.common import AsyncMock, BaseTest
 
 
 class TestParamGen(BaseTest):
@@ -25,29 +30,16 @@ class TestParamGen(BaseTest):
         generator._unresolved_parameters = dict(config.parameters)
         generator._zone_list_cache = ['zone-a', 'zone-b']
 
-        class MultiZoneVpcPlugin:
-            def __init__(self, _region, credential=None):
-                pass
-
-            async def get_one_vswitch(self, vpc_id=None, zone_id=None):
-                by_zone = {
-                    'zone-a': {
-                        'VpcId': 'vpc-shared',
-                        'VSwitchId': 'vsw-a',
-                        'ZoneId': 'zone-a',
-                    },
-                    'zone-b': {
-                        'VpcId': 'vpc-shared',
-                        'VSwitchId': 'vsw-b',
-                        'ZoneId': 'zone-b',
-                    },
-                }
-                result = by_zone.get(zone_id)
-                if result and (vpc_id is None or result['VpcId'] == vpc_id):
-                    return result
-                return None
+        inventory = NetworkInventory(
+            vpcs=[{'VpcId': 'vpc-shared'}],
+            vswitches=[
+                {'VpcId': 'vpc-shared', 'VSwitchId': 'vsw-a', 'ZoneId': 'zone-a', 'AvailableIpAddressCount': 8},
+                {'VpcId': 'vpc-shared', 'VSwitchId': 'vsw-b', 'ZoneId': 'zone-b', 'AvailableIpAddressCount': 8},
+            ],
+            security_groups=[],
+        )
 
-        with mock.patch('iact3.generate_params.VpcPlugin', MultiZoneVpcPlugin):
+        with mock.patch.object(DiscoveryService, 'inventory', AsyncMock(return_value=inventory)):
             await generator.resolve_auto_key()
 
         self.assertEqual('zone-a', generator.parameters['ZoneId1'])
@@ -73,41 +65,157 @@ class TestParamGen(BaseTest):
             'VSwitchId1': {'vswitch_id': 'vsw-old-a', 'zone_id': 'zone-a'},
         }
 
-        class CandidateVpcPlugin:
-            async def get_one_vswitch(self, vpc_id=None, zone_id=None):
-                available = {
-                    ('vpc-partial', 'zone-a'): {
-                        'VpcId': 'vpc-partial',
-                        'VSwitchId': 'vsw-partial-a',
-                        'ZoneId': 'zone-a',
-                    },
-                    ('vpc-complete', 'zone-a'): {
-                        'VpcId': 'vpc-complete',
-                        'VSwitchId': 'vsw-complete-a',
-                        'ZoneId': 'zone-a',
-                    },
-                    ('vpc-complete', 'zone-b'): {
-                        'VpcId': 'vpc-complete',
-                        'VSwitchId': 'vsw-complete-b',
-                        'ZoneId': 'zone-b',
-                    },
-                }
-                return available.get((vpc_id, zone_id))
-
-        plugin = CandidateVpcPlugin()
-        self.assertIsNone(
-            await generator._vswitch_assignments_for_vpc('vpc-partial', plugin)
-        )
-        assignments = await generator._vswitch_assignments_for_vpc(
-            'vpc-complete',
-            plugin,
+        inventory = NetworkInventory(
+            vpcs=[{'VpcId': 'vpc-partial'}, {'VpcId': 'vpc-complete'}],
+            vswitches=[
+                {
+                    'VpcId': 'vpc-partial',
+                    'VSwitchId': 'vsw-partial-a',
+                    'ZoneId': 'zone-a',
+                    'AvailableIpAddressCount': 8,
+                },
+                {
+                    'VpcId': 'vpc-complete',
+                    'VSwitchId': 'vsw-complete-a',
+                    'ZoneId': 'zone-a',
+                    'AvailableIpAddressCount': 8,
+                },
+                {
+                    'VpcId': 'vpc-complete',
+                    'VSwitchId': 'vsw-complete-b',
+                    'ZoneId': 'zone-b',
+                    'AvailableIpAddressCount': 8,
+                },
+            ],
+            security_groups=[],
         )
+
+        self.assertIsNone(generator._vswitch_assignments_for_vpc('vpc-partial', inventory))
+        assignments = generator._vswitch_assignments_for_vpc('vpc-complete', inventory)
         self.assertEqual(
             {'VSwitchId1', 'VSwitchId2'},
             set(assignments),
         )
         self.assertEqual('vsw-complete-b', assignments['VSwitchId2']['vswitch_id'])
 
+    async def test_security_group_moves_the_network_to_a_complete_vpc(self):
+        auto = '$[iact3-auto]'
+        config = TestConfig.from_dict(
+            {'parameters': {'ZoneId': 'zone-a', 'VpcId': auto, 'VSwitchId': auto, 'SecurityGroupId': auto}}
+        )
+        generator = ParamGenerator(config)
+        inventory = NetworkInventory(
+            vpcs=[{'VpcId': 'vpc-1'}, {'VpcId': 'vpc-2'}, {'VpcId': 'vpc-3'}],
+            vswitches=[
+                {'VpcId': 'vpc-1', 'VSwitchId': 'vsw-1', 'ZoneId': 'zone-a', 'AvailableIpAddressCount': 8},
+                {'VpcId': 'vpc-2', 'VSwitchId': 'vsw-2', 'ZoneId': 'zone-b', 'AvailableIpAddressCount': 8},
+                {'VpcId': 'vpc-3', 'VSwitchId': 'vsw-3', 'ZoneId': 'zone-a', 'AvailableIpAddressCount': 8},
+            ],
+            security_groups=[
+                {'VpcId': 'vpc-2', 'SecurityGroupId': 'sg-2', 'ServiceManaged': False},
+                {'VpcId': 'vpc-3', 'SecurityGroupId': 'sg-3', 'ServiceManaged': False},
+            ],
+        )
+
+        with mock.patch.object(DiscoveryService, 'inventory', AsyncMock(return_value=inventory)) as scan:
+            self.assertEqual(('vpc-3', 'vsw-3'), await generator._gen_vpc_vsw_id('VSwitchId', auto))
+            self.assertEqual('sg-3', await generator._gen_sg('SecurityGroupId', auto))
+
+        self.assertEqual('vpc-3', generator.parameters['VpcId'])
+        self.assertEqual('vsw-3', generator.parameters['VSwitchId'])
+        self.assertEqual(2, scan.await_count)
+
+    async def test_disk_categories_are_probed_concurrently_in_priority_order(self):
+        auto = '$[iact3-auto]'
+        by_disk = {'cloud_essd': [], 'cloud_ssd': ['ecs.g6.large'], 'cloud_efficiency': ['ecs.t6-c1m1.large']}
+        in_flight = []
+        peak = []
+
+        async def available_instance_types(zone_id=None, instance_charge_type=None, system_disk_category=None):
+            in_flight.append(system_disk_category)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(system_disk_category)
+            return by_disk.get(system_disk_category, [])
+
+        config = TestConfig.from_dict(
+            {'parameters': {'ZoneId': 'zone-a', 'InstanceType': auto, 'SystemDiskCategory': auto}}
+        )
+        generator = ParamGenerator(config)
+        with mock.patch.object(DiscoveryService, 'available_instance_types', side_effect=available_instance_types):
+            self.assertEqual('ecs.g6.large', await generator._resolve_instance_type('InstanceType'))
+        self.assertEqual('cloud_ssd', await generator._resolve_system_disk_category('SystemDiskCategory'))
+        self.assertEqual(len(ParamGenerator.SAFE_DISK_CATEGORIES), max(peak))
+
+        config = TestConfig.from_dict(
+            {'parameters': {'ZoneId': 'zone-a', 'InstanceType': auto, 'SystemDiskCategory': 'cloud_efficiency'}}
+        )
+        generator = ParamGenerator(config)
+        with mock.patch.object(
+            DiscoveryService, 'available_instance_types', side_effect=available_instance_types
+        ) as probe:
+            self.assertEqual('ecs.t6-c1m1.large', await generator._resolve_instance_type('InstanceType'))
+        self.assertEqual(['cloud_efficiency'], [call[1]['system_disk_category'] for call in probe.call_args_list])
+
+    async def test_decided_disk_category_is_not_probed_again(self):
+        auto = '$[iact3-auto]'
+        by_disk = {'cloud_essd': ['ecs.g7.large'], 'cloud_ssd': ['ecs.g6.large']}
+
+        async def available_instance_types(zone_id=None, instance_charge_type=None, system_disk_category=None):
+            return by_disk.get(system_disk_category, [])
+
+        config = TestConfig.from_dict(
+            {
+                'parameters': {
+                    'ZoneId': 'zone-a',
+                    'InstanceType': auto,
+                    'WorkerInstanceType': auto,
+                    'SystemDiskCategory': auto,
+                }
+            }
+        )
+        generator = ParamGenerator(config)
+        with mock.patch.object(
+            DiscoveryService, 'available_instance_types', side_effect=available_instance_types
+        ) as probe:
+            self.assertEqual('ecs.g7.large', await generator._resolve_instance_type('InstanceType'))
+            self.assertEqual('ecs.g7.large', await generator._resolve_instance_type('WorkerInstanceType'))
+        self.assertEqual(
+            list(ParamGenerator.SAFE_DISK_CATEGORIES), [call[1]['system_disk_category'] for call in probe.call_args_list]
+        )
+
+        config = TestConfig.from_dict(
+            {
+                'parameters': {
+                    'ZoneId': 'zone-a',
+                    'InstanceType': 'ecs.g6.large',
+                    'WorkerInstanceType': auto,
+                    'SystemDiskCategory': auto,
+                }
+            }
+        )
+        generator = ParamGenerator(config)
+        supported = AsyncMock(return_value=['cloud_efficiency', 'cloud_ssd'])
+        with mock.patch.object(DiscoveryService, 'available_disk_categories', supported), mock.patch.object(
+            DiscoveryService, 'available_instance_types', side_effect=available_instance_types
+        ) as probe:
+            self.assertEqual('ecs.g6.large', await generator._resolve_instance_type('WorkerInstanceType'))
+        self.assertEqual('cloud_ssd', await generator._resolve_system_disk_category('SystemDiskCategory'))
+        self.assertEqual(
+            ['cloud_ssd', 'cloud_efficiency'], [call[1]['system_disk_category'] for call in probe.call_args_list]
+        )
+
+    async def test_disk_category_for_a_fixed_instance_type(self):
+        auto = '$[iact3-auto]'
+        config = TestConfig.from_dict(
+            {'parameters': {'ZoneId': 'zone-a', 'InstanceType': 'ecs.g6.large', 'SystemDiskCategory': auto}}
+        )
+        generator = ParamGenerator(config)
+        supported = AsyncMock(return_value=['cloud_auto', 'cloud_efficiency', 'cloud_ssd'])
+        with mock.patch.object(DiscoveryService, 'available_disk_categories', supported):
+            self.assertEqual('cloud_ssd', await generator._resolve_system_disk_category('SystemDiskCategory'))
+        supported.assert_awaited_once_with(zone_id='zone-a', instance_type='ecs.g6.large', disk_type='SystemDisk')
+
     async def test_auto_zone_avoids_an_explicit_zone(self):
         auto = '$[iact3-auto]'
         config = TestConfig.from_dict(
@@ -222,3 +330,174 @@ class TestParamGen(BaseTest):
         config.test_name = 'default'
         resolved_parameters = await ParamGenerator.result(config)
         self._pprint_json(resolved_parameters.parameters)
+
+
+class TestConstraintSolver(BaseTest):
+    AUTO = '$[iact3-auto]'
+
+    def setUp(self):
+        super().setUp()
+        # Allowed values by key and the values already chosen for the keys before it.
+        self.allowed_values = {
+            ('A', ()): ['a1', 'a2'],
+            ('B', (('A', 'a1'),)): ['b1'],
+            ('B', (('A', 'a2'),)): ['b2'],
+            ('C', (('A', 'a1'), ('B', 'b1'))): [],
+            ('C', (('A', 'a2'), ('B', 'b2'))): ['c1'],
+        }
+
+    def _generator(self, keys, region=None):
+        config = TestConfig.from_dict(
+            {
+                'template_config': {'template_body': 'ROSTemplateFormatVersion: 2015-09-01'},
+                'parameters': {key: self.AUTO for key in keys},
+            }
+        )
+        config.region = region or self.REGION_ID
+        config.test_name = 'default'
+        return ParamGenerator(config)
+
+    def _patch_constraints(self, respond):
+        calls = []
+
+        async def get_parameter_constraints(plugin, parameters=None, parameters_key_filter=None, **kwargs):
+            calls.append((list(parameters_key_filter), dict(parameters)))
+            return respond(parameters_key_filter, parameters)
+
+        patcher = mock.patch.object(StackPlugin, 'get_parameter_constraints', new=get_parameter_constraints)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return calls
+
+    def _respond_from_table(self, keys, parameters):
+        if len(keys) > 1:
+            return [{'ParameterKey': key, 'Behavior': 'QueryError'} for key in keys]
+        prefix = tuple((k, v) for k, v in parameters.items() if v is not None)
+        return [{'ParameterKey': keys[0], 'AllowedValues': self.allowed_values[(keys[0], prefix)]}]
+
+    async def test_backtracks_to_the_next_value_of_an_earlier_key(self):
+        calls = self._patch_constraints(self._respond_from_table)
+
+        parameters = await self._generator(['A', 'B', 'C']).resolve_auto_value()
+
+        self.assertEqual({'A': 'a2', 'B': 'b2', 'C': 'c1'}, parameters)
+        # one multi-key prefetch, then one query per (key, prefix)
+        self.assertEqual(6, len(calls))
+        # a key is never queried with its own or a later key's stale value
+        for keys, sent in calls[1:]:
+            self.assertIsNone(sent[keys[0]])
+
+    async def test_exhausted_keys_raise_the_last_failure(self):
+        self.allowed_values[('C', (('A', 'a2'), ('B', 'b2')))] = []
+        self._patch_constraints(self._respond_from_table)
+
+        with self.assertRaisesRegex(Iact3Exception, 'no available value found for C'):
+            await self._generator(['A', 'B', 'C']).resolve_auto_value()
+
+    async def test_results_are_shared_between_generators(self):
+        calls = self._patch_constraints(self._respond_from_table)
+
+        await self._generator(['A', 'B', 'C']).resolve_auto_value()
+        first_run = len(calls)
+        parameters = await self._generator(['A', 'B', 'C']).resolve_auto_value()
+
+        self.assertEqual({'A': 'a2', 'B': 'b2', 'C': 'c1'}, parameters)
+        # only the prefetch is repeated; every single-key query is answered from the cache
+        self.assertEqual(first_run + 1, len(calls))
+
+        await self._generator(['A', 'B', 'C'], region='cn-beijing').resolve_auto_value()
+        self.assertEqual(first_run * 2 + 1, len(calls))
+
+    async def test_prefetch_reuses_multi_key_constraints(self):
+        def respond(keys, parameters):
+            if len(keys) > 1:
+                return [
+                    {'ParameterKey': 'A', 'AllowedValues': ['a1']},
+                    {'ParameterKey': 'B', 'Behavior': 'NotSupport'},
+                    {'ParameterKey': 'C', 'AllowedValues': ['c1', 'c2'], 'AssociationParameterNames': []},
+                ]
+            raise AssertionError(f'unexpected single-key query for {keys}')
+
+        calls = self._patch_constraints(respond)
+        generator = self._generator(['A', 'B', 'C'])
+
+        parameters = await generator.resolve_auto_value()
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual(['A', 'B', 'C'], calls[0][0])
+        self.assertEqual('a1', parameters['A'])
+        self.assertEqual('c1', parameters['C'])
+        self.assertEqual(self.AUTO, parameters['B'])
+
+    async def test_timeouts_are_not_cached(self):
+        timeout = [{'Behavior': 'QueryError', 'BehaviorReason': 'query timeout'}]
+        calls = self._patch_constraints(lambda keys, parameters: timeout)
+
+        with mock.patch('iact3.generate_params.CONSTRAINTS_RETRY_POLICY', RetryPolicy(max_attempts=1)):
+            for _ in range(2):
+                with self.assertRaisesRegex(Iact3Exception, 'get constraints timeout for A'):
+                    await self._generator(['A']).resolve_auto_value()
+
+        self.assertEqual(2, len(calls))
+
+    async def test_independent_components_resolve_concurrently(self):
+        associations = {'A': [], 'B': ['A'], 'D': [], 'E': ['D']}
+        allowed_values = {
+            ('A', ()): ['a1', 'a2'],
+            ('B', (('A', 'a1'),)): [],
+            ('B', (('A', 'a2'),)): ['b1'],
+            ('D', ()): ['d1'],
+            ('E', (('D', 'd1'),)): ['e1'],
+        }
+        running = []
+        peak = []
+
+        async def get_parameter_constraints(plugin, parameters=None, parameters_key_filter=None, **kwargs):
+            keys = list(parameters_key_filter)
+            if len(keys) > 1:
+                return [{'ParameterKey': key, 'AssociationParameterNames': associations[key]} for key in keys]
+            running.append(keys[0])
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(keys[0])
+            queried.append(keys[0])
+            prefix = tuple((k, v) for k, v in parameters.items() if v is not None)
+            return [{'ParameterKey': keys[0], 'AllowedValues': allowed_values[(keys[0], prefix)]}]
+
+        queried = []
+        generator = self._generator(['A', 'B', 'D', 'E'])
+        with mock.patch.object(StackPlugin, 'get_parameter_constraints', new=get_parameter_constraints):
+            parameters = await generator.resolve_auto_value()
+
+        self.assertEqual({'A': 'a2', 'B': 'b1', 'D': 'd1', 'E': 'e1'}, parameters)
+        self.assertEqual(2, max(peak))
+        # backtracking in A/B never touched the D/E group
+        self.assertEqual(1, queried.count('D'))
+        self.assertEqual(1, queried.count('E'))
+
+    async def test_association_metadata_links_components(self):
+        template = """
+ROSTemplateFormatVersion: '2015-09-01'
+Parameters:
+  ZoneId:
+    Type: String
+  VSwitchId:
+    Type: String
+    AssociationPropertyMetadata:
+      ZoneId: ${ZoneId}
+  ImageId:
+    Type: String
+"""
+        config = TestConfig.from_dict(
+            {
+                'template_config': {'template_body': template},
+                'parameters': {key: self.AUTO for key in ('ZoneId', 'VSwitchId', 'ImageId', 'Unknown')},
+            }
+        )
+        config.region = self.REGION_ID
+        generator = ParamGenerator(config)
+        generator._associations = {'ZoneId': [], 'VSwitchId': [], 'ImageId': []}
+
+        components = await generator._independent_components(['ZoneId', 'VSwitchId', 'ImageId', 'Unknown'])
+
+        self.assertEqual([['ZoneId', 'VSwitchId'], ['ImageId'], ['Unknown']], components)
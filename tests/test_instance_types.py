@@ -0,0 +1,145 @@
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from iact3.discovery_cache import DiscoveryCache
+from iact3.instance_types import (
+    TIER_ENTRY,
+    TIER_OTHER,
+    TIER_SMALL_SECONDARY,
+    InstanceTypeCatalog,
+    instance_prices_from_estimate,
+    load_instance_prices,
+    parse_instance_type,
+    record_instance_prices,
+)
+from iact3.util import pick_cheapest_instance_type, rank_cheapest_instance_types
+from tests.common import AsyncTestCase
+
+PRICED_TEMPLATE = {
+    'Resources': {
+        'Instance': {'Type': 'ALIYUN::ECS::Instance', 'Properties': {'InstanceType': {'Ref': 'InstanceType'}}},
+        'Group': {'Type': 'ALIYUN::ECS::InstanceGroup', 'Properties': {'InstanceType': 'ecs.c6.large'}},
+        'Eip': {'Type': 'ALIYUN::VPC::EIP', 'Properties': {}},
+    }
+}
+
+
+class TestParseInstanceType(unittest.TestCase):
+    def test_sizes(self):
+        cases = {
+            'ecs.g6.large': ('g6', 6, 'large', 1.0, 2),
+            'ecs.g6.xlarge': ('g6', 6, 'xlarge', 2.0, 4),
+            'ecs.g6.2xlarge': ('g6', 6, '2xlarge', 4.0, 8),
+            'ecs.g6.12xlarge': ('g6', 6, '12xlarge', 24.0, 48),
+            'ecs.g8a.2.5xlarge': ('g8a', 8, '2.5xlarge', 5.0, 10),
+            'ecs.t6-c1m1.large': ('t6', 6, 'large', 1.0, 2),
+            'ecs.gn7i-c8g1.2xlarge': ('gn7i', 7, '2xlarge', 4.0, 8),
+            'ecs.e-c1m2.small': ('e', None, 'small', 0.5, 1),
+        }
+        for type_id, expected in cases.items():
+            with self.subTest(type_id=type_id):
+                spec = parse_instance_type(type_id)
+                self.assertEqual(expected, (spec.family, spec.generation, spec.size, spec.size_rank, spec.vcpus))
+
+    def test_tiers(self):
+        self.assertEqual(TIER_ENTRY, parse_instance_type('ecs.t6-c1m1.2xlarge').tier)
+        self.assertEqual(TIER_SMALL_SECONDARY, parse_instance_type('ecs.c7.xlarge').tier)
+        self.assertEqual(TIER_OTHER, parse_instance_type('ecs.c7.2xlarge').tier)
+        self.assertEqual(TIER_OTHER, parse_instance_type('ecs.unknown').tier)
+
+
+class TestInstanceTypeCatalog(unittest.TestCase):
+    def test_ranking(self):
+        types = [
+            'ecs.g6.12xlarge',
+            'ecs.g6.2xlarge',
+            'ecs.r6.large',
+            'ecs.gn6i-c4g1.xlarge',
+            'ecs.g6.xlarge',
+            'not-an-instance-type',
+            'ecs.c6.large',
+            'ecs.t5-lc1m2.small',
+            'ecs.g6.large',
+        ]
+        self.assertEqual(
+            [
+                'ecs.t5-lc1m2.small',
+                'ecs.g6.large',
+                'ecs.c6.large',
+                'ecs.r6.large',
+                'ecs.g6.xlarge',
+                'ecs.gn6i-c4g1.xlarge',
+                'ecs.g6.2xlarge',
+                'ecs.g6.12xlarge',
+                'not-an-instance-type',
+            ],
+            rank_cheapest_instance_types(types),
+        )
+        self.assertEqual('ecs.t5-lc1m2.small', pick_cheapest_instance_type(types))
+        self.assertIsNone(pick_cheapest_instance_type([]))
+
+    def test_prices_reorder_a_tier(self):
+        types = ['ecs.g6.large', 'ecs.c6.large', 'ecs.g6.xlarge', 'ecs.t6-c1m1.large']
+        prices = {'ecs.g6.xlarge': 0.5, 'ecs.c6.large': 0.8}
+        self.assertEqual(
+            ['ecs.t6-c1m1.large', 'ecs.g6.xlarge', 'ecs.c6.large', 'ecs.g6.large'],
+            rank_cheapest_instance_types(types, prices),
+        )
+
+    def test_types_are_parsed_once_and_indexed(self):
+        catalog = InstanceTypeCatalog()
+        with mock.patch('iact3.instance_types.parse_instance_type', wraps=parse_instance_type) as parse:
+            for _ in range(3):
+                catalog.rank(['ecs.g6.large', 'ecs.g6.xlarge', 'ecs.c6.large', 'ecs.g6.large'])
+        self.assertEqual(3, parse.call_count)
+        self.assertEqual(['ecs.g6.large', 'ecs.g6.xlarge'], catalog.by_family('g6'))
+        self.assertEqual(['ecs.g6.large', 'ecs.c6.large'], catalog.by_size('large'))
+
+
+class TestInstancePrices(AsyncTestCase):
+    @staticmethod
+    def price(resource_type, amount, quantity=1, unit='Hour'):
+        return {
+            'Type': resource_type,
+            'Result': {
+                'OrderSupplement': {'ChargeType': 'PostPaid', 'PriceUnit': unit, 'Quantity': quantity},
+                'Order': {'TradeAmount': amount},
+            },
+        }
+
+    def test_prices_from_estimate(self):
+        template_price = {
+            'Instance': self.price('ALIYUN::ECS::Instance', 0.4),
+            'Group': self.price('ALIYUN::ECS::InstanceGroup', 1.5, quantity=3),
+            'Eip': self.price('ALIYUN::VPC::EIP', 0.1),
+        }
+        prices = instance_prices_from_estimate(template_price, PRICED_TEMPLATE, {'InstanceType': 'ecs.g6.large'})
+        self.assertEqual({'ecs.g6.large': 0.4, 'ecs.c6.large': 0.5}, prices)
+
+        template_price = {'Instance': self.price('ALIYUN::ECS::Instance', 300, unit='Month')}
+        self.assertEqual({}, instance_prices_from_estimate(template_price, PRICED_TEMPLATE, {'InstanceType': 'x'}))
+
+    async def test_prices_are_merged_in_the_discovery_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiscoveryCache(directory)
+            credential = mock.Mock()
+            credential.cloud_credential.access_key_id = 'test_ak'
+            loop_thread = threading.get_ident()
+            execute = cache._execute
+
+            def execute_off_the_loop(*args):
+                self.assertNotEqual(loop_thread, threading.get_ident(), 'sqlite was used on the event loop')
+                return execute(*args)
+
+            with mock.patch('iact3.instance_types.DISCOVERY_CACHE', cache), mock.patch.object(
+                cache, '_execute', side_effect=execute_off_the_loop
+            ):
+                await record_instance_prices('cn-hangzhou', credential, {'ecs.g6.large': 0.4})
+                await record_instance_prices('cn-hangzhou', credential, {'ecs.c6.large': 0.5})
+                self.assertEqual(
+                    {'ecs.g6.large': 0.4, 'ecs.c6.large': 0.5}, await load_instance_prices('cn-hangzhou', credential)
+                )
+                self.assertEqual({}, await load_instance_prices('cn-beijing', credential))
+            cache.close()
@@ -0,0 +1,162 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from iact3.cli_modules.test import Test
+from iact3.config import IAC_NAME, TestConfig
+from iact3.discovery import DiscoveryService, NetworkInventory
+from iact3.exceptions import Iact3Exception
+from iact3.generate_params import ParamGenerator, ResolvedParameters
+from iact3.plan import ParameterPlan
+from tests.common import AsyncMock, BaseTest
+
+TEMPLATE = '{"ROSTemplateFormatVersion": "2015-09-01", "Parameters": {"VpcId": {"Type": "String"}}}'
+
+
+class TestParameterPlan(BaseTest):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.plan_file = os.path.join(directory.name, 'plan.json')
+
+    def config(self, parameters=None, template=TEMPLATE):
+        config = TestConfig.from_dict(
+            {'template_config': {'template_body': template}, 'parameters': parameters or {'VpcId': '$[iact3-auto]'}}
+        )
+        config.region = self.REGION_ID
+        config.test_name = 'default'
+        return config
+
+    def discovery(self, vpc_ids=('vpc-1',)):
+        service = DiscoveryService(self.REGION_ID)
+        inventory = NetworkInventory([{'VpcId': vpc_id} for vpc_id in vpc_ids], [], [])
+        service.inventory = AsyncMock(return_value=inventory)
+        return service
+
+    def generator(self, vpc_id='vpc-1', error=None):
+        async def result(config, discovery=None):
+            if config.parameters.get('VpcId') == '$[iact3-auto]':
+                config.parameters['VpcId'] = vpc_id
+            for name, value in config.parameters.items():
+                if ParamGenerator.is_regenerated(name, value):
+                    config.parameters[name] = ParamGenerator.generate_value(name)
+            return ResolvedParameters(config.test_name, config.region, config.parameters, error=error)
+
+        patcher = mock.patch.object(ParamGenerator, 'result', side_effect=result)
+        generate = patcher.start()
+        self.addCleanup(patcher.stop)
+        return generate
+
+    async def test_locked_parameters_skip_generation(self):
+        generate = self.generator()
+        plan = ParameterPlan()
+        resolved = await plan.resolve(self.config(), self.discovery())
+        self.assertEqual({'VpcId': 'vpc-1'}, resolved.parameters)
+        self.assertTrue(plan.modified)
+        plan.save(self.plan_file)
+
+        entry = json.loads(Path(self.plan_file).read_text(encoding='utf-8'))['entries'][0]
+        self.assertEqual({'VpcId': 'vpc-1'}, entry['parameters'])
+        self.assertEqual(['default', self.REGION_ID], [entry['test_name'], entry['region']])
+        self.assertTrue(entry['template_hash'] and entry['inputs_hash'] and entry['resolved_at'])
+
+        plan = ParameterPlan.load(self.plan_file)
+        discovery = self.discovery()
+        for _ in range(2):
+            resolved = await plan.resolve(self.config(), discovery)
+            self.assertEqual({'VpcId': 'vpc-1'}, resolved.parameters)
+        self.assertEqual(1, generate.call_count)
+        self.assertFalse(plan.modified)
+
+    async def test_secrets_names_and_uuids_are_never_locked(self):
+        generate = self.generator()
+        parameters = {
+            'VpcId': '$[iact3-auto]',
+            'DBPassword': '$[iact3-auto]',
+            'InstanceName': '$[iact3-auto]',
+            'ClientUuid': '$[iact3-auto]',
+        }
+        plan = ParameterPlan()
+        first = (await plan.resolve(self.config(dict(parameters)), self.discovery())).parameters
+        plan.save(self.plan_file)
+
+        content = Path(self.plan_file).read_text(encoding='utf-8')
+        for name in ('DBPassword', 'InstanceName', 'ClientUuid'):
+            self.assertNotIn(first[name], content)
+        entry = json.loads(content)['entries'][0]
+        self.assertEqual({'VpcId': 'vpc-1'}, entry['parameters'])
+        self.assertEqual(['ClientUuid', 'DBPassword', 'InstanceName'], entry['regenerate'])
+
+        second = await ParameterPlan.load(self.plan_file).resolve(self.config(dict(parameters)), self.discovery())
+        self.assertEqual(1, generate.call_count)
+        self.assertEqual('vpc-1', second.parameters['VpcId'])
+        for name in ('DBPassword', 'InstanceName', 'ClientUuid'):
+            self.assertNotEqual(first[name], second.parameters[name])
+            self.assertNotIn('$[iact3-auto]', second.parameters[name])
+
+    async def test_stale_entries_are_resolved_again(self):
+        generate = self.generator()
+        plan = ParameterPlan()
+        await plan.resolve(self.config(), self.discovery())
+
+        await plan.resolve(self.config({'VpcId': '$[iact3-auto]', 'Name': 'changed'}), self.discovery())
+        await plan.resolve(self.config(template=TEMPLATE.replace('String', 'Json')), self.discovery())
+        self.assertEqual(3, generate.call_count)
+
+        with mock.patch('iact3.plan.account_key', return_value='another-account'):
+            await plan.resolve(self.config(), self.discovery())
+        self.assertEqual(4, generate.call_count)
+
+        generate = self.generator(vpc_id='vpc-2')
+        resolved = await plan.resolve(self.config(), self.discovery(vpc_ids=('vpc-2',)))
+        self.assertEqual({'VpcId': 'vpc-2'}, resolved.parameters)
+        self.assertEqual(1, generate.call_count)
+
+    async def test_configured_resources_are_not_checked(self):
+        self.generator()
+        plan = ParameterPlan()
+        discovery = self.discovery(vpc_ids=())
+        await plan.resolve(self.config({'VpcId': 'vpc-given'}), discovery)
+        await plan.resolve(self.config({'VpcId': 'vpc-given'}), discovery)
+        discovery.inventory.assert_not_awaited()
+
+    async def test_failed_generation_is_not_locked(self):
+        self.generator(error=Iact3Exception('can not find any vswitch'))
+        plan = ParameterPlan()
+        resolved = await plan.resolve(self.config(), self.discovery())
+        self.assertIsNotNone(resolved.error)
+        self.assertEqual({}, plan.entries)
+        self.assertFalse(plan.modified)
+
+    def test_invalid_plan_files(self):
+        with self.assertRaises(Iact3Exception):
+            ParameterPlan.load(self.plan_file)
+        with open(self.plan_file, 'w', encoding='utf-8') as file_handle:
+            json.dump({'version': 0, 'entries': []}, file_handle)
+        with self.assertRaises(Iact3Exception):
+            ParameterPlan.load(self.plan_file)
+
+    async def test_plan_and_run_commands(self):
+        config_file = os.path.join(self.DATA_PATH, f'.{IAC_NAME}.yml')
+        template = os.path.join(self.DATA_PATH, 'simple_template.yml')
+        await Test.plan(config_file=config_file, template=template, plan_file=self.plan_file)
+        plan = ParameterPlan.load(self.plan_file)
+        self.assertEqual([('default', 'cn-beijing'), ('other', 'cn-hangzhou')], sorted(plan.entries))
+
+        with mock.patch.object(ParamGenerator, 'result') as generate:
+            await Test.run(config_file=config_file, template=template, plan=self.plan_file)
+        generate.assert_not_called()
+
+    async def test_plan_keeps_entries_of_other_tests(self):
+        config_file = os.path.join(self.DATA_PATH, f'.{IAC_NAME}.yml')
+        template = os.path.join(self.DATA_PATH, 'simple_template.yml')
+        await Test.plan(config_file=config_file, template=template, test_names='default', plan_file=self.plan_file)
+        planned = ParameterPlan.load(self.plan_file).entries[('default', 'cn-beijing')]
+
+        await Test.plan(config_file=config_file, template=template, test_names='other', plan_file=self.plan_file)
+        plan = ParameterPlan.load(self.plan_file)
+        self.assertEqual([('default', 'cn-beijing'), ('other', 'cn-hangzhou')], sorted(plan.entries))
+        self.assertEqual(planned, plan.entries[('default', 'cn-beijing')])
@@ -0,0 +1,78 @@
+from unittest import mock
+
+from iact3.config import BaseConfig, TestConfig
+from iact3.discovery import DiscoveryService
+from iact3.generate_params import ParamGenerator
+from iact3.plugin.ecs import EcsPlugin
+from iact3.plugin.ros import StackPlugin
+from iact3.preflight import SKIPPED, unsupported_reason
+from tests.common import MOCK_RESOURCE_TYPES, AsyncMock, BaseTest
+
+TEMPLATE = '''
+ROSTemplateFormatVersion: '2015-09-01'
+Resources:
+  Sleep:
+    Type: ALIYUN::ROS::Sleep
+  Cluster:
+    Type: ALIYUN::CS::ManagedKubernetesCluster
+'''
+
+ECS_TEMPLATE = '''
+ROSTemplateFormatVersion: '2015-09-01'
+Resources:
+  Instance:
+    Type: ALIYUN::ECS::Instance
+'''
+
+
+class TestPreflight(BaseTest):
+    def config(self, template=TEMPLATE):
+        config = TestConfig.from_dict({'template_config': {'template_body': template}})
+        config.region = self.REGION_ID
+        config.test_name = 'default'
+        return config
+
+    async def test_unsupported_resource_types(self):
+        reason = await unsupported_reason(self.config(), DiscoveryService(self.REGION_ID))
+        self.assertEqual('ALIYUN::CS::ManagedKubernetesCluster not supported by ROS', reason)
+
+        supported = MOCK_RESOURCE_TYPES + ('ALIYUN::CS::ManagedKubernetesCluster',)
+        with mock.patch.object(StackPlugin, 'list_resource_types', AsyncMock(return_value=list(supported))):
+            self.assertIsNone(await unsupported_reason(self.config(), DiscoveryService(self.REGION_ID)))
+
+    async def test_failed_checks_pass(self):
+        failure = AsyncMock(side_effect=RuntimeError('throttled'))
+        with mock.patch.object(StackPlugin, 'list_resource_types', failure):
+            self.assertIsNone(await unsupported_reason(self.config(), DiscoveryService(self.REGION_ID)))
+        self.assertIsNone(await unsupported_reason(self.config(template=''), DiscoveryService(self.REGION_ID)))
+
+    async def test_instance_stock(self):
+        service = DiscoveryService(self.REGION_ID)
+        with mock.patch.object(EcsPlugin, 'describe_available_instance_types', AsyncMock(return_value=[])):
+            reason = await unsupported_reason(self.config(ECS_TEMPLATE), service)
+        self.assertEqual(f'no ECS instance type is available in {self.REGION_ID}', reason)
+
+        service = DiscoveryService(self.REGION_ID)
+        available = AsyncMock(return_value=['ecs.g6.large'])
+        with mock.patch.object(EcsPlugin, 'describe_available_instance_types', available):
+            self.assertIsNone(await unsupported_reason(self.config(ECS_TEMPLATE), service))
+        available.assert_awaited_once_with(instance_charge_type='PostPaid', system_disk_category=None, zone_id=None)
+
+    async def test_regions_are_pruned_or_skipped_before_generation(self):
+        async def describe_available_instance_types(plugin, **kwargs):
+            return ['ecs.g6.large'] if plugin.region_id == 'cn-beijing' else []
+
+        test = {'template_config': {'template_body': ECS_TEMPLATE}, 'parameters': {'Name': 'test'}}
+        config = BaseConfig.from_dict(
+            {'tests': {'everywhere': dict(test, regions=['all']), 'listed': dict(test, regions=['cn-hangzhou'])}}
+        )
+        with mock.patch.object(
+            EcsPlugin, 'describe_available_instance_types', autospec=True, side_effect=describe_available_instance_types
+        ), mock.patch.object(ParamGenerator, 'result', wraps=ParamGenerator.result) as generate:
+            configs = await config.get_all_configs()
+
+        self.assertEqual(
+            [('everywhere', 'cn-beijing', None), ('listed', 'cn-hangzhou', SKIPPED)],
+            [(con.test_name, con.region, getattr(con.error, 'code', None)) for con in configs],
+        )
+        self.assertEqual(1, generate.call_count)
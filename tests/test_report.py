@@ -1,5 +1,7 @@
+import json
 import os
 
+from iact3.preflight import SKIPPED
 from iact3.report.generate_reports import ReportBuilder
 from iact3.stack import Stacker
 from tests.common import BaseTest
@@ -19,6 +21,21 @@ class TestReport(BaseTest):
         await report.generate_report()
         self.assertEqual(os.path.exists(index_path), True)
 
+    async def test_index_skipped(self):
+        skipped = Stack(stack_name="skipped-stack", region="cn-beijing", stack_id="", test_name="skipped-test")
+        skipped.status = SKIPPED
+        stacker = Stacker('test', tests=[], stacks=[skipped])
+        report = ReportBuilder(stacker, self.DATA_PATH)
+
+        html_output = await report.generate_report()
+        result = json.loads((self.DATA_PATH / "test-result.json").read_text(encoding="utf-8"))
+        os.remove(self.DATA_PATH / "test-result.json")
+
+        self.assertIn('class=test-skipped', html_output)
+        self.assertNotIn('class=test-red', html_output)
+        self.assertEqual(result['Result'], 'Success')
+        self.assertEqual(result['Details'][0]['Result'], 'Skipped')
+
     async def test_report_default(self):
         stack = Stack(stack_name="test-stack", region="cn-hangzhou", stack_id="")
         stacker = Stacker('test', tests=[], stacks=[stack])
@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+from iact3.stack import Stack, StackStatusPoller
+from tests.common import AsyncMock, AsyncTestCase
+
+
+class TestStackStatusPoller(AsyncTestCase):
+    @staticmethod
+    def _stack(stack_id, plugin, credential=None):
+        with mock.patch('iact3.stack.StackPlugin', return_value=plugin):
+            stack = Stack(region='cn-hangzhou', stack_id=stack_id, test_name='default', credential=credential)
+        stack.status = 'CREATE_IN_PROGRESS'
+        return stack
+
+    async def test_stacks_sharing_a_region_are_polled_with_one_list_call(self):
+        listed = []
+
+        async def list_stacks_by_ids(stack_ids):
+            listed.append(list(stack_ids))
+            return [{'StackId': stack_id, 'Status': 'CREATE_COMPLETE'} for stack_id in stack_ids]
+
+        plugin = SimpleNamespace(
+            list_stacks_by_ids=AsyncMock(side_effect=list_stacks_by_ids),
+            get_stack=AsyncMock(return_value={'Status': 'CREATE_COMPLETE', 'Outputs': []}),
+        )
+        credential = SimpleNamespace()
+        stacks = [self._stack(f'stack-{index}', plugin, credential) for index in range(3)]
+
+        await asyncio.sleep(0.01)
+
+        self.assertEqual([['stack-0', 'stack-1', 'stack-2']], listed)
+        self.assertEqual(['CREATE_COMPLETE'] * 3, [stack.status for stack in stacks])
+        # Outputs are fetched once per stack after it reaches a terminal state.
+        self.assertEqual(3, plugin.get_stack.await_count)
+        for call in plugin.get_stack.await_args_list:
+            self.assertEqual('Enabled', call[1]['output_option'])
+        self.assertFalse(StackStatusPoller._pollers)
+
+    async def test_stack_missing_from_batch_falls_back_to_get_stack(self):
+        plugin = SimpleNamespace(
+            list_stacks_by_ids=AsyncMock(return_value=[]),
+            get_stack=AsyncMock(return_value=None),
+        )
+        stack = self._stack('stack-deleted', plugin)
+        stack.status = 'DELETE_IN_PROGRESS'
+
+        await asyncio.sleep(0.01)
+
+        plugin.get_stack.assert_awaited_with('stack-deleted', output_option='Disabled')
+        stack.timer.cancel()
+
+    async def test_failed_batch_falls_back_to_get_stack(self):
+        plugin = SimpleNamespace(
+            list_stacks_by_ids=AsyncMock(side_effect=RuntimeError('throttled')),
+            get_stack=AsyncMock(return_value={'Status': 'CREATE_IN_PROGRESS'}),
+        )
+        stack = self._stack('stack-pending', plugin)
+
+        await asyncio.sleep(0.01)
+
+        plugin.get_stack.assert_awaited_with('stack-pending', output_option='Disabled')
+        self.assertEqual('CREATE_IN_PROGRESS', stack.status)
+        stack.timer.cancel()
+
+    async def test_stacks_without_id_are_dropped(self):
+        plugin = SimpleNamespace(list_stacks_by_ids=AsyncMock(), get_stack=AsyncMock())
+        stack = self._stack(None, plugin)
+        stack.status = 'CREATE_FAILED'
+
+        await asyncio.sleep(0.01)
+
+        self.assertFalse(StackStatusPoller._pollers)
+        self.assertTrue(stack.timer._poller._task.done())
+        plugin.list_stacks_by_ids.assert_not_awaited()
+
+    async def test_equal_access_keys_share_a_poller(self):
+        plugin = SimpleNamespace(list_stacks_by_ids=AsyncMock(return_value=[]), get_stack=AsyncMock())
+        access_key = {'credential_type': 'access_key', 'access_key_id': 'ak', 'access_key_secret': 'sk'}
+        credentials = [SimpleNamespace(cloud_credential=SimpleNamespace(**access_key)) for _ in range(2)]
+        stacks = [self._stack(f'stack-{index}', plugin, credential) for index, credential in enumerate(credentials)]
+
+        self.assertEqual(1, len(StackStatusPoller._pollers))
+        self.assertIs(stacks[0].timer._poller, stacks[1].timer._poller)
+        for stack in stacks:
+            stack.timer.cancel()
+
+    async def test_price_and_preview_do_not_keep_polling(self):
+        plugin = SimpleNamespace(
+            get_template_estimate_cost=AsyncMock(return_value={'Resources': {}}),
+            preview_stack=AsyncMock(return_value={'Resources': []}),
+        )
+        test = SimpleNamespace(
+            parameters={},
+            template_config=SimpleNamespace(to_dict=dict, template_body=None),
+            test_name='default',
+            region='cn-hangzhou',
+            auth=SimpleNamespace(credential=None),
+            error=None,
+        )
+        with mock.patch('iact3.stack.StackPlugin', return_value=plugin):
+            priced = await Stack.get_price(test)
+            previewed = await Stack.preview_stack_result(test)
+
+        self.assertEqual({'Resources': {}}, priced.template_price)
+        self.assertEqual({'Resources': []}, previewed.preview_result)
+        self.assertFalse(StackStatusPoller._pollers)
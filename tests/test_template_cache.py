@@ -0,0 +1,159 @@
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from iact3.config import TemplateConfig, TestConfig
+from iact3.generate_params import ParamGenerator
+from iact3.plugin.oss import OssPlugin
+from iact3.plugin.ros import StackPlugin
+from iact3.template_cache import PARSED_TEMPLATES, ParsedTemplateStore, TemplateSourceCache
+from iact3.util import yaml
+from tests.common import AsyncMock, BaseTest, _FakeHttpResponse
+
+TEMPLATE = 'ROSTemplateFormatVersion: 2015-09-01\n'
+
+
+class TestTemplateSourceCache(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        self.cache = TemplateSourceCache()
+
+    async def test_concurrent_lookups_download_once(self):
+        config = TemplateConfig(template_url='https://example.com/template.yml')
+        with mock.patch('requests.get', return_value=_FakeHttpResponse(TEMPLATE)) as get:
+            bodies = await asyncio.gather(
+                *[self.cache.get(config, region) for region in ('cn-hangzhou', 'cn-beijing', 'cn-shanghai') * 10]
+            )
+
+        self.assertEqual(1, get.call_count)
+        self.assertEqual({TEMPLATE.encode()}, set(bodies))
+
+    async def test_stale_url_is_revalidated_with_etag(self):
+        config = TemplateConfig(template_url='https://example.com/template.yml')
+        not_modified = _FakeHttpResponse(b'')
+        not_modified.status_code = 304
+        responses = [_FakeHttpResponse(TEMPLATE, headers={'ETag': '"v1"'}), not_modified]
+
+        with mock.patch.object(TemplateSourceCache, 'FRESH_FOR', 0), mock.patch(
+            'requests.get', side_effect=responses
+        ) as get:
+            first = await self.cache.get(config, 'cn-hangzhou')
+            second = await self.cache.get(config, 'cn-hangzhou')
+
+        self.assertEqual(first, second)
+        self.assertEqual({'If-None-Match': '"v1"'}, get.call_args[1]['headers'])
+
+    async def test_versioned_template_id_is_immutable(self):
+        get_template = AsyncMock(return_value={'TemplateBody': TEMPLATE})
+        versioned = TemplateConfig(template_id='template-id', template_version='v1')
+        latest = TemplateConfig(template_id='template-id')
+
+        with mock.patch.object(TemplateSourceCache, 'FRESH_FOR', 0), mock.patch.object(
+            StackPlugin, 'get_template', get_template
+        ):
+            for _ in range(3):
+                body = await self.cache.get(versioned, 'cn-hangzhou')
+                self.assertIsInstance(body, str)
+                self.assertEqual(TEMPLATE, body)
+            self.assertEqual(1, get_template.await_count)
+
+            await self.cache.get(latest, 'cn-hangzhou')
+            await self.cache.get(latest, 'cn-hangzhou')
+            self.assertEqual(3, get_template.await_count)
+
+        # Both sources resolve to one stored body.
+        self.assertEqual(1, len(self.cache._bodies))
+
+    async def test_changed_file_is_read_again(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'template.yml'
+            path.write_text(TEMPLATE)
+            config = TemplateConfig(template_url=f'file://{path}')
+
+            with mock.patch.object(TemplateSourceCache, 'FRESH_FOR', 0):
+                self.assertEqual(TEMPLATE.encode(), await self.cache.get(config, 'cn-hangzhou'))
+                path.write_text(TEMPLATE + 'Parameters: {}\n')
+                stat = path.stat()
+                os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+                body = await self.cache.get(config, 'cn-hangzhou')
+
+        self.assertIn(b'Parameters', body)
+        self.assertEqual(1, len(self.cache._bodies))
+
+    async def test_unchanged_oss_object_is_not_read_again(self):
+        config = TemplateConfig(template_url='oss://bucket/template.yml?RegionId=cn-beijing')
+        read_object_async = AsyncMock(return_value=TEMPLATE.encode())
+        with mock.patch.object(TemplateSourceCache, 'FRESH_FOR', 0), mock.patch.object(
+            OssPlugin, 'read_object_async', read_object_async
+        ):
+            await self.cache.get(config, 'cn-hangzhou')
+            await self.cache.get(config, 'cn-hangzhou')
+
+        self.assertEqual(1, read_object_async.await_count)
+
+
+PARAMETERIZED_TEMPLATE = """
+ROSTemplateFormatVersion: '2015-09-01'
+Parameters:
+  ZoneId:
+    Type: String
+    AssociationProperty: ALIYUN::ECS::Instance::ZoneId
+  Count:
+    Type: Number
+    Default: 2
+  Name:
+    Type: String
+    Default: demo
+  Empty:
+    Type: String
+    Default: null
+Metadata:
+  ALIYUN::ROS::Interface:
+    ParameterGroups:
+      - Parameters: [Name, ZoneId]
+      - Parameters: []
+      - Parameters: [Count]
+"""
+
+
+class TestParsedTemplateStore(BaseTest):
+    def setUp(self) -> None:
+        super().setUp()
+        PARSED_TEMPLATES.clear()
+        self.addCleanup(PARSED_TEMPLATES.clear)
+
+    def test_parameter_metadata(self):
+        parsed = ParsedTemplateStore().get(PARAMETERIZED_TEMPLATE)
+
+        self.assertEqual({'Count': '2', 'Name': 'demo'}, parsed.defaults)
+        self.assertEqual({'ZoneId': 'ALIYUN::ECS::Instance::ZoneId'}, parsed.association_properties)
+        self.assertEqual(['Name', 'ZoneId', 'Count'], parsed.parameter_groups_order)
+        self.assertIsNone(ParsedTemplateStore().get(TEMPLATE).parameter_groups_order)
+
+    def test_json_rendering_shares_the_parsed_template(self):
+        store = ParsedTemplateStore()
+        with mock.patch.object(yaml, 'load', wraps=yaml.load) as load:
+            json_body = store.to_json(PARAMETERIZED_TEMPLATE)
+            parsed = store.get(json_body)
+
+        self.assertEqual(1, load.call_count)
+        self.assertIs(store.get(PARAMETERIZED_TEMPLATE), parsed)
+
+    async def test_generators_parse_a_template_once(self):
+        config = TestConfig.from_dict(
+            {
+                'template_config': {'template_body': PARAMETERIZED_TEMPLATE},
+                'parameters': {'ZoneId': 'cn-hangzhou-h', 'Extra': 'value'},
+            }
+        )
+        with mock.patch.object(yaml, 'load', wraps=yaml.load) as load:
+            for region in ('cn-hangzhou', 'cn-beijing', 'cn-shanghai'):
+                config.region = region
+                generator = ParamGenerator(config)
+                self.assertEqual({'Count': '2', 'Name': 'demo'}, await generator._get_template_defaults())
+                self.assertIn('ZoneId', await generator._get_association_properties())
+                self.assertEqual(['Name', 'ZoneId', 'Count', 'Extra'], await generator._get_parameters_order())
+
+        self.assertEqual(1, load.call_count)
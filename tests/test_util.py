@@ -0,0 +1,95 @@
+import importlib.util
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import iact3.util
+from iact3.util import ROS_FUNCTION_NAMES, CCustomSafeLoader, CustomSafeLoader, PyCustomSafeLoader, yaml
+
+DATA_PATH = Path(__file__).parent / 'data'
+
+FUNCTIONS_TEMPLATE = '''
+ROSTemplateFormatVersion: '2015-09-01'
+Resources:
+  Instance:
+    Type: ALIYUN::ECS::Instance
+    Properties:
+      ZoneId: !Ref ZoneId
+      VpcId: !GetAtt Vpc.VpcId
+      NestedOutput: !GetAtt Nested.Outputs.VpcId
+      DottedName: !GetAtt My.Nested.Resource.Arn
+      ListAtt: !GetAtt [Vpc, VpcId]
+      Joined: !Join ['-', [a, !Ref Name]]
+      Selected: !Select ['0', !GetAZs {Ref: ALIYUN::Region}]
+      Mapping: !If [IsProd, {A: 1}, !Ref ALIYUN::NoValue]
+      Sub: !Sub '${Name}-suffix'
+      Base64: !Base64 'text'
+      Unicode: "中文模板"
+      Anchored: &anchor {Shared: true}
+      Alias: *anchor
+'''
+
+
+@unittest.skipUnless(CCustomSafeLoader, 'PyYAML is built without libyaml')
+class TestCustomSafeLoaderEquivalence(unittest.TestCase):
+    def assert_same_result(self, content):
+        self.assertEqual(
+            yaml.load(content, Loader=PyCustomSafeLoader), yaml.load(content, Loader=CCustomSafeLoader)
+        )
+
+    def test_libyaml_loader_is_the_default(self):
+        self.assertIs(CCustomSafeLoader, CustomSafeLoader)
+
+    def test_ros_functions(self):
+        self.assert_same_result(FUNCTIONS_TEMPLATE)
+
+        parsed = yaml.load(FUNCTIONS_TEMPLATE, Loader=CCustomSafeLoader)
+        properties = parsed['Resources']['Instance']['Properties']
+        self.assertEqual({'Fn::GetAtt': ['Nested', 'Outputs.VpcId']}, properties['NestedOutput'])
+        self.assertEqual({'Fn::GetAtt': ['My.Nested.Resource', 'Arn']}, properties['DottedName'])
+        self.assertEqual({'Ref': 'ZoneId'}, properties['ZoneId'])
+
+    def test_every_function_in_each_node_style(self):
+        for name in ROS_FUNCTION_NAMES:
+            if name == 'GetAtt':
+                continue
+            for value in ('scalar', '[a, b]', '{a: b}'):
+                with self.subTest(function=name, value=value):
+                    self.assert_same_result(f'Value: !{name} {value}')
+
+    def test_data_files(self):
+        paths = [p for p in DATA_PATH.iterdir() if p.suffix in ('.yml', '.yaml', '.json')]
+        self.assertTrue(paths)
+        for path in paths:
+            with self.subTest(path=path.name):
+                self.assert_same_result(path.read_text(encoding='utf-8'))
+
+    def test_streams_and_bytes(self):
+        path = DATA_PATH / 'simple_template.yml'
+        with open(path, 'r', encoding='utf-8') as py_handle, open(path, 'r', encoding='utf-8') as c_handle:
+            self.assertEqual(
+                yaml.load(py_handle, Loader=PyCustomSafeLoader), yaml.load(c_handle, Loader=CCustomSafeLoader)
+            )
+        self.assert_same_result(FUNCTIONS_TEMPLATE.encode('utf-8'))
+
+    def test_errors(self):
+        for loader in (PyCustomSafeLoader, CCustomSafeLoader):
+            with self.subTest(loader=loader.__name__):
+                with self.assertRaisesRegex(ValueError, 'Resolve !GetAtt error'):
+                    yaml.load('Value: !GetAtt Vpc', Loader=loader)
+                with self.assertRaises(yaml.YAMLError):
+                    yaml.load('Value: [unclosed', Loader=loader)
+                with self.assertRaises(yaml.constructor.ConstructorError):
+                    yaml.load('Value: !python/object:os.system ls', Loader=loader)
+
+
+class TestCustomSafeLoaderFallback(unittest.TestCase):
+    def test_pure_python_loader_without_libyaml(self):
+        spec = importlib.util.spec_from_file_location('iact3_util_without_libyaml', iact3.util.__file__)
+        module = importlib.util.module_from_spec(spec)
+        with mock.patch.object(yaml, '__with_libyaml__', False):
+            spec.loader.exec_module(module)
+
+        self.assertIsNone(module.CCustomSafeLoader)
+        self.assertIs(module.PyCustomSafeLoader, module.CustomSafeLoader)
+        self.assertEqual({'Value': {'Ref': 'ZoneId'}}, yaml.load('Value: !Ref ZoneId', Loader=module.CustomSafeLoader))
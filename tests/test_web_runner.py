@@ -14,6 +14,7 @@ from alibabacloud_credentials.models import Config as CredentialConfig
 from aiohttp import web
 from aiohttp.test_utils import TestClient, TestServer
 
+from iact3.plugin.base_plugin import CREDENTIAL_CACHE
 from iact3.stack import Stack, Stacker
 from iact3.web import routes
 from iact3.web import runner as runner_module
@@ -21,12 +22,7 @@ from iact3.web.runner import TestRun as WebTestRun
 from iact3.web.runner import TestRunner as WebTestRunner
 from iact3.web.runner import capture_iact3_logs
 from iact3.web.runner import get_credential_key_id
-from tests.common import AsyncTestCase
-
-try:
-    AsyncMock = mock.AsyncMock
-except AttributeError:
-    from asynctest import CoroutineMock as AsyncMock
+from tests.common import AsyncMock, AsyncTestCase
 
 
 class TestIncrementalStackCreation(AsyncTestCase):
@@ -757,8 +753,9 @@ class TestDeletionRecovery(AsyncTestCase):
         with mock.patch(
             'iact3.cli_modules.list.List.get_credential',
             return_value=None,
-        ), mock.patch(
-            'iact3.plugin.base_plugin.CredentialClient',
+        ), mock.patch.object(
+            CREDENTIAL_CACHE,
+            'default',
             return_value=credential,
         ):
             groups = routes._build_deletion_groups([stack])